@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue May 26 18:05:41 2020
+
+@author: Yutong Dai
+
+Memory per open node and push/pop time of the blimpy PriorityQueue used by
+earlier versions, of OpenNodes, and of OpenNodes spilling to disk past
+budget nodes, for 10^4 to 10^6 queued nodes.
+"""
+
+import sys
+import math
+import time
+import tracemalloc
+import numpy as np
+from coinor.blimpy import PriorityQueue
+
+project_dir = '../'
+sys.path.append(project_dir)
+
+from src.openNodes import OpenNodes
+
+# input Parameters
+sizes = [10000, 100000, 1000000]  # Number of open nodes
+numVars = 1000
+budget = 10000  # open nodes kept in memory by the spilling store
+rand_seed = 0
+
+
+def make_fields(num):
+    # fields of the queue entries, pairs of children with the same parent,
+    # bound and branching variable
+    rng = np.random.RandomState(rand_seed)
+    relax = rng.uniform(100, 200, num // 2).tolist()
+    branch_var = rng.randint(numVars, size=num // 2).tolist()
+    value = rng.uniform(0.01, 0.99, num // 2)
+    return relax, branch_var, value
+
+
+def fill(queue, fields):
+    # push the entries as the search loops build them
+    relax, branch_var, value = fields
+    for k in range(len(relax)):
+        x = value[k]
+        queue.push(2 * k + 1, -relax[k], (2 * k + 1, k, relax[k], branch_var[k],
+                                         x, '<=', math.floor(x), None))
+        queue.push(2 * k + 2, -relax[k], (2 * k + 2, k, relax[k], branch_var[k],
+                                         x, '>=', math.ceil(x), None))
+
+
+def measure(make_queue, fields):
+    num = 2 * len(fields[0])
+    tracemalloc.start()
+    queue = make_queue()
+    fill(queue, fields)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del queue
+    queue = make_queue()
+    start = time.time()
+    fill(queue, fields)
+    push = time.time() - start
+    start = time.time()
+    while not queue.isEmpty():
+        queue.pop()
+    pop = time.time() - start
+    if hasattr(queue, 'close'):
+        queue.close()
+    return size / num, push, pop
+
+
+if __name__ == '__main__':
+    print('%8s | %10s %10s %10s | %10s %10s %10s | %10s %10s %10s' %
+          ('nodes', 'blimpy B', 'push s', 'pop s',
+           'store B', 'push s', 'pop s', 'spill B', 'push s', 'pop s'))
+    for num in sizes:
+        fields = make_fields(num)
+        blimpy = measure(PriorityQueue, fields)
+        store = measure(OpenNodes, fields)
+        spill = measure(lambda: OpenNodes(budget=budget), fields)
+        print('%8d | %10.0f %10.3f %10.3f | %10.0f %10.3f %10.3f | %10.0f %10.3f %10.3f' %
+              ((num,) + blimpy + store + spill))
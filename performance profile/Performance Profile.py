@@ -13,7 +13,6 @@ import matplotlib.pyplot as plt
 import pandas as pd
 
 from coinor.grumpy import GenerateRandomMIP
-from coinor.grumpy import BBTree
 from coinor.grumpy import MOST_FRACTIONAL, FIXED_BRANCHING, PSEUDOCOST_BRANCHING
 from coinor.grumpy import DEPTH_FIRST, BEST_FIRST, BEST_ESTIMATE
 from coinor.grumpy import INFINITY
@@ -22,7 +21,7 @@ project_dir = '../'
 sys.path.append(project_dir)
 
 from src.cylpBranchAndBound import RELIABILITY_BRANCHING, HYBRID
-from src.cylpBranchAndBound import BranchAndBound
+from src.batchSolve import BatchSolve
 
 # Disable
 def blockPrint():
@@ -49,7 +48,6 @@ def negIdentity(n):
 
 # input Parameters 
 M = 30  # Number of Problems
-seed(1020)
 
 
 
@@ -58,44 +56,50 @@ seed(1020)
 branch= [PSEUDOCOST_BRANCHING,RELIABILITY_BRANCHING,HYBRID]
 search = [DEPTH_FIRST, BEST_FIRST, BEST_ESTIMATE]
 prob_data = np.array([]) # Record type of problems
-costs_node = {i + ' - ' + j:np.array([]) for i in branch for j in search}
-costs_time = {i + ' - ' + j:np.array([]) for i in branch for j in search}
-costs_lp = {i + ' - ' + j:np.array([]) for i in branch for j in search}
-
-# Solve problems and record tree size of costs
-for k in range(M):
-    # Problem Size will be random
-    numVars = randint(5,25)
-    numCons = randint(int(numVars/5),int(2 * numVars/3))
-    rand_seed = randint(1,2000)
-    #prob_data = np.append(prob_data,(numVars,numCons,rand_seed))
-    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = GenerateRandomMIP(
-        numVars=numVars , numCons=numCons,rand_seed= rand_seed)
-    
-    I = identity(len(VARIABLES))
-    negI = negIdentity(len(VARIABLES))
-    RHS = RHS + [0]*len(VARIABLES) + [3]*len(VARIABLES)
-    for i in VARIABLES:
-        MAT[i] = MAT[i] + negI[int(i[1:])]
-        CONSTRAINTS.append('C'+str(len(CONSTRAINTS)))
-    for i in VARIABLES:
-        MAT[i] = MAT[i] + I[int(i[1:])]
-        CONSTRAINTS.append('C'+str(len(CONSTRAINTS)))
+
+
+def solve_instances():
+    # Solve problems and record tree size of costs
+    seed(1020)
+    costs_node = {i + ' - ' + j:np.array([]) for i in branch for j in search}
+    costs_time = {i + ' - ' + j:np.array([]) for i in branch for j in search}
+    costs_lp = {i + ' - ' + j:np.array([]) for i in branch for j in search}
+
+    instances = []
+    for k in range(M):
+        # Problem Size will be random
+        numVars = randint(5,25)
+        numCons = randint(int(numVars/5),int(2 * numVars/3))
+        rand_seed = randint(1,2000)
+        #prob_data = np.append(prob_data,(numVars,numCons,rand_seed))
+        CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = GenerateRandomMIP(
+            numVars=numVars , numCons=numCons,rand_seed= rand_seed)
         
-    for i in branch:
-        for j in search:
-            T = BBTree()
-            opt, LB,stat = BranchAndBound(
-                T, CONSTRAINTS, VARIABLES, OBJ,MAT, RHS,branch_strategy=i,search_strategy=j,
-                more_return = True,binary_vars = False)
-            if LB>-INFINITY:
-                costs_node[i + ' - ' + j] = np.append(costs_node[i + ' - ' + j],int(stat['Size']))
-                costs_time[i + ' - ' + j] = np.append(costs_time[i + ' - ' + j],float(stat['Time']))
-                costs_lp[i + ' - ' + j] = np.append(costs_lp[i + ' - ' + j],int(stat['LP Solved']))
-            else:
-                costs_node[i + ' - ' + j] = np.append(costs_node[i + ' - ' + j],INFINITY)
-                costs_time[i + ' - ' + j] = np.append(costs_time[i + ' - ' + j],INFINITY)
-                costs_lp[i + ' - ' + j] = np.append(costs_lp[i + ' - ' + j],INFINITY)
+        I = identity(len(VARIABLES))
+        negI = negIdentity(len(VARIABLES))
+        RHS = RHS + [0]*len(VARIABLES) + [3]*len(VARIABLES)
+        for i in VARIABLES:
+            MAT[i] = MAT[i] + negI[int(i[1:])]
+            CONSTRAINTS.append('C'+str(len(CONSTRAINTS)))
+        for i in VARIABLES:
+            MAT[i] = MAT[i] + I[int(i[1:])]
+            CONSTRAINTS.append('C'+str(len(CONSTRAINTS)))
+        instances.append((CONSTRAINTS, VARIABLES, OBJ, MAT, RHS))
+
+    # All problems and strategies over a process pool, one row per pair
+    configs = {i + ' - ' + j: {'branch_strategy': i, 'search_strategy': j}
+               for i in branch for j in search}
+    for row in BatchSolve(instances, configs, binary_vars = False):
+        key = row['Config']
+        if row.get('Objective') is not None:
+            costs_node[key] = np.append(costs_node[key],int(row['Size']))
+            costs_time[key] = np.append(costs_time[key],float(row['Time']))
+            costs_lp[key] = np.append(costs_lp[key],int(row['LP Solved']))
+        else:
+            costs_node[key] = np.append(costs_node[key],INFINITY)
+            costs_time[key] = np.append(costs_time[key],INFINITY)
+            costs_lp[key] = np.append(costs_lp[key],INFINITY)
+    return costs_node, costs_time, costs_lp
                 
                 
 def performance_profile(costs,name):
@@ -189,6 +193,9 @@ def performance_profile(costs,name):
         
         
 if __name__ == '__main__':
+    # the workers of BatchSolve import this module, the instances are only
+    # made and solved in the main process
+    costs_node, costs_time, costs_lp = solve_instances()
     enablePrint()
     performance_profile(costs_node, 'Tree Size')
     performance_profile(costs_time, 'Solution Time')
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu May 21 16:40:12 2020
+
+@author: Yutong Dai
+
+Memory and time of building and solving the root LP with a dense and with a
+sparse constraint matrix, for 10^3 to 10^5 columns. Every run is a fresh
+process, whose peak resident set size (ru_maxrss) is the memory reported,
+so the memory held by Clp, which tracemalloc does not see, is counted.
+"""
+
+import sys
+import time
+import resource
+import multiprocessing
+import numpy as np
+from cylp.py.modeling.CyLPModel import CyLPArray
+
+project_dir = '../'
+sys.path.append(project_dir)
+
+from src.generator import GenerateRandomMIP
+from src.cylpBranchAndBound import ToSparseMatrix
+from src.lpEngine import PersistentLP
+
+# input Parameters
+sizes = [1000, 3000, 10000, 30000, 100000]  # Number of columns
+cons_ratio = 0.1  # Number of rows per column
+density = 0.005
+dense_limit = 10 ** 8  # skip the dense build above this many entries
+
+
+def build_and_solve(OBJ, MAT, RHS, numVars):
+    cyOBJ = CyLPArray([-val for val in OBJ.values()])
+    start = time.time()
+    engine = PersistentLP(cyOBJ, MAT, CyLPArray(RHS),
+                          np.zeros(numVars), np.ones(numVars), 'dualSimplex')
+    build = time.time() - start
+    start = time.time()
+    s = engine.solve()
+    solve = time.time() - start
+    return build, solve, s.objectiveValue
+
+
+def peak_rss():
+    # peak resident set size of this process in MB, ru_maxrss is in
+    # kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+def run(conn, numVars, numCons, dense):
+    # one run in its own process: the instance, the matrix the LP is built
+    # from, the build and the solve
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = GenerateRandomMIP(
+        numVars=numVars, numCons=numCons, density=density,
+        rand_seed=numVars, sparse=True)
+    if dense:
+        MAT = np.matrix(MAT.toarray())
+    else:
+        MAT = ToSparseMatrix(MAT, VARIABLES)
+    build, solve, obj = build_and_solve(OBJ, MAT, RHS, numVars)
+    conn.send((build, solve, peak_rss(), obj))
+    conn.close()
+
+
+def measure(numVars, numCons, dense):
+    # spawned rather than forked, so the peak is not that of this process
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=run,
+                              args=(child_conn, numVars, numCons, dense))
+    process.start()
+    child_conn.close()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+if __name__ == '__main__':
+    print('%8s %8s %8s | %10s %10s %10s | %10s %10s %10s' %
+          ('cols', 'rows', 'nnz', 'dense MB', 'build s', 'solve s',
+           'sparse MB', 'build s', 'solve s'))
+    for numVars in sizes:
+        numCons = int(numVars * cons_ratio)
+        nnz = GenerateRandomMIP(numVars=numVars, numCons=numCons,
+                                density=density, rand_seed=numVars,
+                                sparse=True)[3].nnz
+        sparse = measure(numVars, numCons, False)
+        if numVars * numCons <= dense_limit:
+            dense = measure(numVars, numCons, True)
+            assert abs(dense[3] - sparse[3]) < 1e-6
+            dense = '%10.1f %10.3f %10.3f' % (dense[2], dense[0], dense[1])
+        else:
+            dense = '%10s %10s %10s' % ('-', '-', '-')
+        print('%8d %8d %8d | %s | %10.1f %10.3f %10.3f' %
+              (numVars, numCons, nnz, dense, sparse[2], sparse[0], sparse[1]))
@@ -0,0 +1,194 @@
+'''
+File: batchSolve.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-30 14:10
+Last Modified: 2020-05-30 14:10
+--------------------------------------------
+Description:
+Batch solves of many instances under many configurations of
+BranchAndBound. Every (instance, configuration) pair is one job and the
+jobs are spread over a pool of worker processes, largest instances first,
+so a sweep takes about the serial time divided by the number of workers.
+The results come back as a tidy table, one row per job.
+'''
+import os
+import time
+import itertools
+import multiprocessing
+from multiprocessing.connection import wait
+from coinor.grumpy import INFINITY
+try:
+    from .cylpBranchAndBound import BranchAndBound
+    from .generator import GenerateRandomMIP
+    from .searchLog import SILENT
+except ImportError:
+    from cylpBranchAndBound import BranchAndBound
+    from generator import GenerateRandomMIP
+    from searchLog import SILENT
+
+# stop reason of a job whose process was stopped at its hard limit
+TERMINATED = 'Terminated'
+
+
+def ConfigName(config):
+    '''Name of a configuration, its option values joined by " - ".'''
+    return ' - '.join(str(value) for value in config.values())
+
+
+def _problem(instance):
+    # an instance is either GenerateRandomMIP parameters or the problem
+    if isinstance(instance, dict):
+        return GenerateRandomMIP(**instance)
+    return instance
+
+
+def _dims(instance):
+    # variables and constraints, without building the instance
+    if isinstance(instance, dict):
+        return instance.get('numVars', 40), instance.get('numCons', 20)
+    return len(instance[1]), len(instance[0])
+
+
+def _row(job):
+    _, instance_id, config_name, instance, _ = job
+    variables, constraints = _dims(instance)
+    return {'Instance': instance_id, 'Config': config_name,
+            'Variables': variables, 'Constraints': constraints}
+
+
+def _solve_job(job):
+    options = job[4]
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = _problem(job[3])
+    row = _row(job)
+    start = time.time()
+    try:
+        _, LB, stat = BranchAndBound(None, CONSTRAINTS, VARIABLES, OBJ, MAT,
+                                     RHS, more_return=True, **options)
+    except Exception as error:
+        # a failing job is reported in its row and the others go on
+        row['Wall Time'] = time.time() - start
+        row['Error'] = repr(error)
+        return row
+    row['Wall Time'] = time.time() - start
+    row['Objective'] = LB if LB > -INFINITY else None
+    row.update(stat)
+    return row
+
+
+def _job_worker(conn, job):
+    conn.send(_solve_job(job))
+    conn.close()
+
+
+def _run_jobs(jobs, workers, job_timeout):
+    # every job in a process of its own, at most workers at a time, and a
+    # job still running job_timeout seconds after it started is terminated
+    rows = [None] * len(jobs)
+    pending = list(jobs)
+    running = {}  # connection: (process, job, start)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                job = pending.pop(0)
+                parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_job_worker,
+                                                  args=(child_conn, job))
+                process.daemon = True
+                process.start()
+                child_conn.close()
+                running[parent_conn] = (process, job, time.time())
+            timeout = None
+            if job_timeout is not None:
+                first = min(start for _, _, start in running.values())
+                timeout = max(first + job_timeout - time.time(), 0)
+            for conn in wait(list(running), timeout):
+                process, job, start = running.pop(conn)
+                try:
+                    rows[job[0]] = conn.recv()
+                except EOFError:
+                    # the process died without a result
+                    row = rows[job[0]] = _row(job)
+                    row['Wall Time'] = time.time() - start
+                    row['Error'] = 'the job process exited with code %s' \
+                        % process.exitcode
+                conn.close()
+                process.join()
+            if job_timeout is None:
+                continue
+            now = time.time()
+            for conn, (process, job, start) in list(running.items()):
+                if now - start >= job_timeout:
+                    del running[conn]
+                    process.terminate()
+                    process.join()
+                    conn.close()
+                    row = rows[job[0]] = _row(job)
+                    row['Wall Time'] = now - start
+                    row['Stop Reason'] = TERMINATED
+    finally:
+        for conn, (process, _, _) in running.items():
+            process.terminate()
+            process.join()
+            conn.close()
+    return rows
+
+
+def BatchSolve(instances, configs, workers=None, time_limit=None,
+               job_timeout=None, **options):
+    '''
+    Solve every instance under every configuration.
+        instances: list of instances, each either a dict of GenerateRandomMIP
+                   parameters, built in the worker that solves it, or a
+                   (CONSTRAINTS, VARIABLES, OBJ, MAT, RHS) tuple, or a dict
+                   of such instances keyed by their names
+        configs:   list of dicts of BranchAndBound options, named by
+                   ConfigName, or a dict of them keyed by their names.
+                   Configurations of the same name are still separate jobs
+        workers:   worker processes, os.cpu_count() if None; 1 solves the
+                   jobs in this process, one after the other, unless there
+                   is a job_timeout
+        time_limit: time limit in seconds of every job, unless its
+                   configuration sets one; the search stops at the first
+                   node after it, with 'Stop Reason' 'Time Limit'
+        job_timeout: hard limit in seconds on the wall time of every job,
+                   None for none. A job still running then, in a node LP or
+                   in presolve where time_limit is not checked, has its
+                   process terminated and its row only has the names, the
+                   size, the 'Wall Time' and 'Stop Reason' TERMINATED
+        options:   BranchAndBound options of all the jobs, for example
+                   binary_vars=False; the configurations override them
+    Returns one row per job, in the order of the instances and then of the
+    configurations, as a dict with the 'Instance' and 'Config' names, the
+    'Variables' and 'Constraints' of the instance, the 'Objective' (None
+    if there is no solution), the 'Wall Time' in seconds and the stats of
+    BranchAndBound. A job that raised, or whose process died, has its
+    'Error' instead.
+    pandas.DataFrame(rows) turns the rows into a data frame.
+    '''
+    if isinstance(instances, dict):
+        instances = list(instances.items())
+    else:
+        instances = list(enumerate(instances))
+    if isinstance(configs, dict):
+        configs = list(configs.items())
+    else:
+        configs = [(ConfigName(config), config) for config in configs]
+    options.setdefault('log_level', SILENT)
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    # jobs are known by their position, names may repeat
+    jobs = []
+    for (instance_id, instance), (config_name, config) in \
+            itertools.product(instances, configs):
+        job_options = dict(options)
+        job_options.update(config)
+        jobs.append((len(jobs), instance_id, config_name, instance,
+                     job_options))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 and job_timeout is None:
+        return [_solve_job(job) for job in jobs]
+    # the largest instances first, so that no long job starts last
+    jobs.sort(key=lambda job: _dims(job[3])[0] * _dims(job[3])[1],
+              reverse=True)
+    return _run_jobs(jobs, workers, job_timeout)
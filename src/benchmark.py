@@ -0,0 +1,335 @@
+'''
+File: benchmark.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-30 18:20
+Last Modified: 2020-05-30 18:20
+--------------------------------------------
+Description:
+Benchmark suite of the branch and bound. A fixed set of GenerateRandomMIP
+instances at several sizes and densities is solved under a fixed set of
+strategies, by BranchAndBound and by the two archived baselines, the PuLP
+based GrUMPy code (archived/grumpy/BranchAndBound.py) and the first CyLP
+port (archived/BranchAndBoundCylp.py). Every run records its wall time
+(the smallest of a few repeats), LP count, node count and pivots, and the
+results are written as JSON. Two result files, for example of two
+commits, are compared: the strategies that got slower on the instances
+beyond a noise threshold, and the runs that need more nodes, LPs or pivots
+or that changed their objective, are flagged.
+    python benchmark.py run --out new.json
+    python benchmark.py compare old.json new.json --threshold 0.1
+'''
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import datetime
+import itertools
+import contextlib
+import subprocess
+import importlib.util
+import numpy as np
+from coinor.grumpy import BBTree, INFINITY
+from coinor.grumpy import MOST_FRACTIONAL, PSEUDOCOST_BRANCHING
+from coinor.grumpy import DEPTH_FIRST, BEST_FIRST
+try:
+    from .batchSolve import BatchSolve, ConfigName
+    from .generator import GenerateRandomMIP
+    from .branching import RELIABILITY_BRANCHING
+except ImportError:
+    from batchSolve import BatchSolve, ConfigName
+    from generator import GenerateRandomMIP
+    from branching import RELIABILITY_BRANCHING
+
+CYLP = 'CyLP'
+ARCHIVED_CYLP = 'Archived CyLP'
+ARCHIVED_PULP = 'Archived PuLP'
+
+BENCHMARK_SIZES = [(20, 10), (40, 20), (60, 30)]
+BENCHMARK_DENSITIES = [0.2, 0.5]
+BENCHMARK_SEEDS = [1, 2]
+BENCHMARK_CONFIGS = [
+    {'branch_strategy': MOST_FRACTIONAL, 'search_strategy': DEPTH_FIRST},
+    {'branch_strategy': MOST_FRACTIONAL, 'search_strategy': BEST_FIRST},
+    {'branch_strategy': PSEUDOCOST_BRANCHING, 'search_strategy': BEST_FIRST},
+    {'branch_strategy': RELIABILITY_BRANCHING, 'search_strategy': BEST_FIRST}]
+# branching strategies the archived codes know
+ARCHIVED_STRATEGIES = [MOST_FRACTIONAL, PSEUDOCOST_BRANCHING]
+METRICS = ['Wall Time', 'LP Solved', 'Size', 'Pivots']
+
+_ARCHIVED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, 'archived')
+
+
+def BenchmarkInstances(sizes=BENCHMARK_SIZES, densities=BENCHMARK_DENSITIES,
+                       seeds=BENCHMARK_SEEDS):
+    '''
+    The instance set, GenerateRandomMIP parameters keyed by names such as
+    "40x20-0.2-1" (variables x constraints - density - seed).
+    '''
+    instances = {}
+    for (numVars, numCons), density, seed in \
+            itertools.product(sizes, densities, seeds):
+        name = '%sx%s-%s-%s' % (numVars, numCons, density, seed)
+        instances[name] = {'numVars': numVars, 'numCons': numCons,
+                           'density': density, 'rand_seed': seed}
+    return instances
+
+
+def _load(name, filename):
+    # the archived codes are not a package, they are loaded from their files
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(_ARCHIVED, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ArchivedSolvers():
+    '''
+    The baselines that can be loaded, as a dict of functions
+    solve(T, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS, **options) returning
+    the objective value, and the reasons the others cannot.
+    '''
+    solvers, skipped = {}, {}
+    try:
+        cylp = _load('archived_cylp', 'BranchAndBoundCylp.py')
+        solvers[ARCHIVED_CYLP] = lambda *args, **options: \
+            cylp.BranchAndBoundCylp(*args, **options)[0]
+    except ImportError as error:
+        skipped[ARCHIVED_CYLP] = repr(error)
+    try:
+        # the GrUMPy code imports BBTree from its own package
+        grumpy = _load('coinor.grumpy.archived', 'grumpy/BranchAndBound.py')
+        solvers[ARCHIVED_PULP] = lambda *args, **options: \
+            grumpy.BranchAndBound(*args, **options)[1]
+    except ImportError as error:
+        skipped[ARCHIVED_PULP] = repr(error)
+    return solvers, skipped
+
+
+@contextlib.contextmanager
+def _quiet():
+    # the archived codes print every node, and Clp and the CBC run by PuLP
+    # write to the file descriptor itself
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                yield
+        finally:
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def _run_archived(solve, instance, config):
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = GenerateRandomMIP(**instance)
+    T = BBTree()
+    T.set_display_mode('off')
+    start = time.time()
+    with _quiet():
+        LB = solve(T, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS, **config)
+    wall_time = time.time() - start
+    # the nodes drawn by the search, and the five nodes of the legend
+    return {'Wall Time': wall_time,
+            'Objective': LB if LB > -INFINITY else None,
+            'LP Solved': T._lp_count, 'Size': len(T.get_node_list()) - 5,
+            'Pivots': None}
+
+
+def RunBenchmark(instances=None, configs=None, repeat=3, archived=True,
+                 time_limit=None):
+    '''
+    Solve every instance under every configuration, repeat times.
+        instances: GenerateRandomMIP parameters keyed by name,
+                   BenchmarkInstances() if None
+        configs:   list of dicts of BranchAndBound options,
+                   BENCHMARK_CONFIGS if None; the archived baselines solve
+                   the ones with a branching strategy they know
+        repeat:    solves of every run, the fastest is reported
+        archived:  also solve with the archived baselines
+        time_limit: time limit in seconds of every BranchAndBound run, the
+                   archived codes have none
+    Returns the results as a dict: the machine, commit and date, the
+    instances and configurations, the baselines 'Skipped' with the reason,
+    and the 'Results', one row per solver, instance and configuration with
+    'Solver', 'Instance', 'Config', 'Objective', and the METRICS, None
+    where a solver does not count them.
+    The runs are serial, so that they do not compete for the machine.
+    '''
+    if instances is None:
+        instances = BenchmarkInstances()
+    if configs is None:
+        configs = BENCHMARK_CONFIGS
+    configs = dict((ConfigName(config), config) for config in configs)
+    rows = []
+    for k in range(repeat):
+        with _quiet():
+            batch = BatchSolve(instances, configs, workers=1,
+                               time_limit=time_limit)
+        if k == 0:
+            rows = [dict([('Solver', CYLP)] +
+                         [(key, row.get(key)) for key in
+                          ['Instance', 'Config', 'Objective'] + METRICS +
+                          ['Stop Reason', 'Error']])
+                    for row in batch]
+            continue
+        for fastest, row in zip(rows, batch):
+            fastest['Wall Time'] = min(fastest['Wall Time'], row['Wall Time'])
+    skipped = {}
+    if archived:
+        solvers, skipped = ArchivedSolvers()
+        for solver, solve in solvers.items():
+            for (instance_id, instance), (config_name, config) in \
+                    itertools.product(instances.items(), configs.items()):
+                if config.get('branch_strategy') not in ARCHIVED_STRATEGIES:
+                    continue
+                row = {'Solver': solver, 'Instance': instance_id,
+                       'Config': config_name}
+                try:
+                    runs = [_run_archived(solve, instance, config)
+                            for _ in range(repeat)]
+                    row.update(runs[0])
+                    row['Wall Time'] = min(run['Wall Time'] for run in runs)
+                except Exception as error:
+                    row['Error'] = repr(error)
+                rows.append(row)
+    return {'Date': datetime.datetime.now().isoformat(),
+            'Commit': _commit(), 'Machine': platform.platform(),
+            'Python': platform.python_version(), 'Repeat': repeat,
+            'Instances': instances, 'Configs': configs, 'Skipped': skipped,
+            'Results': rows}
+
+
+def _commit():
+    # the commit benchmarked, None outside of a git checkout
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def SaveBenchmark(path, results):
+    '''Write results of RunBenchmark to path as JSON.'''
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def LoadBenchmark(path):
+    '''Results written by SaveBenchmark.'''
+    with open(path) as f:
+        return json.load(f)
+
+
+def CompareBenchmarks(baseline, current, threshold=0.1, min_time=0.01,
+                      tol=1e-6):
+    '''
+    Compare two results of RunBenchmark.
+        threshold: relative noise threshold, the wall time of a solver and
+                   configuration is flagged when the geometric mean over
+                   the instances of current / baseline exceeds 1 + threshold
+        min_time:  wall times are taken as at least these seconds, the
+                   timer noise of very short runs
+        tol:       tolerance of the objective values
+    Single runs are too noisy for their wall times to be compared, but the
+    LP, node and pivot counts do not vary between runs, so any increase of
+    them is flagged run by run, and so is a different objective value or a
+    new error.
+    Returns the regressions, dicts with 'Solver', 'Instance' (None for wall
+    times), 'Config', 'Metric', 'Baseline' and 'Current' (the total wall
+    times for wall times), and the geometric means of the wall time ratios,
+    keyed by "solver: configuration".
+    '''
+    base = dict(((row['Solver'], row['Instance'], row['Config']), row)
+                for row in baseline['Results'])
+    regressions, times = [], {}
+    for row in current['Results']:
+        key = (row['Solver'], row['Instance'], row['Config'])
+        if key not in base:
+            continue
+        old = base[key]
+
+        def flag(metric):
+            regressions.append({'Solver': key[0], 'Instance': key[1],
+                                'Config': key[2], 'Metric': metric,
+                                'Baseline': old.get(metric),
+                                'Current': row.get(metric)})
+
+        if row.get('Error'):
+            if not old.get('Error'):
+                flag('Error')
+            continue
+        if old.get('Error'):
+            continue
+        if (row['Objective'] is None) != (old['Objective'] is None) or \
+                row['Objective'] is not None and \
+                abs(row['Objective'] - old['Objective']) > tol:
+            flag('Objective')
+        for metric in ['LP Solved', 'Size', 'Pivots']:
+            if row.get(metric) is not None and old.get(metric) is not None \
+                    and row[metric] > old[metric]:
+                flag(metric)
+        times.setdefault(key[::2], []).append(
+            (max(old['Wall Time'], min_time), max(row['Wall Time'], min_time)))
+    means = {}
+    for (solver, config), pairs in times.items():
+        old, new = np.array(pairs).T
+        means['%s: %s' % (solver, config)] = ratio = \
+            math.exp(np.mean(np.log(new / old)))
+        if ratio > 1 + threshold:
+            regressions.append({'Solver': solver, 'Instance': None,
+                                'Config': config, 'Metric': 'Wall Time',
+                                'Baseline': old.sum(), 'Current': new.sum()})
+    return regressions, means
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Branch and bound benchmark')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmark')
+    run.add_argument('--out', default='benchmark.json',
+                     help='results file (default: benchmark.json)')
+    run.add_argument('--repeat', type=int, default=3,
+                     help='solves of every run, the fastest counts')
+    run.add_argument('--time-limit', type=float, default=None,
+                     help='time limit in seconds of every run')
+    run.add_argument('--no-archived', action='store_true',
+                     help='skip the archived baselines')
+    compare = commands.add_parser('compare', help='compare two results')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help='relative wall time noise (default: 0.1)')
+    compare.add_argument('--min-time', type=float, default=0.01,
+                         help='absolute wall time noise in seconds')
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = RunBenchmark(repeat=args.repeat,
+                               archived=not args.no_archived,
+                               time_limit=args.time_limit)
+        SaveBenchmark(args.out, results)
+        for solver, reason in results['Skipped'].items():
+            print("Skipped %s: %s" % (solver, reason))
+        print("%s runs written to %s" % (len(results['Results']), args.out))
+        return 0
+    regressions, means = CompareBenchmarks(
+        LoadBenchmark(args.baseline), LoadBenchmark(args.current),
+        args.threshold, args.min_time)
+    for name, ratio in sorted(means.items()):
+        print("%-60s %.3f" % (name, ratio))
+    for r in regressions:
+        print("REGRESSION %s: %s, %s, %s: %s -> %s" % (
+            r['Solver'], r['Config'], r['Instance'] or 'all instances',
+            r['Metric'], r['Baseline'], r['Current']))
+    print("%s regressions" % len(regressions))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
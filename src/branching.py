@@ -0,0 +1,187 @@
+'''
+File: branching.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-23 11:05
+Last Modified: 2020-05-23 11:05
+--------------------------------------------
+Description:
+Choice of the branching variable at a node, shared by the serial loop in
+cylpBranchAndBound.py and by the node workers of parallelSearch.py.
+'''
+import math
+import time
+import numpy as np
+from coinor.grumpy import MOST_FRACTIONAL, FIXED_BRANCHING, PSEUDOCOST_BRANCHING
+from coinor.grumpy import DEPTH_FIRST, BEST_FIRST, BEST_ESTIMATE
+try:
+    from .strongBranching import StrongBranch, ProbeBounds
+    from .pseudocost import Score, TopCandidates
+    from .pseudocost import MIN_SCORE, WEIGHTED_SCORE
+except ImportError:
+    from strongBranching import StrongBranch, ProbeBounds
+    from pseudocost import Score, TopCandidates
+    from pseudocost import MIN_SCORE, WEIGHTED_SCORE
+
+RELIABILITY_BRANCHING = 'Reliability Branching'
+HYBRID = 'hybrid'
+
+
+def UpdatePseudocost(pseudo, branch_var, sense, rhs, branch_var_value,
+                     parent_obj, relax):
+    '''Fold the objective change of a solved child into the pseudocosts.'''
+    if sense == '<=':
+        pseudo.update(branch_var, sense,
+                      (parent_obj - relax) / (branch_var_value - rhs))
+    else:
+        pseudo.update(branch_var, sense,
+                      (parent_obj - relax) / (rhs - branch_var_value))
+
+
+def ChildPriorities(search_strategy, cur_depth, relax, value, pseudo,
+                    branching_var):
+    '''Queue priorities of the down and the up child.'''
+    if search_strategy == DEPTH_FIRST:
+        priority = (-cur_depth - 1, -cur_depth - 1)
+    elif search_strategy == BEST_FIRST:
+        priority = (-relax, -relax)
+    elif search_strategy == BEST_ESTIMATE:
+        priority = (-relax - pseudo.mean_d(branching_var) *
+                    (math.floor(value) - value),
+                    -relax + pseudo.mean_u(branching_var) *
+                    (math.ceil(value) - value))
+    return priority
+
+
+def Fractionality(var_values, integer=None):
+    '''
+    Distance of every component of the LP solution to the nearest integer
+    and the indices of the fractional components, in one pass. Components
+    that are not integer (integer mask, None if all are) count as integral.
+    '''
+    down = var_values - np.floor(var_values)
+    up = np.ceil(var_values) - var_values
+    if integer is not None:
+        down = np.where(integer, down, 0)
+        up = np.where(integer, up, 0)
+    return np.minimum(down, up), np.flatnonzero(down > 1e-8), down, up
+
+
+def _last_argmax(scores):
+    # index of the last maximum, the element sorted() puts at the end
+    return len(scores) - 1 - int(np.argmax(scores[::-1]))
+
+
+def BranchingVariable(branch_strategy, var_values, relax, pseudo,
+                      s=None, rel_param=(4, 3, 1 / 6, 5), average_num_pivot=0,
+                      sb_pool=None, score_rule=None, integer=None):
+    '''
+        var_values: rounded LP solution of the node as a numpy array
+        relax:      objective value of the node LP (maximization)
+        pseudo:     Pseudocost tables
+        score_rule: MIN_SCORE, WEIGHTED_SCORE or PRODUCT_SCORE, None for the
+                    rule of the strategy (WEIGHTED_SCORE for reliability
+                    branching and MIN_SCORE otherwise)
+        s:          solved node CyClpSimplex, used by strong branching
+        sb_pool:    StrongBranchingPool that has already been given the node
+        integer:    mask of the integer variables, None if all are
+    Returns the branching variable and a dict of the LP's solved (lp_count,
+    full_solved, half_solved) and time spent (sb_time) in strong branching.
+    '''
+    eta_rel, gamma, mu, lam = rel_param
+    branching_var = None
+    counts = {'lp_count': 0, 'full_solved': 0, 'half_solved': 0, 'sb_time': 0.0}
+    frac, candidates, down, up = Fractionality(var_values, integer)
+    if branch_strategy == FIXED_BRANCHING:
+        # fixed order, first fractional variable
+        fractional = np.flatnonzero(frac > 0)
+        if len(fractional):
+            branching_var = int(fractional[0])
+    elif branch_strategy == MOST_FRACTIONAL:
+        # most fractional variable
+        branching_var = int(np.argmax(frac))
+    elif branch_strategy == PSEUDOCOST_BRANCHING:
+        scores = pseudo.score(candidates, down[candidates], up[candidates],
+                              score_rule or MIN_SCORE, mu)
+        branching_var = int(candidates[_last_argmax(scores)])
+
+    elif branch_strategy == RELIABILITY_BRANCHING:
+        # Calculating Scores
+        # The algorithm in paper is different from the one in Grumpy
+        # I will try to use paper notations
+        score_rule = score_rule or WEIGHTED_SCORE
+        qm, qp = pseudo.estimates(candidates, down[candidates], up[candidates])
+        scores = Score(qm, qp, score_rule, mu)
+
+        # unreliable candidates by decreasing score, ties in index order
+        unreliable = np.flatnonzero(~pseudo.reliable[candidates])
+        unreliable = unreliable[np.argsort(-scores[unreliable], kind='stable')]
+
+        no_change = 0  # number of iterations that maximum of scores is not changed
+        smax = scores.max()  # current maximum of scores
+
+        def reliability_score(j, left_status, left_obj, right_status, right_obj):
+            # score candidate j once both directions are probed and
+            # tell the strong branching loop whether to stop
+            nonlocal smax, no_change
+            k = unreliable[j]
+            qmk, qpk = qm[k], qp[k]
+            if left_status in [0, 3]:
+                qmk = relax + left_obj  # use a more reliable source to update q^-
+            if right_status in [0, 3]:
+                qpk = relax + right_obj   # use a more reliable source to update q^+
+            scores[k] = Score(qmk, qpk, score_rule, mu)
+            if (smax == scores[k]):
+                no_change += 1
+            elif (smax <= scores[k]):
+                no_change = 0
+                smax = scores[k]
+            else:
+                no_change = 0
+            return no_change >= lam
+
+        # down and up probes of all unreliable candidates on the node LP
+        sb_start = time.time()
+        left_status, _, right_status, _ = StrongBranch(
+            s if sb_pool is None else sb_pool, candidates[unreliable],
+            var_values[candidates[unreliable]], gamma, stop=reliability_score)
+        counts['sb_time'] += time.time() - sb_start
+        # If the LP is fully solved, counter plus one
+        sb_full = int(np.sum(left_status == 0) + np.sum(right_status == 0))
+        counts['full_solved'] += sb_full
+        counts['lp_count'] += sb_full
+        counts['half_solved'] += int(np.sum(left_status == 3) + np.sum(right_status == 3))
+        branching_var = int(candidates[_last_argmax(scores)])
+
+    elif branch_strategy == HYBRID:
+        scores = pseudo.score(candidates, down[candidates], up[candidates],
+                              score_rule or MIN_SCORE, mu)
+        # top half of the candidates by decreasing score
+        restricted_candidate_vars = candidates[
+            TopCandidates(scores, max(1, int(0.5 * len(candidates))))]
+        best_progress = 0
+        branch_candidate = None
+        sb_start = time.time()
+        sb_lowers = np.floor(var_values[restricted_candidate_vars])
+        sb_uppers = np.ceil(var_values[restricted_candidate_vars])
+        if sb_pool is not None:
+            sb_status, sb_obj = sb_pool.probe_bounds(
+                restricted_candidate_vars, sb_lowers, sb_uppers,
+                average_num_pivot * 2)
+        else:
+            sb_status, sb_obj = ProbeBounds(
+                s, restricted_candidate_vars, sb_lowers, sb_uppers,
+                average_num_pivot * 2)
+        counts['sb_time'] += time.time() - sb_start
+        counts['lp_count'] += int(np.sum(sb_status == 0))
+        for (i, obj) in zip(restricted_candidate_vars, sb_obj):
+            progress = relax - (-obj)
+            if (progress - best_progress) > 1e-8:
+                branch_candidate = int(i)
+                best_progress = progress
+        if branch_candidate is None:
+            branch_candidate = int(restricted_candidate_vars[0])
+        branching_var = branch_candidate
+
+    else:
+        raise ValueError("Unknown branching strategy %s" % branch_strategy)
+    return branching_var, counts
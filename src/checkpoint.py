@@ -0,0 +1,137 @@
+'''
+File: checkpoint.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-30 09:40
+Last Modified: 2020-05-30 09:40
+--------------------------------------------
+Description:
+Checkpoints of the serial tree search. The state of the search is a set of
+named numpy arrays (the open nodes with their warm start bases, the node
+store, the pseudocost tables and their reliability counts, the cut pool)
+and a dict of scalars (incumbent value, counters), written together to one
+compressed .npz file. The scalars are stored as JSON bytes, so the file is
+read back without unpickling anything. A checkpoint is written next to the
+old one and then moved over it, so a run killed while writing still
+leaves the previous checkpoint behind.
+SearchCheckpoint keeps the timing of the checkpoints of a search and packs
+the parts of the search that have save_state and load_state methods.
+'''
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+
+def PackState(prefix, state):
+    '''Arrays of state (a dict) under names prefixed by prefix.'''
+    return dict(('%s.%s' % (prefix, name), np.asarray(value))
+                for name, value in state.items())
+
+
+def UnpackState(prefix, arrays):
+    '''The arrays of arrays packed under prefix, by their own names.'''
+    start = len(prefix) + 1
+    return dict((name[start:], value) for name, value in arrays.items()
+                if name.startswith(prefix + '.'))
+
+
+def Fingerprint(arrays, values):
+    '''
+    Fingerprint of a search for its checkpoints: the SHA-1 digest of the
+    arrays that define the problem, with their types and shapes, followed
+    by values, the options that change the search.
+    '''
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(('%s%s' % (array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+    return [digest.hexdigest()] + list(values)
+
+
+def _plain(value):
+    # numpy scalars among the scalars as their Python values
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("%r cannot be written to a checkpoint" % (value,))
+
+
+def SaveCheckpoint(path, arrays, scalars):
+    '''
+    Write the arrays (a dict of numpy arrays) and the scalars (a dict of
+    JSON values) to path.
+    '''
+    data = dict(arrays)
+    scalars = json.dumps(scalars, default=_plain).encode()
+    data['scalars'] = np.frombuffer(scalars, dtype=np.uint8)
+    partial = path + '.partial'
+    with open(partial, 'wb') as f:
+        np.savez_compressed(f, **data)
+    os.replace(partial, path)
+
+
+def LoadCheckpoint(path):
+    '''The arrays and the scalars of a checkpoint written by SaveCheckpoint.'''
+    with np.load(path, allow_pickle=False) as data:
+        arrays = dict((name, data[name]) for name in data.files
+                      if name != 'scalars')
+        scalars = json.loads(data['scalars'].tobytes().decode())
+    return arrays, scalars
+
+
+class SearchCheckpoint(object):
+    '''
+    Checkpoints of a search, written to path every interval seconds.
+        fingerprint: JSON values that identify the problem and the options,
+                     a checkpoint written with another fingerprint is not
+                     resumed
+        attributes:
+            count:   checkpoints written, those before a resume included
+        methods:
+            due():                  True once interval seconds have passed
+                                    since the last checkpoint
+            save(parts, scalars):   write the save_state() arrays of every
+                                    part (a dict of objects by prefix) and
+                                    the scalars (a dict of JSON values)
+            load():                 read the checkpoint and return its
+                                    scalars
+            restore(parts):         load_state() every part from the
+                                    checkpoint read
+    '''
+
+    def __init__(self, path, interval, fingerprint):
+        self.path = path
+        self.interval = interval
+        # as read back from a checkpoint, tuples become lists
+        self.fingerprint = json.loads(json.dumps(fingerprint,
+                                                 default=_plain))
+        self.count = 0
+        self.last = time.time()
+        self.arrays = None
+
+    def due(self):
+        return time.time() - self.last >= self.interval
+
+    def save(self, parts, scalars):
+        self.count += 1
+        arrays = {}
+        for prefix, part in parts.items():
+            arrays.update(PackState(prefix, part.save_state()))
+        scalars = dict(scalars, fingerprint=self.fingerprint,
+                       checkpoints=self.count)
+        SaveCheckpoint(self.path, arrays, scalars)
+        self.last = time.time()
+
+    def load(self):
+        self.arrays, scalars = LoadCheckpoint(self.path)
+        if scalars['fingerprint'] != self.fingerprint:
+            raise ValueError("Checkpoint %s was written for another problem "
+                             "or other options" % self.path)
+        self.count = scalars['checkpoints']
+        self.last = time.time()
+        return scalars
+
+    def restore(self, parts):
+        for prefix, part in parts.items():
+            part.load_state(UnpackState(prefix, self.arrays))
@@ -0,0 +1,504 @@
+'''
+File: cuts.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-28 15:20
+Last Modified: 2020-05-28 15:20
+--------------------------------------------
+Description:
+Cutting planes. Gomory mixed-integer cuts are read off the rows of the
+optimal simplex tableau of the root LP, which are computed from the basis
+with a sparse LU factorization. Lifted cover cuts are separated for the
+knapsack rows, at the root and optionally at the nodes. All cuts are
+globally valid and go through a pool that removes duplicates, ages out the
+cuts that stay satisfied and is checked before separating again.
+The root cut loop adds the cuts to the persistent root LP and reoptimizes
+with the dual simplex until the bound stalls, the cuts that are binding in
+the end are appended to MAT x <= RHS and the search runs on the tightened
+formulation.
+'''
+import time
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+try:
+    from .lpEngine import PersistentLP
+except ImportError:
+    from lpEngine import PersistentLP
+
+GOMORY_CUTS = 'Gomory'
+COVER_CUTS = 'Cover'
+CUTS = [GOMORY_CUTS, COVER_CUTS]
+
+# Clp basis status of a basic column or row
+_BASIC = 1
+
+
+def GomoryCuts(MAT, RHS, lower, upper, x, cstat, rstat, max_cuts=100,
+               away=.005, max_dynamism=1e6, min_efficacy=1e-4, integer=None):
+    '''
+    Gomory mixed-integer cuts of the optimal basis (cstat, rstat from
+    getBasisStatus) with solution x of max -OBJ x s.t. MAT x <= RHS,
+    lower <= x <= upper, x integer where integer (all if None). The slack
+    of a row is integer if its variables, its coefficients and its right
+    hand side are. Returns the cuts as a sparse
+    matrix and right hand sides in the form cut x <= rhs, at most max_cuts
+    of them by decreasing efficacy (violation over norm).
+    '''
+    m, n = MAT.shape
+    MAT = sp.csr_matrix(MAT)
+    RHS = np.asarray(RHS, dtype=float)
+    if integer is None:
+        integer = np.ones(n, dtype=bool)
+    basic_cols = np.flatnonzero(cstat == _BASIC)
+    basic_rows = np.flatnonzero(rstat == _BASIC)
+    if len(basic_cols) + len(basic_rows) != m:
+        return sp.csr_matrix((0, n)), np.zeros(0)
+    # rows of the tableau of the fractional basic variables
+    f0 = x[basic_cols] - np.floor(x[basic_cols])
+    source = np.flatnonzero((np.minimum(f0, 1 - f0) > away) &
+                            integer[basic_cols])
+    if not len(source):
+        return sp.csr_matrix((0, n)), np.zeros(0)
+    B = sp.hstack([MAT[:, basic_cols],
+                   sp.identity(m, format='csr')[:, basic_rows]]).tocsc()
+    try:
+        lu = splu(B)
+    except RuntimeError:
+        return sp.csr_matrix((0, n)), np.zeros(0)
+    E = np.zeros((m, len(source)))
+    E[source, np.arange(len(source))] = 1
+    rho = lu.solve(E, trans='T')  # rows of B^-1
+    tab_x = np.asarray(MAT.T.dot(rho))  # n x cuts
+    tab_s = rho  # m x cuts
+    f0 = f0[source]
+    # nonbasic columns in distance to their bound, t = x - l or u - x
+    nonbasic = cstat != _BASIC
+    at_upper = nonbasic & np.isfinite(upper) & (x >= upper - 1e-9)
+    at_lower = nonbasic & ~at_upper & np.isfinite(lower) & (x <= lower + 1e-9)
+    other = nonbasic & ~at_upper & ~at_lower
+    tab_x[~nonbasic] = 0
+    tab_x[at_upper] *= -1
+    tab_s[rstat == _BASIC] = 0
+    # rows whose tableau touches a nonbasic column between its bounds
+    keep = ~np.any(np.abs(tab_x[other]) > 1e-12, axis=0)
+    slack_integer = (np.abs(RHS - np.round(RHS)) < 1e-9) & (np.asarray(
+        (abs(MAT - MAT.floor()) > 1e-12).sum(axis=1)).ravel() == 0) & \
+        (abs(MAT).dot(~integer) == 0)
+
+    def integer_coef(a):
+        f = a - np.floor(a)
+        f[(f < 1e-9) | (f > 1 - 1e-9)] = 0
+        return np.where(f <= f0, f / f0, (1 - f) / (1 - f0))
+
+    def continuous_coef(a):
+        return np.where(a >= 0, a / f0, -a / (1 - f0))
+
+    # sum g_x t_x + sum g_s s >= 1
+    g_x = np.where(integer[:, None], integer_coef(tab_x),
+                   continuous_coef(tab_x))
+    g_x[np.abs(tab_x) < 1e-12] = 0
+    g_s = np.where(slack_integer[:, None], integer_coef(tab_s),
+                   continuous_coef(tab_s))
+    g_s[np.abs(tab_s) < 1e-12] = 0
+    # back to x: t = x - l at lower, u - x at upper and s = RHS - MAT x,
+    # and to the form cut x <= rhs
+    sign = np.where(at_upper, -1.0, 1.0)[:, None]
+    bound = np.where(at_upper, upper, np.where(at_lower, lower, 0))[:, None]
+    cut = -(sign * g_x) + np.asarray(MAT.T.dot(g_s))
+    rhs = -1 - (sign * g_x * bound).sum(axis=0) + RHS.dot(g_s)
+    cut = cut.T
+    # drop tiny coefficients, relaxing the right hand side by their
+    # largest contribution over the bounds
+    scale = np.abs(cut).max(axis=1)
+    keep &= scale > 0
+    scale[scale == 0] = 1
+    cut /= scale[:, None]
+    rhs /= scale
+    tiny = (np.abs(cut) < 1e-9) & (cut != 0)
+    if tiny.any():
+        low = np.where(np.isfinite(lower), lower, 0)
+        up = np.where(np.isfinite(upper), upper, 0)
+        keep &= ~np.any(tiny & ~(np.isfinite(lower) & np.isfinite(upper)),
+                        axis=1)
+        rhs -= np.where(tiny, np.minimum(cut * low, cut * up), 0).sum(axis=1)
+        cut[tiny] = 0
+    nonzero = np.abs(cut[cut != 0])
+    if not len(nonzero):
+        return sp.csr_matrix((0, n)), np.zeros(0)
+    keep &= np.min(np.where(cut != 0, np.abs(cut), np.inf), axis=1) * \
+        max_dynamism >= 1
+    norm = np.sqrt((cut ** 2).sum(axis=1))
+    efficacy = (cut.dot(x) - rhs) / np.maximum(norm, 1e-12)
+    keep &= efficacy > min_efficacy
+    chosen = np.flatnonzero(keep)
+    chosen = chosen[np.argsort(-efficacy[chosen], kind='stable')][:max_cuts]
+    return sp.csr_matrix(cut[chosen]), rhs[chosen]
+
+
+def KnapsackRows(MAT, RHS, lower, upper, integer=None):
+    '''
+    Rows a x <= b with a >= 0 on binary variables only and b >= 0, the
+    rows cover cuts are separated for.
+    '''
+    MAT = sp.csr_matrix(MAT)
+    binary = (np.asarray(lower) == 0) & (np.asarray(upper) == 1)
+    if integer is not None:
+        binary &= integer
+    negative = np.asarray((MAT < 0).sum(axis=1)).ravel() > 0
+    general = np.asarray(abs(MAT).dot(~binary)).ravel() > 0
+    return np.flatnonzero(~negative & ~general & (np.asarray(RHS) >= 0) &
+                          (np.diff(MAT.indptr) > 0))
+
+
+def LiftedCover(a, b, x):
+    '''
+    Lifted minimal cover inequality of the knapsack a y <= b, y binary, for
+    the LP values x of y. The cover C is chosen greedily by increasing
+    (1 - x) / a and made minimal by dropping the items of smallest x, then
+    sum_C y <= |C| - 1 is lifted sequentially, exactly, in order of
+    decreasing x with a dynamic program over the value of the cut.
+    Returns the coefficients and the right hand side, None if the row has
+    no cover.
+    '''
+    if a.sum() <= b:
+        return None
+    order = np.lexsort((-a, (1 - x) / a))
+    first = int(np.searchsorted(np.cumsum(a[order]), b, side='right'))
+    cover = order[:first + 1]
+    total = a[cover].sum()
+    minimal = []
+    for j in cover[np.lexsort((a[cover], x[cover]))].tolist():
+        if total - a[j] > b:
+            total -= a[j]
+        else:
+            minimal.append(j)
+    r = len(minimal)
+    alpha = np.zeros(len(a))
+    alpha[minimal] = 1
+    # weight[v]: least weight of a packing with cut value at least v
+    weight = np.concatenate(([0.0], np.cumsum(np.sort(a[minimal]))[:r - 1]))
+    rest = np.setdiff1d(np.arange(len(a)), minimal)
+    for j in rest[np.argsort(-x[rest], kind='stable')].tolist():
+        capacity = b - a[j]
+        if capacity < 0:
+            lift = r - 1
+        else:
+            lift = r - 1 - int(np.searchsorted(weight, capacity, side='right')
+                               - 1)
+        if lift <= 0:
+            continue
+        alpha[j] = lift
+        shifted = np.concatenate((np.zeros(lift), weight[:r - lift])) + a[j]
+        weight = np.minimum(weight, shifted[:r])
+    return alpha, r - 1
+
+
+def CoverCuts(MAT, RHS, rows, x, max_cuts=100, tol=1e-6):
+    '''
+    Violated lifted cover cuts of the knapsack rows of MAT x <= RHS at the
+    LP solution x, as a sparse matrix and right hand sides.
+    '''
+    MAT = sp.csr_matrix(MAT)
+    n = MAT.shape[1]
+    frac = np.abs(np.round(x) - x) > tol
+    cuts, rhs, violation = [], [], []
+    for i in rows.tolist():
+        start, end = MAT.indptr[i], MAT.indptr[i + 1]
+        columns = MAT.indices[start:end]
+        # only rows with a fractional variable can give a violated cut
+        if not frac[columns].any():
+            continue
+        # rows that are cuts carry round off in the right hand side, which
+        # the integral cover and lifting would turn into whole units
+        lifted = LiftedCover(MAT.data[start:end],
+                             RHS[i] + 1e-9 * max(abs(RHS[i]), 1), x[columns])
+        if lifted is None:
+            continue
+        alpha, beta = lifted
+        excess = alpha.dot(x[columns]) - beta
+        if excess > tol:
+            nonzero = alpha != 0
+            cuts.append(sp.csr_matrix((alpha[nonzero], (np.zeros(nonzero.sum()),
+                                                        columns[nonzero])),
+                                      shape=(1, n)))
+            rhs.append(beta)
+            violation.append(excess / np.sqrt((alpha ** 2).sum()))
+    if not cuts:
+        return sp.csr_matrix((0, n)), np.zeros(0)
+    chosen = np.argsort(-np.array(violation), kind='stable')[:max_cuts]
+    return sp.vstack([cuts[k] for k in chosen]).tocsr(), \
+        np.array(rhs, dtype=float)[chosen]
+
+
+class CutPool(object):
+    '''
+    Globally valid cuts cut x <= rhs, shared by the root and the nodes.
+    Cuts are identified by their coefficients scaled to a largest
+    coefficient of one, so a cut that is separated again maps to the one
+    in the pool.
+        max_age: a cut out of the LP that is not violated at max_age
+                 checks in a row is dropped from the pool
+        attributes:
+            in_lp:            the cut is a row of the LP
+            generated:        number of distinct cuts added
+            reused, evicted:  number of cuts found violated by a check
+                              and number of cuts dropped by age
+        methods:
+            add(cut, rhs):  ids of the cuts, new ones are appended
+            violated(x):    ids of the cuts out of the LP that x violates,
+                            the others age by one check
+            rows(ids):      cuts ids as a sparse matrix and right hand sides
+            save_state(), load_state(state): the pool as a dict of arrays,
+                            for checkpoints
+    '''
+
+    def __init__(self, numVars, max_age=20, tol=1e-6):
+        self.numVars = numVars
+        self.max_age = max_age
+        self.tol = tol
+        self.keys = {}
+        self.key = []
+        self.matrix = sp.csr_matrix((0, numVars))
+        self.rhs = np.zeros(0)
+        self.age = np.zeros(0, dtype=np.int64)
+        self.in_lp = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+        self.generated = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def add(self, cut, rhs):
+        cut = sp.csr_matrix(cut)
+        ids = []
+        new = []
+        for i in range(cut.shape[0]):
+            start, end = cut.indptr[i], cut.indptr[i + 1]
+            values = cut.data[start:end]
+            scale = np.abs(values).max()
+            key = cut.indices[start:end].tobytes() + \
+                np.round(values / scale, 9).tobytes() + \
+                np.round(rhs[i] / scale, 9).tobytes()
+            if key not in self.keys:
+                self.keys[key] = len(self.key)
+                self.key.append(key)
+                new.append(i)
+            ids.append(self.keys[key])
+        if new:
+            self.matrix = sp.vstack([self.matrix, cut[new]]).tocsr()
+            self.rhs = np.concatenate((self.rhs, np.asarray(rhs)[new]))
+            self.age = np.concatenate((self.age, np.zeros(len(new), dtype=np.int64)))
+            self.in_lp = np.concatenate((self.in_lp, np.zeros(len(new), dtype=bool)))
+            self.alive = np.concatenate((self.alive, np.ones(len(new), dtype=bool)))
+            self.generated += len(new)
+        return np.array(ids, dtype=np.int64)
+
+    def violated(self, x):
+        out = self.alive & ~self.in_lp
+        if not out.any():
+            return np.zeros(0, dtype=np.int64)
+        violated = out & (self.matrix.dot(x) - self.rhs > self.tol)
+        self.age[violated] = 0
+        self.age[out & ~violated] += 1
+        old = np.flatnonzero(out & (self.age > self.max_age))
+        if len(old):
+            self.alive[old] = False
+            for k in old.tolist():
+                del self.keys[self.key[k]]
+                self.key[k] = None
+            self.evicted += len(old)
+            # dropped cuts keep their row, emptied, so that ids stay valid
+            if self.evicted > len(self) + 1024:
+                self.matrix = sp.diags(self.alive.astype(float)).dot(
+                    self.matrix).tocsr()
+                self.matrix.eliminate_zeros()
+        ids = np.flatnonzero(violated)
+        self.reused += len(ids)
+        return ids
+
+    def rows(self, ids):
+        return self.matrix[ids], self.rhs[ids]
+
+    def save_state(self):
+        # keys of dropped cuts are None, their length is -1
+        keys = [key or b'' for key in self.key]
+        return {'data': self.matrix.data, 'indices': self.matrix.indices,
+                'indptr': self.matrix.indptr, 'rhs': self.rhs,
+                'age': self.age, 'in_lp': self.in_lp, 'alive': self.alive,
+                'key_data': np.frombuffer(b''.join(keys), dtype=np.uint8),
+                'key_len': np.array([-1 if key is None else len(key)
+                                     for key in self.key], dtype=np.int64),
+                'counts': np.array([self.generated, self.reused,
+                                    self.evicted], dtype=np.int64)}
+
+    def load_state(self, state):
+        self.matrix = sp.csr_matrix(
+            (state['data'], state['indices'], state['indptr']),
+            shape=(len(state['rhs']), self.numVars))
+        self.rhs = np.array(state['rhs'], dtype=float)
+        self.age = np.array(state['age'], dtype=np.int64)
+        self.in_lp = np.array(state['in_lp'], dtype=bool)
+        self.alive = np.array(state['alive'], dtype=bool)
+        data = state['key_data'].tobytes()
+        ends = np.cumsum(np.maximum(state['key_len'], 0))
+        self.key = [None if length < 0 else data[end - length:end]
+                    for length, end in zip(state['key_len'].tolist(),
+                                           ends.tolist())]
+        self.keys = dict((key, k) for k, key in enumerate(self.key)
+                         if key is not None)
+        self.generated, self.reused, self.evicted = \
+            state['counts'].tolist()
+
+
+def _separate(separators, pool, engine, MAT, RHS, knapsack, lp_cuts, x,
+              integer=None):
+    # new cuts of separators at the LP solution x, as pool ids
+    found = []
+    if GOMORY_CUTS in separators:
+        # the tableau is the one of the LP, with the cuts in it
+        rows, rhs = pool.rows(lp_cuts)
+        cstat, rstat = engine.simplex.getBasisStatus()
+        cut, rhs = GomoryCuts(sp.vstack([MAT, rows]).tocsr(),
+                              np.concatenate((RHS, rhs)), engine.lower,
+                              engine.upper, x, np.asarray(cstat),
+                              np.asarray(rstat), integer=integer)
+        found.append(pool.add(cut, rhs))
+    if COVER_CUTS in separators:
+        cut, rhs = CoverCuts(MAT, RHS, knapsack, x)
+        found.append(pool.add(cut, rhs))
+    ids = np.unique(np.concatenate(found)) if found else \
+        np.zeros(0, dtype=np.int64)
+    return ids[~pool.in_lp[ids]], [len(ids) for ids in found]
+
+
+def RootCutLoop(OBJ, MAT, RHS, lower, upper, solver='dynamic',
+                separators=CUTS, max_rounds=10, stall=1e-3, pool=None,
+                integer=None, log=None):
+    '''
+    Rounds of separation on the root LP. Every round first checks the cut
+    pool and runs separators only if no pooled cut is violated, adds the
+    cuts to the LP and reoptimizes with the dual simplex from the current
+    basis, with the new rows basic. Stops after max_rounds, when no cut is
+    found, or when a round improves the bound by less than stall relative
+    to the bound. Returns MAT and RHS with the cuts binding at the last LP
+    appended and the statistics of the loop; all cuts stay in pool. The
+    summary of the loop goes to the SearchLog log.
+    '''
+    for name in separators:
+        if name not in CUTS:
+            raise ValueError("Unknown cut separator %s" % name)
+    start = time.time()
+    MAT = sp.csr_matrix(MAT, dtype=float)
+    RHS = np.asarray(RHS, dtype=float)
+    if pool is None:
+        pool = CutPool(MAT.shape[1])
+    knapsack = KnapsackRows(MAT, RHS, lower, upper, integer)
+    engine = PersistentLP(OBJ, MAT, RHS, lower, upper, solver)
+    s = engine.solve()
+    stat = {'Cut Rounds': 0, 'Cuts Generated': 0, 'Cuts Added': 0,
+            'Root Bound': None, 'Root Bound After Cuts': None,
+            'Cuts by Separator': dict.fromkeys(separators, 0)}
+    if s.getStatusCode() != 0:
+        stat['Cut Time'] = int(np.ceil((time.time() - start) * 1000))
+        return MAT, RHS, stat
+    bound = stat['Root Bound'] = -s.objectiveValue
+    lp_cuts = np.zeros(0, dtype=np.int64)  # pool ids of the LP rows
+    generated = pool.generated
+    for _ in range(max_rounds):
+        x = np.array(engine.x)
+        ids = pool.violated(x)
+        if not len(ids):
+            ids, counts = _separate(separators, pool, engine, MAT, RHS,
+                                    knapsack, lp_cuts, x, integer)
+            for name, count in zip([name for name in CUTS
+                                    if name in separators], counts):
+                stat['Cuts by Separator'][name] += count
+        if not len(ids):
+            break
+        stat['Cut Rounds'] += 1
+        engine.add_rows(*pool.rows(ids))
+        pool.in_lp[ids] = True
+        lp_cuts = np.concatenate((lp_cuts, ids))
+        s = engine.resolve(engine.lower, engine.upper)
+        if s.getStatusCode() != 0:
+            break
+        previous, bound = bound, -s.objectiveValue
+        if previous - bound < stall * max(abs(bound), 1):
+            break
+    stat['Cuts Generated'] = pool.generated - generated
+    # the cuts binding at the last LP become constraints, the others
+    # wait in the pool
+    if len(lp_cuts):
+        rows, rhs = pool.rows(lp_cuts)
+        if s.getStatusCode() == 0:
+            binding = rhs - rows.dot(np.asarray(engine.x)) <= 1e-6
+        else:
+            binding = np.ones(len(lp_cuts), dtype=bool)
+        pool.in_lp[lp_cuts[~binding]] = False
+        MAT = sp.vstack([MAT, rows[binding]]).tocsr()
+        RHS = np.concatenate((RHS, rhs[binding]))
+        stat['Cuts Added'] = int(binding.sum())
+    stat['Root Bound After Cuts'] = bound
+    stat['Cut Time'] = int(np.ceil((time.time() - start) * 1000))
+    if log is not None and log.summary:
+        log.write("Root cuts: %s added in %s rounds, bound %s -> %s",
+                  stat['Cuts Added'], stat['Cut Rounds'], stat['Root Bound'],
+                  stat['Root Bound After Cuts'])
+    return MAT, RHS, stat
+
+
+def NodeCuts(engine, pool, MAT, RHS, knapsack, lower, upper, LB, rounds=1,
+             integer=None):
+    '''
+    Cut rounds at a node on the persistent LP engine, solved under the
+    node bounds lower, upper. Violated cuts of the pool come first and
+    cover cuts of the knapsack rows are separated only if there are none.
+    The cuts are globally valid and stay in the LP for the rest of the
+    search. Returns the simplex, the number of cuts added and the number of
+    LPs solved.
+    '''
+    s = engine.simplex
+    added = lp_count = 0
+    for _ in range(rounds):
+        if s.getStatusCode() != 0 or -s.objectiveValue <= LB:
+            break
+        x = np.array(engine.x)
+        frac = np.abs(np.round(x) - x) > .001
+        if not np.any(frac if integer is None else frac & integer):
+            break
+        ids = pool.violated(x)
+        if not len(ids):
+            ids = _separate([COVER_CUTS], pool, engine, MAT, RHS, knapsack,
+                            None, x)[0]
+        if not len(ids):
+            break
+        engine.add_rows(*pool.rows(ids))
+        pool.in_lp[ids] = True
+        added += len(ids)
+        s = engine.resolve(lower, upper)
+        lp_count += 1
+    return s, added, lp_count
+
+
+def CutStats(stat, pool, LB):
+    '''
+    Stats of the cuts of a search: those of the root cut loop (stat), the
+    root gap they closed against the incumbent value LB and the pool.
+    '''
+    stat = dict(stat)
+    stat['Root Gap Closed'] = RootGapClosed(stat, LB)
+    stat['Pool Size'] = len(pool)
+    stat['Cuts from Pool'] = pool.reused
+    stat['Pool Evicted'] = pool.evicted
+    return stat
+
+
+def RootGapClosed(stat, LB):
+    '''Share of the gap between the root bound and LB closed by the cuts.'''
+    before = stat['Root Bound']
+    after = stat['Root Bound After Cuts']
+    if before is None or after is None or not before > LB:
+        return None
+    return (before - after) / (before - LB)
@@ -7,21 +7,102 @@ Last Modified: 2020-05-14 01:33
 Description:
 Modified based on coinor.grumpy
 '''
-import sys
 import math
 import time
-from coinor.blimpy import PriorityQueue
-from past.utils import old_div
 from coinor.grumpy import BBTree
 from coinor.grumpy import MOST_FRACTIONAL, FIXED_BRANCHING, PSEUDOCOST_BRANCHING
 from coinor.grumpy import DEPTH_FIRST, BEST_FIRST, BEST_ESTIMATE, INFINITY
 import numpy as np
+import scipy.sparse as sp
 from cylp.cy.CyClpSimplex import CyClpSimplex
+from cylp.cy.CyCoinPackedMatrix import CyCoinPackedMatrix
 from cylp.py.modeling.CyLPModel import CyLPModel, CyLPArray
+try:
+    from .lpEngine import PersistentLP
+    from .pseudocost import Pseudocost
+    from .nodeStore import NodeStore
+    from .strongBranching import StrongBranchingPool
+    from .parallelSearch import ParallelSearch
+    from .branching import BranchingVariable, UpdatePseudocost, ChildPriorities
+    from .branching import RELIABILITY_BRANCHING, HYBRID
+    from .searchLog import SearchLog, SILENT
+    from .searchTree import LiveTree, TreeRecorder
+    from .openNodes import OpenNodes
+    from .searchLimits import SearchLimits, Gap
+    from .searchLimits import OPTIMAL, INFEASIBLE
+    from .heuristics import PrimalHeuristics
+    from .reducedCostFixing import ReducedCostFixing
+    from .propagation import BoundPropagator
+    from .presolve import Presolve
+    from .cuts import RootCutLoop, CutStats, NodeCuts, KnapsackRows, CutPool
+    from .checkpoint import SearchCheckpoint, Fingerprint
+    # the lp engines are also imported from here
+    from .searchOptions import SearchOptions, REBUILD_LP, PERSISTENT_LP
+    from .searchSteps import EvaluateSolution, NodeStatus, Incumbent, \
+        SearchCounters, NodePruned, RunHeuristics, IncumbentImproved, \
+        AddChildren, SearchStats
+except ImportError:
+    from lpEngine import PersistentLP
+    from pseudocost import Pseudocost
+    from nodeStore import NodeStore
+    from strongBranching import StrongBranchingPool
+    from parallelSearch import ParallelSearch
+    from branching import BranchingVariable, UpdatePseudocost, ChildPriorities
+    from branching import RELIABILITY_BRANCHING, HYBRID
+    from searchLog import SearchLog, SILENT
+    from searchTree import LiveTree, TreeRecorder
+    from openNodes import OpenNodes
+    from searchLimits import SearchLimits, Gap
+    from searchLimits import OPTIMAL, INFEASIBLE
+    from heuristics import PrimalHeuristics
+    from reducedCostFixing import ReducedCostFixing
+    from propagation import BoundPropagator
+    from presolve import Presolve
+    from cuts import RootCutLoop, CutStats, NodeCuts, KnapsackRows, CutPool
+    from checkpoint import SearchCheckpoint, Fingerprint
+    # the lp engines are also imported from here
+    from searchOptions import SearchOptions, REBUILD_LP, PERSISTENT_LP
+    from searchSteps import EvaluateSolution, NodeStatus, Incumbent, \
+        SearchCounters, NodePruned, RunHeuristics, IncumbentImproved, \
+        AddChildren, SearchStats
 
 
-RELIABILITY_BRANCHING = 'Reliability Branching'
-HYBRID = 'hybrid'
+def ToSparseMatrix(MAT, VARIABLES):
+    '''
+    Constraint matrix as a scipy.sparse CSR matrix with one column per
+    variable. MAT is either the dict of columns returned by
+    GenerateRandomMIP, a scipy.sparse matrix (rows are constraints) or a
+    CyCoinPackedMatrix.
+    '''
+    if sp.issparse(MAT):
+        return sp.csr_matrix(MAT, dtype=float)
+    if isinstance(MAT, CyCoinPackedMatrix):
+        MAT.removeGaps()
+        nnz = MAT.nElements
+        data = (np.asarray(MAT.elements)[:nnz], np.asarray(MAT.indices)[:nnz],
+                np.asarray(MAT.vectorStarts)[:MAT.majorDim + 1])
+        if MAT.isColOrdered:
+            return sp.csc_matrix(data, shape=(MAT.minorDim, MAT.majorDim)).tocsr()
+        return sp.csr_matrix(data, shape=(MAT.majorDim, MAT.minorDim))
+    return sp.csr_matrix(np.array([MAT[v] for v in VARIABLES], dtype=float).T)
+
+
+def VariableArray(spec, VARIABLES, default):
+    '''
+    Values of a per variable option in the order of VARIABLES. spec is a
+    dict keyed by variable name, where the variables left out take default,
+    a sequence in the order of VARIABLES, or None for default everywhere.
+    '''
+    values = np.full(len(VARIABLES), default, dtype=float)
+    if spec is None:
+        return values
+    if isinstance(spec, dict):
+        for i, var in enumerate(VARIABLES):
+            if var in spec:
+                values[i] = spec[var]
+        return values
+    values[:] = np.asarray(spec, dtype=float)
+    return values
 
 
 def BranchAndBound(T, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
@@ -32,14 +113,25 @@ def BranchAndBound(T, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
                    binary_vars=True,
                    solver='dynamic',
                    rel_param=(4, 3, 1 / 6, 5),
-                   more_return=False
+                   more_return=False,
+                   options=None,
+                   **kwargs
                    ):
     """
+        T:
+            BBTree  - the search tree is drawn as the search runs
+            TreeRecorder - node outcomes are kept in arrays, the BBTree can
+                      be built afterwards with T.to_bbtree()
+            None    - no tree is kept (see also event_log and ReplayEvents)
         solver: 
             dynamic       - initialSolve
             primalSimplex - initialPrimalSolve 
             dualSimplex   - initialDualSolve
 
+        MAT:
+            dict of columns, scipy.sparse matrix (CSC or CSR, one row per
+            constraint) or CyCoinPackedMatrix; kept sparse up to Clp
+
         Parameter Tuple for Reliability Branching
         rel_param = (eta_rel,gamma,mu,lambda):
             eta_rel = 0       - psesudocost branching
@@ -53,526 +145,605 @@ def BranchAndBound(T, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
         more_return:
             False - return maximizer and max 
             True  - also return a dict of stats(time, tree size, LP solved)
+        options:
+            SearchOptions (searchOptions.py) or a dict of options, which can
+            also be given as keyword arguments, e.g. lp_engine=PERSISTENT_LP.
+            SearchOptions documents them all: the LP engine and warm start,
+            strong branching and node workers, the log, the open node
+            budget, the limits, primal heuristics, reduced cost fixing,
+            cuts, propagation, presolve, the bounds and integrality of the
+            variables and checkpoints
     """
+    if options is None:
+        options = SearchOptions(**kwargs)
+    elif isinstance(options, dict):
+        options = SearchOptions(**dict(options, **kwargs))
+    elif kwargs:
+        raise TypeError("Options are given either as a SearchOptions or as "
+                        "keyword arguments")
+    if options.checkpoint is not None and options.node_workers > 1:
+        raise ValueError("Checkpoints need a serial search (node_workers=1)")
+    if options.resume and options.checkpoint is None:
+        raise ValueError("resume=True needs the checkpoint file")
     ACTUAL_BRANCH_STRATEGY = branch_strategy
-    # reliability branching parameters
-    eta_rel, gamma, mu, lam = rel_param
-    # hybrid branching parameters
-    total_num_pivot = average_num_pivot = 0
+    # the problem as given, for the serial run a speedup is measured against
+    problem = (CONSTRAINTS, VARIABLES, OBJ, MAT, RHS)
+    persistent = options.lp_engine == PERSISTENT_LP
+    warm_start = options.warm_start and persistent
     # translate problems into cylp format
-    cyOBJ = CyLPArray([-val for val in OBJ.values()])
-    cyMAT = np.matrix([MAT[v] for v in VARIABLES]).T
-    cyRHS = CyLPArray(RHS)
-    OBJ = cyOBJ
-    MAT = cyMAT
-    RHS = cyRHS
-    if T.get_layout() == 'dot2tex':
-        cluster_attrs = {'name': 'Key', 'label': r'\text{Key}', 'fontsize': '12'}
-        T.add_node('C', label=r'\text{Candidate}', style='filled',
-                   color='yellow', fillcolor='yellow')
-        T.add_node('I', label=r'\text{Infeasible}', style='filled',
-                   color='orange', fillcolor='orange')
-        T.add_node('S', label=r'\text{Solution}', style='filled',
-                   color='lightblue', fillcolor='lightblue')
-        T.add_node('P', label=r'\text{Pruned}', style='filled',
-                   color='red', fillcolor='red')
-        T.add_node('PC', label=r'\text{Pruned}$\\ $\text{Candidate}', style='filled',
-                   color='red', fillcolor='yellow')
+    OBJ = CyLPArray([-val for val in OBJ.values()])
+    MAT = ToSparseMatrix(MAT, VARIABLES)
+    RHS = CyLPArray(RHS)
+    if binary_vars:
+        root_lower = VariableArray(options.lower, VARIABLES, 0)
+        root_upper = VariableArray(options.upper, VARIABLES, 1)
     else:
-        cluster_attrs = {'name': 'Key', 'label': 'Key', 'fontsize': '12'}
-        T.add_node('C', label='Candidate', style='filled',
-                   color='yellow', fillcolor='yellow')
-        T.add_node('I', label='Infeasible', style='filled',
-                   color='orange', fillcolor='orange')
-        T.add_node('S', label='Solution', style='filled',
-                   color='lightblue', fillcolor='lightblue')
-        T.add_node('P', label='Pruned', style='filled',
-                   color='red', fillcolor='red')
-        T.add_node('PC', label='Pruned \n Candidate', style='filled',
-                   color='red', fillcolor='yellow')
-    T.add_edge('C', 'I', style='invisible', arrowhead='none')
-    T.add_edge('I', 'S', style='invisible', arrowhead='none')
-    T.add_edge('S', 'P', style='invisible', arrowhead='none')
-    T.add_edge('P', 'PC', style='invisible', arrowhead='none')
-    T.create_cluster(['C', 'I', 'S', 'P', 'PC'], cluster_attrs)
-    # The initial lower bound
-    LB = -INFINITY
-    # The number of LP's solved, and the number of nodes solved
-    node_count = 1
-    iter_count = 0
-    lp_count = 0  # The problems that are fully solved during
-    # Reliability and Hybrid branching is also couned here
-    # For reliability branching
-    half_solved = 0  # record number problems been halfly solved when calculate scores
-    full_solved = 0  # record number problems been fully solved when calculate scores
-
-    numVars = len(VARIABLES)
-    # List of incumbent solution variable values
-    opt = dict([(i, 0) for i in range(len(VARIABLES))])
-    pseudo_u = dict((i, (-OBJ[i], 0)) for i in range(len(VARIABLES)))
-    pseudo_d = dict((i, (-OBJ[i], 0)) for i in range(len(VARIABLES)))
-
-    print("===========================================")
-    print("Starting Branch and Bound")
-    if branch_strategy == MOST_FRACTIONAL:
-        print("Most fractional variable")
-    elif branch_strategy == FIXED_BRANCHING:
-        print("Fixed order")
-    elif branch_strategy == PSEUDOCOST_BRANCHING:
-        print("Pseudocost brancing")
-    elif branch_strategy == RELIABILITY_BRANCHING:
-        print("Reliability branching")
-    elif branch_strategy == HYBRID:
-        print('Hybrid strong/pseduocost branching')
-    else:
-        print("Unknown branching strategy %s" % branch_strategy)
-    if search_strategy == DEPTH_FIRST:
-        print("Depth first search strategy")
-    elif search_strategy == BEST_FIRST:
-        print("Best first search strategy")
-    elif search_strategy == BEST_ESTIMATE:
-        print("Best estimate search strategy")
+        root_lower = VariableArray(options.lower, VARIABLES, -np.inf)
+        root_upper = VariableArray(options.upper, VARIABLES, np.inf)
+    integer = VariableArray(options.integer, VARIABLES, True).astype(bool)
+    # The problem as given and the options a checkpoint belongs to
+    fingerprint = None
+    if options.checkpoint is not None:
+        fingerprint = Fingerprint(
+            [OBJ, MAT.data, MAT.indices, MAT.indptr, RHS, root_lower,
+             root_upper, integer],
+            [ACTUAL_BRANCH_STRATEGY, search_strategy, complete_enumeration,
+             solver, rel_param] + options.search_options())
+    log = SearchLog(options.log_level, options.progress_interval,
+                    options.event_log)
+    limits = SearchLimits(options.time_limit, options.node_limit,
+                          options.relative_gap, options.absolute_gap)
+    if log.events:
+        log.event('start', variables=len(VARIABLES), constraints=len(RHS),
+                  branch_strategy=branch_strategy,
+                  search_strategy=search_strategy,
+                  lp_engine=options.lp_engine,
+                  node_workers=options.node_workers)
+    # Presolve, the search runs on the reduced problem
+    presolved = None
+    if options.presolve:
+        presolved = Presolve(OBJ, MAT, RHS, root_lower, root_upper,
+                             options.probing, integer=integer, log=log)
+        OBJ, MAT, RHS = (CyLPArray(presolved.OBJ), presolved.MAT,
+                         CyLPArray(presolved.RHS))
+        root_lower, root_upper = presolved.lower, presolved.upper
+        integer = presolved.integer
+    numVars = len(OBJ)
+    # Cutting planes at the root tighten the formulation of every node
+    cut_stat = cut_pool = None
+    if options.cuts:
+        cut_pool = CutPool(numVars)
+        MAT, RHS, cut_stat = RootCutLoop(OBJ, MAT, RHS, root_lower,
+                                         root_upper, solver, options.cuts,
+                                         options.cut_rounds, pool=cut_pool,
+                                         integer=integer, log=log)
+        RHS = CyLPArray(RHS)
+    # Search tree: drawn into a BBTree, recorded in arrays, or not kept
+    if T is None or isinstance(T, TreeRecorder):
+        tree = T
     else:
-        print("Unknown search strategy %s" % search_strategy)
-    print("===========================================")
-    # List of candidate nodes
-    Q = PriorityQueue()
-    # The current tree depth
-    cur_depth = 0
-    cur_index = 0
-    # Timer
-    timer = time.time()
-    Q.push(0, -INFINITY, (0, None, None, None, None, None, None))
-    # Branch and Bound Loop
-    while not Q.isEmpty():
-        # maximum allowed strong branch performed
-        if branch_strategy == HYBRID and cur_depth > max(int(len(VARIABLES) * 0.2), 5):
-            branch_strategy = PSEUDOCOST_BRANCHING
-            print("Switch from strong branch to psedocost branch")
-        infeasible = False
-        integer_solution = False
-        (cur_index, parent, relax, branch_var, branch_var_value, sense,
-         rhs) = Q.pop()
-        if cur_index is not 0:
-            cur_depth = T.get_node_attr(parent, 'level') + 1
-        else:
-            cur_depth = 0
-        print("")
-        print("----------------------------------------------------")
-        print("")
-        if LB > -INFINITY:
-            print("Node: %s, Depth: %s, LB: %s" % (cur_index, cur_depth, LB))
-        else:
-            print("Node: %s, Depth: %s, LB: %s" % (cur_index, cur_depth, "None"))
-        if relax is not None and relax <= LB:
-            print("Node pruned immediately by bound")
-            T.set_node_attr(parent, 'color', 'red')
-            continue
-        # ====================================
-        #    LP Relaxation
-        # ====================================
-        # Compute lower bound by LP relaxation
-        prob = CyLPModel()
-        if binary_vars:
-            x = prob.addVariable('x', dim=len(VARIABLES))
-            prob += 0 <= x <= 1
-        else:
-            x = prob.addVariable('x', dim=len(VARIABLES))
-        prob.objective = OBJ * x
-        prob += MAT * x <= RHS
-        # Fix all prescribed variables
-        branch_vars = []
-        if cur_index is not 0:
-            sys.stdout.write("Branching variables: ")
-            branch_vars.append(branch_var)
-            if sense == '>=':
-                prob += x[branch_var] >= rhs
-            else:
-                prob += x[branch_var] <= rhs
-            print('x_{}'.format(branch_var), end=' ')
-            pred = parent
-            while not str(pred) == '0':
-                pred_branch_var = T.get_node_attr(pred, 'branch_var')
-                pred_rhs = T.get_node_attr(pred, 'rhs')
-                pred_sense = T.get_node_attr(pred, 'sense')
-                if pred_sense == '<=':
-                    prob += x[pred_branch_var] <= pred_rhs
-                else:
-                    prob += x[pred_branch_var] >= pred_rhs
-                print(pred_branch_var, end=' ')
-                branch_vars.append(pred_branch_var)
-                pred = T.get_node_attr(pred, 'parent')
-            print()
-        # Solve the LP relaxation
-        s = CyClpSimplex(prob)
-        if solver == 'primalSimplex':
-            s.initialPrimalSolve()
-        elif solver == 'dualSimplex':
-            s.initialDualSolve()
-        else:
-            s.initialSolve()
-        lp_count = lp_count + 1
-        total_num_pivot += s.iteration
-        average_num_pivot = total_num_pivot / lp_count
-        # Check infeasibility
-        # -1 - unknown e.g. before solve or if postSolve says not optimal
-        # 0 - optimal
-        # 1 - primal infeasible
-        # 2 - dual infeasible
-        # 3 - stopped on iterations or time
-        # 4 - stopped due to errors
-        # 5 - stopped by event handler (virtual int ClpEventHandler::event())
-        infeasible = (s.getStatusCode() in [1, 2])
-        # Print status
-        if infeasible:
-            print("LP Solved, status: Infeasible")
-        else:
-            print("LP Solved, status: %s, obj: %s" % (s.getStatusString(),
-                                                      s.objectiveValue))
-        if(s.getStatusCode() == 0):
-            relax = -round(s.objectiveValue,7)
-            # Update pseudocost
-            if branch_var != None:
-                if sense == '<=':
-                    pseudo_d[branch_var] = (
-                        old_div((pseudo_d[branch_var][0] * pseudo_d[branch_var][1] +
-                                 old_div((T.get_node_attr(parent, 'obj') - relax),
-                                         (branch_var_value - rhs))),
-                                (pseudo_d[branch_var][1] + 1)),
-                        pseudo_d[branch_var][1] + 1)
-                else:
-                    pseudo_u[branch_var] = (
-                        old_div((pseudo_u[branch_var][0] * pseudo_d[branch_var][1] +
-                                 old_div((T.get_node_attr(parent, 'obj') - relax),
-                                         (rhs - branch_var_value))),
-                                (pseudo_u[branch_var][1] + 1)),
-                        pseudo_u[branch_var][1] + 1)
-            var_values = dict([(i, round(s.primalVariableSolution['x'][i],7))
-                               for i in range(len(VARIABLES))])
-            integer_solution = 1
-            for i in range(len(VARIABLES)):
-                if (abs(round(var_values[i]) - var_values[i]) > .001):
-                    integer_solution = 0
-                    break
-            # Determine integer_infeasibility_count and
-            # Integer_infeasibility_sum for scatterplot and such
-            integer_infeasibility_count = 0
-            integer_infeasibility_sum = 0.0
-            for i in range(len(VARIABLES)):
-                if (var_values[i] not in set([0, 1])):
-                    integer_infeasibility_count += 1
-                    integer_infeasibility_sum += min([var_values[i],
-                                                      1.0 - var_values[i]])
-            if (integer_solution and relax > LB):
-                LB = relax
-                for i in range(len(VARIABLES)):
-                    # These two have different data structures first one
-                    # list, second one dictionary
-                    opt[i] = var_values[i]
-                print("New best solution found, objective: %s" % relax)
-                for i in range(len(VARIABLES)):
-                    if var_values[i] > 0:
-                        print("%s = %s" % (i, var_values[i]))
-            elif (integer_solution and relax <= LB):
-                print("New integer solution found, objective: %s" % relax)
-                for i in range(len(VARIABLES)):
-                    if var_values[i] > 0:
-                        print("%s = %s" % (i, var_values[i]))
-            else:
-                print("Fractional solution:")
-                for i in range(len(VARIABLES)):
-                    if var_values[i] > 0:
-                        print("x%s = %s" % (i, var_values[i]))
-            # For complete enumeration
-            if complete_enumeration:
-                relax = LB - 1
-        else:
-            relax = INFINITY
-        if integer_solution:
-            print("Integer solution")
-            BBstatus = 'S'
-            status = 'integer'
-            color = 'lightblue'
-        elif infeasible:
-            print("Infeasible node")
-            BBstatus = 'I'
-            status = 'infeasible'
-            color = 'orange'
-        elif not complete_enumeration and relax <= LB:
-            print("Node pruned by bound (obj: %s, UB: %s)" % (relax, LB))
-            BBstatus = 'P'
-            status = 'fathomed'
-            color = 'red'
-        elif cur_depth >= numVars:
-            print("Reached a leaf")
-            BBstatus = 'fathomed'
-            status = 'L'
-        else:
-            BBstatus = 'C'
-            status = 'candidate'
-            color = 'yellow'
-        if BBstatus is 'I':
-            if T.get_layout() == 'dot2tex':
-                label = '\text{I}'
-            else:
-                label = 'I'
-        else:
-            label = "%.1f" % relax
-        if iter_count == 0:
-            if status is not 'candidate':
-                integer_infeasibility_count = None
-                integer_infeasibility_sum = None
-            if status is 'fathomed':
-                if T._incumbent_value is None:
-                    print('WARNING: Encountered "fathom" line before ' +
-                          'first incumbent.')
-            T.AddOrUpdateNode(0, None, None, 'candidate', relax,
-                              integer_infeasibility_count,
-                              integer_infeasibility_sum,
-                              label=label,
-                              obj=relax, color=color,
-                              style='filled', fillcolor=color)
-            if status is 'integer':
-                T._previous_incumbent_value = T._incumbent_value
-                T._incumbent_value = relax
-                T._incumbent_parent = -1
-                T._new_integer_solution = True
-    #           #Currently broken
-    #           if ETREE_INSTALLED and T.attr['display'] == 'svg':
-    #               T.write_as_svg(filename = "node%d" % iter_count,
-    #                                 nextfile = "node%d" % (iter_count + 1),
-    #                                 highlight = cur_index)
-        else:
-            _direction = {'<=': 'L', '>=': 'R'}
-            if status is 'infeasible':
-                integer_infeasibility_count = T.get_node_attr(parent,
-                                                              'integer_infeasibility_count')
-                integer_infeasibility_sum = T.get_node_attr(parent,
-                                                            'integer_infeasibility_sum')
-                relax = T.get_node_attr(parent, 'lp_bound')
-            elif status is 'fathomed':
-                if T._incumbent_value is None:
-                    print('WARNING: Encountered "fathom" line before' +
-                          ' first incumbent.')
-                    print('  This may indicate an error in the input file.')
-            elif status is 'integer':
-                integer_infeasibility_count = None
-                integer_infeasibility_sum = None
-            T.AddOrUpdateNode(cur_index, parent, _direction[sense],
-                              status, relax,
-                              integer_infeasibility_count,
-                              integer_infeasibility_sum,
-                              branch_var=branch_var,
-                              branch_var_value=var_values[branch_var],
-                              sense=sense, rhs=rhs, obj=relax,
-                              color=color, style='filled',
-                              label=label, fillcolor=color)
-            if status is 'integer':
-                T._previous_incumbent_value = T._incumbent_value
-                T._incumbent_value = relax
-                T._incumbent_parent = parent
-                T._new_integer_solution = True
-            # Currently Broken
-    #           if ETREE_INSTALLED and T.attr['display'] == 'svg':
-    #               T.write_as_svg(filename = "node%d" % iter_count,
-    #                                 prevfile = "node%d" % (iter_count - 1),
-    #                                 nextfile = "node%d" % (iter_count + 1),
-    #                                 highlight = cur_index)
-            if T.get_layout() == 'dot2tex':
-                _dot2tex_label = {'>=': ' \geq ', '<=': ' \leq '}
-                T.set_edge_attr(parent, cur_index, 'label',
-                                str(branch_var) + _dot2tex_label[sense] +
-                                str(rhs))
-            else:
-                T.set_edge_attr(parent, cur_index, 'label',
-                                str(branch_var) + sense + str(rhs))
-        iter_count += 1
-        if BBstatus == 'C':
-            # Branching:
-            # Choose a variable for branching
-            branching_var = None
-            if branch_strategy == FIXED_BRANCHING:
-                # fixed order
-                for i in range(len(VARIABLES)):
-                    frac = min(var_values[i] - math.floor(var_values[i]),
-                               math.ceil(var_values[i]) - var_values[i])
-                    if (frac > 0):
-                        min_frac = frac
-                        branching_var = i
-                        # TODO(aykut): understand this break
-                        break
-            elif branch_strategy == MOST_FRACTIONAL:
-                # most fractional variable
-                min_frac = -1
-                for i in range(len(VARIABLES)):
-                    frac = min(var_values[i] - math.floor(var_values[i]),
-                               math.ceil(var_values[i]) - var_values[i])
-                    if (frac > min_frac):
-                        min_frac = frac
-                        branching_var = i
-            elif branch_strategy == PSEUDOCOST_BRANCHING:
-                scores = {}
-                for i in range(len(VARIABLES)):
-                    # find the fractional solutions
-                    if abs(var_values[i] - math.floor(var_values[i])) > 1e-8:
-                        scores[i] = min(pseudo_u[i][0] * (math.ceil(var_values[i])
-                                                          - var_values[i]),
-                                        pseudo_d[i][0] * (var_values[i]
-                                                          - math.floor(var_values[i])))
-                # sort the dictionary by value
-                branching_var = sorted(list(scores.items()), key=lambda x: x[1])[-1][0]
+        tree = LiveTree(T)
+    if options.node_workers > 1:
+        opt, LB, stat = ParallelSearch(OBJ, MAT, RHS, root_lower, root_upper,
+                                       branch_strategy, search_strategy,
+                                       complete_enumeration, solver,
+                                       rel_param, options, log, tree, limits,
+                                       integer)
+        if options.speedup:
+            serial = dict(vars(options), node_workers=1, speedup=False,
+                          log_level=SILENT, event_log=None)
+            serial_stat = BranchAndBound(
+                None, *problem, branch_strategy=ACTUAL_BRANCH_STRATEGY,
+                search_strategy=search_strategy,
+                complete_enumeration=complete_enumeration,
+                binary_vars=binary_vars, solver=solver, rel_param=rel_param,
+                more_return=True, options=serial)[2]
+            stat['Serial Time'] = serial_stat['Time']
+            stat['Speedup'] = serial_stat['Time'] / max(stat['Time'], 1)
+            if log.summary:
+                log.write("Serial search: %sms, speedup: %.2f",
+                          stat['Serial Time'], stat['Speedup'])
+        if cut_stat is not None:
+            stat.update(CutStats(cut_stat, cut_pool, LB))
+        if presolved is not None:
+            opt = presolved.solution(opt)
+            stat.update(presolved.stats())
+        if log.events:
+            log.event('end', obj=LB, stat=stat)
+        log.close()
+        if isinstance(tree, LiveTree):
+            if T.attr['display'] != 'off':
+                T.display()
+            T._lp_count = stat['LP Solved']
+        if more_return:
+            return opt, LB, stat
+        return opt, LB
+    if persistent:
+        engine = PersistentLP(OBJ, MAT, RHS, root_lower, root_upper, solver)
+    sb_pool = None
+    if persistent and options.strong_branching_workers > 1 and \
+            branch_strategy in [RELIABILITY_BRANCHING, HYBRID]:
+        sb_pool = StrongBranchingPool(options.strong_branching_workers, OBJ,
+                                      MAT, RHS, root_lower, root_upper)
+    # the workers and the spill file go away however the search ends
+    Q = None
+    try:
+        # Node cuts change the rows of the one persistent LP
+        node_cut_rounds = options.node_cut_rounds
+        if cut_pool is None or not persistent or sb_pool is not None:
+            node_cut_rounds = 0
+        if node_cut_rounds:
+            knapsack = KnapsackRows(MAT, RHS, root_lower, root_upper, integer)
+        propagator = BoundPropagator(MAT, RHS, integer) \
+            if options.propagation else None
+        # Parent index and own bound changes of every node
+        nodes = NodeStore(root_lower, root_upper)
+        # Nodes, LPs and pivots of the search
+        count = SearchCounters()
+        # The incumbent, its value is the lower bound
+        incumbent = Incumbent(numVars, log)
+        # pseudocosts start from the objective coefficients
+        pseudo = Pseudocost(-np.asarray(OBJ, dtype=float), rel_param[0])
+        heur = None
+        if options.heuristics:
+            heur = PrimalHeuristics(OBJ, MAT, RHS, root_lower, root_upper,
+                                    options.heuristics,
+                                    options.heuristic_interval, pseudo,
+                                    engine if persistent else None,
+                                    solver, integer)
+        # reduced costs, solution and value of the root LP
+        root_rc = root_x = root_relax = None
 
+        if log.summary:
+            log.write("===========================================")
+            log.write("Starting Branch and Bound")
+            if branch_strategy == MOST_FRACTIONAL:
+                log.write("Most fractional variable")
+            elif branch_strategy == FIXED_BRANCHING:
+                log.write("Fixed order")
+            elif branch_strategy == PSEUDOCOST_BRANCHING:
+                log.write("Pseudocost brancing")
             elif branch_strategy == RELIABILITY_BRANCHING:
-                # Calculating Scores
-                # The algorithm in paper is different from the one in Grumpy
-                # I will try to use paper notations
-                scores = {}
-                for i in range(len(VARIABLES)):
-                    # find the fractional solutions
-                    if abs(var_values[i] - math.floor(var_values[i])) > 1e-8:
-                        qp = pseudo_u[i][0] * (math.ceil(var_values[i])
-                                               - var_values[i])  # q^+
-                        qm = pseudo_d[i][0] * (var_values[i]
-                                               - math.floor(var_values[i]))  # q^^-
-                        scores[i] = (1 - mu) * min(qm, qp) + mu * max(qm, qp)
-
-                # sort the dictionary by value
-                candidate_vars = [en[0] for en in sorted(list(scores.items()), key=lambda x: x[1], reverse=True)]
-
-                no_change = 0  # number of iterations that maximum of scores is not changed
-                smax = scores[candidate_vars[0]]  # current maximum of scores
-                for i in candidate_vars:
-                    if min(pseudo_d[i][1], pseudo_u[i][1]) < eta_rel:
-                        qp = pseudo_u[i][0] * (math.ceil(var_values[i]) - var_values[i])  # q^+
-                        qm = pseudo_d[i][0] * (var_values[i] - math.floor(var_values[i]))  # q^^-
+                log.write("Reliability branching")
+            elif branch_strategy == HYBRID:
+                log.write('Hybrid strong/pseduocost branching')
+            else:
+                log.write("Unknown branching strategy %s", branch_strategy)
+            if search_strategy == DEPTH_FIRST:
+                log.write("Depth first search strategy")
+            elif search_strategy == BEST_FIRST:
+                log.write("Best first search strategy")
+            elif search_strategy == BEST_ESTIMATE:
+                log.write("Best estimate search strategy")
+            else:
+                log.write("Unknown search strategy %s", search_strategy)
+            log.write("===========================================")
+        # level flags as locals, checked before anything is formatted
+        show_nodes = log.nodes
+        show_debug = log.debug
+        progress_interval = log.progress_interval
+        # List of candidate nodes
+        Q = OpenNodes(budget=options.open_node_budget,
+                      spill_dir=options.spill_dir)
+        # The current tree depth
+        cur_depth = 0
+        cur_index = 0
+        # Timer
+        timer = time.time()
+        stop_reason = None
 
-                        # left subproblem/down direction
-                        s_left = CyClpSimplex(prob)
-                        s_left += x[i] <= math.floor(var_values[i])
-                        s_left.maxNumIteration = gamma  # solve for fixed number of iterations
-                        s_left.dual()
-                        if s_left.getStatusCode() == 0:
-                            qm = relax + s_left.objectiveValue  # use a more reliable source to update q^-
-                            full_solved = full_solved + 1
-                            lp_count = lp_count + 1  # If the LP is fully solved, counter plus one
-                        elif s_left.getStatusCode() == 3:
-                            qm = relax + s_left.objectiveValue  # use a more reliable source to update q^-
-                            half_solved = half_solved + 1
+        def incumbent_improved():
+            # drop the open nodes the new incumbent dominates and fix variables
+            # for the whole tree by the reduced costs of the root
+            fixings = IncumbentImproved(
+                incumbent.value, Q, nodes, None if root_rc is None else
+                (root_rc, root_x, root_relax), integer, tree, log)
+            if fixings and persistent:
+                engine.lower = nodes.root_lower.copy()
+                engine.upper = nodes.root_upper.copy()
+            count.root_fixings += fixings
 
-                        # right subproblem/up direction
-                        s_right = CyClpSimplex(prob)
-                        s_right += x[i] >= math.ceil(var_values[i])
-                        s_right.maxNumIteration = gamma  # solve for fixed number of iterations
-                        s_right.dual()
-                        if s_right.getStatusCode() == 0:
-                            qp = relax + s_right.objectiveValue   # use a more reliable source to update q^+
-                            full_solved = full_solved + 1
-                            lp_count = lp_count + 1  # If the LP is fully solved, counter plus one
-                        elif s_right.getStatusCode() == 3:
-                            qp = relax + s_right.objectiveValue  # use a more reliable source to update q^+
-                            half_solved = half_solved + 1
+        # Checkpoints keep the parts of the search that have a state, the LPs
+        # among them are rebuilt on resume
+        checkpoint = None
+        if options.checkpoint is not None:
+            checkpoint = SearchCheckpoint(options.checkpoint,
+                                          options.checkpoint_interval,
+                                          fingerprint)
+        search_parts = {'nodes': nodes, 'open': Q, 'pseudo': pseudo}
+        if cut_pool is not None:
+            search_parts['pool'] = cut_pool
 
-                        scores[i] = (1 - mu) * min(qm, qp) + mu * max(qm, qp)
-                        if (smax == scores[i]):
-                            no_change += 1
-                        elif (smax <= scores[i]):
-                            no_change = 0
-                            smax = scores[i]
-                        else:
-                            no_change = 0
+        def lp_parts():
+            parts = {}
+            if persistent:
+                parts['engine'] = engine
+            elif heur is not None and heur.engine is not None:
+                parts['heuristics'] = heur.engine
+            if sb_pool is not None:
+                parts['sb'] = sb_pool
+            return parts
 
-                    if no_change >= lam:
-                        break
-                branching_var = sorted(list(scores.items()), key=lambda x: x[1])[-1][0]
+        def save_checkpoint():
+            scalars = {'time': time.time() - timer,
+                       'branch_strategy': branch_strategy,
+                       'cur_depth': cur_depth, 'counters': count.save_state(),
+                       'incumbent': incumbent.save_state(),
+                       'root': None if root_rc is None else
+                       [root_relax, root_rc.tolist(), root_x.tolist()]}
+            if heur is not None:
+                scalars['heuristics'] = [heur.calls, heur.solutions,
+                                         heur.lp_count, heur.time, heur.last]
+            if propagator is not None:
+                scalars['propagation'] = [propagator.calls,
+                                          propagator.fixings,
+                                          propagator.infeasible,
+                                          propagator.time]
+            checkpoint.save(dict(search_parts, **lp_parts()), scalars)
+            if show_nodes:
+                log.write("Checkpoint written to %s", options.checkpoint)
 
-            elif branch_strategy == HYBRID:
-                scores = {}
-                for i in range(len(VARIABLES)):
-                    # find the fractional solutions
-                    if abs(var_values[i] - math.floor(var_values[i])) > 1e-8:
-                        scores[i] = min(pseudo_u[i][0] * (math.ceil(var_values[i])
-                                                          - var_values[i]),
-                                        pseudo_d[i][0] * (var_values[i]
-                                                          - math.floor(var_values[i])))
-                candidate_vars = [en[0] for en in sorted(list(scores.items()), key=lambda x: x[1], reverse=True)]
-                restricted_candidate_vars = candidate_vars[:max(1, int(0.5 * len(candidate_vars)))]
-                # print("Subset of candidate variables:")
-                # print(restricted_candidate_vars)
-                best_progress = 0
-                branch_candidate = None
-                for i in restricted_candidate_vars:
-                    s = CyClpSimplex(prob)
-                    s += math.floor(var_values[i]) <= x[i] <= math.ceil(var_values[i])
-                    s.maxNumIteration = average_num_pivot * 2
-                    s.dual()
-                    if s.getStatusCode() == 0:
-                        lp_count += 1
-                    progress = relax - (-s.objectiveValue)
-                    if (progress - best_progress) > 1e-8:
-                        branch_candidate = i
-                        best_progress = progress
-                if branch_candidate is None:
-                    branch_candidate = restricted_candidate_vars[0]
-                branching_var = branch_candidate
+        if options.resume:
+            scalars = checkpoint.load()
+            checkpoint.restore(search_parts)
+            # the LPs rebuilt from what the checkpoint keeps, so that the
+            # solver takes the same pivots as in the run that wrote it
+            if persistent:
+                engine = PersistentLP(OBJ, MAT, RHS, nodes.root_lower,
+                                      nodes.root_upper, solver)
+                if heur is not None:
+                    heur.engine = engine
+            elif heur is not None and heur.engine is not None:
+                heur.engine = PersistentLP(OBJ, MAT, RHS, heur.engine.lower,
+                                           heur.engine.upper, solver)
+            checkpoint.restore(lp_parts())
+            count.load_state(scalars['counters'])
+            incumbent.load_state(scalars['incumbent'])
+            if scalars['root'] is not None:
+                root_relax = scalars['root'][0]
+                root_rc, root_x = map(np.array, scalars['root'][1:])
+            branch_strategy = scalars['branch_strategy']
+            cur_depth = scalars['cur_depth']
+            if heur is not None:
+                (heur.calls, heur.solutions, heur.lp_count, heur.time,
+                 heur.last) = scalars['heuristics']
+            if propagator is not None:
+                (propagator.calls, propagator.fixings, propagator.infeasible,
+                 propagator.time) = scalars['propagation']
+            timer -= scalars['time']
+            if log.summary:
+                log.write("Resumed from %s: %s nodes processed, %s open",
+                          options.checkpoint, count.iter_count, len(Q))
+        else:
+            nodes.add(0, None)
+            Q.push(0, -INFINITY, (0, None, None, None, None, None, None, None))
 
+        # Branch and Bound Loop
+        while not Q.isEmpty():
+            if limits.active:
+                stop_reason = limits.check(
+                    time.time() - timer, count.iter_count, incumbent.value,
+                    max(Q.best_bound(), incumbent.value))
+                if stop_reason is not None:
+                    break
+            if checkpoint is not None and checkpoint.due():
+                save_checkpoint()
+            # maximum allowed strong branch performed
+            if branch_strategy == HYBRID and cur_depth > max(int(numVars * 0.2), 5):
+                branch_strategy = PSEUDOCOST_BRANCHING
+                if show_nodes:
+                    log.write("Switch from strong branch to psedocost branch")
+            infeasible = False
+            integer_solution = False
+            integer_infeasibility_count = integer_infeasibility_sum = None
+            (cur_index, parent, relax, branch_var, branch_var_value, sense,
+             rhs, basis) = Q.pop()
+            cur_depth = int(nodes.depth[nodes.slot[cur_index]])
+            if show_nodes:
+                log.write("")
+                log.write("----------------------------------------------------")
+                log.write("")
+                log.write("Node: %s, Depth: %s, LB: %s", cur_index, cur_depth,
+                          incumbent.value if incumbent.value > -INFINITY
+                          else "None")
+            if relax is not None and relax <= incumbent.value:
+                if show_nodes:
+                    log.write("Node pruned immediately by bound")
+                NodePruned(nodes, cur_index, parent, tree, log)
+                continue
+            # Bound propagation, the bounds it tightens are recorded with the
+            # node and at the root hold for the whole tree
+            if propagator is not None:
+                infeasible, fixed = propagator.propagate(
+                    *nodes.bounds(cur_index))
+                if len(fixed[0]):
+                    if cur_index == 0:
+                        nodes.tighten_root(*fixed)
+                        if persistent:
+                            engine.lower = nodes.root_lower.copy()
+                            engine.upper = nodes.root_upper.copy()
+                    else:
+                        nodes.tighten(cur_index, *fixed)
+                    if show_nodes:
+                        log.write("%s bounds tightened by propagation",
+                                  len(fixed[0]))
+            # ====================================
+            #    LP Relaxation
+            # ====================================
+            if infeasible:
+                # proved by propagation, there is no LP to solve
+                if show_nodes:
+                    log.write("Infeasible by propagation")
+                relax = INFINITY
             else:
-                print("Unknown branching strategy %s" % branch_strategy)
-                exit()
-            if branching_var is not None:
-                print("Branching on variable %s" % branching_var)
-            # Create new nodes
-            if search_strategy == DEPTH_FIRST:
-                priority = (-cur_depth - 1, -cur_depth - 1)
-            elif search_strategy == BEST_FIRST:
-                priority = (-relax, -relax)
-            elif search_strategy == BEST_ESTIMATE:
-                priority = (-relax - pseudo_d[branching_var][0] *
-                            (math.floor(var_values[branching_var]) - var_values[branching_var]),
-                            -relax + pseudo_u[branching_var][0] *
-                            (math.ceil(var_values[branching_var]) - var_values[branching_var]))
-            node_count += 1
-            Q.push(node_count, priority[0], (node_count, cur_index, relax, branching_var,
-                                             var_values[branching_var],
-                                             '<=', math.floor(var_values[branching_var])))
-            node_count += 1
-            Q.push(node_count, priority[1], (node_count, cur_index, relax, branching_var,
-                                             var_values[branching_var],
-                                             '>=', math.ceil(var_values[branching_var])))
-            T.set_node_attr(cur_index, color, 'green')
-        if T.root is not None and display_interval is not None and\
-                iter_count % display_interval == 0:
-            T.display(count=iter_count)
+                # Compute lower bound by LP relaxation
+                # The bounds come from the node store, the walk to the root is
+                # only needed to list the branching variables of the path
+                if show_nodes and cur_index != 0:
+                    path_vars = nodes.deltas(nodes.path(cur_index))[0]
+                    log.write("Branching variables: x_%s %s", path_vars[0],
+                              ' '.join(map(str, path_vars[1:])))
+                if persistent:
+                    # Fix all prescribed variables through the column bounds
+                    node_lower, node_upper = nodes.bounds(cur_index)
+                    if warm_start and basis is not None:
+                        s = engine.resolve(node_lower, node_upper, basis)
+                        count.warm_num_pivot += s.iteration
+                        count.warm_count += 1
+                        if options.cold_sample and \
+                                count.warm_count % options.cold_sample == 0:
+                            # the same node LP solved from scratch
+                            cold = PersistentLP(OBJ, MAT, RHS, node_lower,
+                                                node_upper, solver)
+                            if len(engine.added_rhs):
+                                cold.add_rows(engine.added_rows,
+                                              engine.added_rhs)
+                            count.sampled(s.iteration, cold.solve().iteration)
+                    else:
+                        s = engine.solve(node_lower, node_upper)
+                    if node_cut_rounds:
+                        s, added, cut_lp_count = NodeCuts(
+                            engine, cut_pool, MAT, RHS, knapsack, node_lower,
+                            node_upper, incumbent.value, node_cut_rounds,
+                            integer)
+                        count.node_cuts += added
+                        count.lp_count += cut_lp_count
+                else:
+                    prob = CyLPModel()
+                    x = prob.addVariable('x', dim=numVars)
+                    # Fix all prescribed variables through the column bounds,
+                    # one bound per variable however deep the node
+                    node_lower, node_upper = nodes.bounds(cur_index)
+                    prob += CyLPArray(node_lower) <= x <= CyLPArray(node_upper)
+                    prob.objective = OBJ * x
+                    prob += MAT * x <= RHS
+                    # Solve the LP relaxation
+                    s = CyClpSimplex(prob)
+                    if solver == 'primalSimplex':
+                        s.initialPrimalSolve()
+                    elif solver == 'dualSimplex':
+                        s.initialDualSolve()
+                    else:
+                        s.initialSolve()
+                count.solved(s.iteration)
+                # Check infeasibility
+                # -1 - unknown e.g. before solve or if postSolve says not optimal
+                # 0 - optimal
+                # 1 - primal infeasible
+                # 2 - dual infeasible
+                # 3 - stopped on iterations or time
+                # 4 - stopped due to errors
+                # 5 - stopped by event handler (virtual int ClpEventHandler::event())
+                infeasible = (s.getStatusCode() in [1, 2])
+                # Print status
+                if show_nodes:
+                    if infeasible:
+                        log.write("LP Solved, status: Infeasible")
+                    else:
+                        log.write("LP Solved, status: %s, obj: %s",
+                                  s.getStatusString(), s.objectiveValue)
+                if(s.getStatusCode() == 0):
+                    relax = -round(s.objectiveValue,7)
+                    # Optimal basis handed down to the children
+                    if warm_start:
+                        basis = engine.get_basis()
+                    # Update pseudocost
+                    if branch_var != None:
+                        UpdatePseudocost(pseudo, branch_var, sense, rhs,
+                                         branch_var_value,
+                                         nodes.obj[nodes.slot[parent]], relax)
+                    var_values = np.round(s.primalVariableSolution['x'], 7)
+                    if options.reduced_cost_fixing:
+                        rc = np.array(s.dualVariableSolution['x'])
+                        if cur_index == 0:
+                            root_rc, root_x, root_relax = rc, var_values, relax
+                    (var_values, relax, integer_solution,
+                     integer_infeasibility_count,
+                     integer_infeasibility_sum) = EvaluateSolution(
+                        var_values, relax, integer, OBJ, MAT, RHS,
+                        (node_lower, node_upper) if options.cuts else None)
+                    if integer_solution and relax > incumbent.value:
+                        incumbent.update(relax, var_values, 'LP', cur_index,
+                                         time.time() - timer)
+                        incumbent_improved()
+                        if show_debug:
+                            for i in np.flatnonzero(var_values > 0):
+                                log.write("%s = %s", i, var_values[i])
+                    elif show_nodes:
+                        if integer_solution:
+                            log.write("New integer solution found, objective: %s", relax)
+                        else:
+                            log.write("Fractional solution:")
+                        if show_debug:
+                            for i in np.flatnonzero(var_values > 0):
+                                log.write("%s%s = %s", '' if integer_solution else 'x',
+                                          i, var_values[i])
+                    # For complete enumeration
+                    if complete_enumeration:
+                        relax = incumbent.value - 1
+                else:
+                    relax = INFINITY
+            if show_nodes:
+                if integer_solution:
+                    log.write("Integer solution")
+                elif infeasible:
+                    log.write("Infeasible node")
+                elif not complete_enumeration and relax <= incumbent.value:
+                    log.write("Node pruned by bound (obj: %s, UB: %s)", relax,
+                              incumbent.value)
+            (status, relax, integer_infeasibility_count,
+             integer_infeasibility_sum) = NodeStatus(
+                nodes, cur_index, parent, relax, incumbent.value, infeasible,
+                integer_solution, integer_infeasibility_count,
+                integer_infeasibility_sum, complete_enumeration, integer)
+            if status == 'L' and show_nodes:
+                log.write("Reached a leaf")
+            if status == 'fathomed' and incumbent.value == -INFINITY and \
+                    log.summary:
+                log.write('WARNING: Encountered "fathom" line before ' +
+                          'first incumbent.')
+            if tree is not None or log.events:
+                fields = dict(index=cur_index, parent=parent, depth=cur_depth,
+                              status=status, obj=relax,
+                              iicount=integer_infeasibility_count,
+                              iisum=integer_infeasibility_sum,
+                              branch_var=branch_var,
+                              branch_var_value=branch_var_value, sense=sense,
+                              rhs=rhs)
+                if tree is not None:
+                    tree.node(**fields)
+                if log.events:
+                    log.event('node', **fields)
+            count.iter_count += 1
+            if status == 'candidate':
+                # Branching:
+                # Choose a variable for branching
+                if sb_pool is not None and branch_strategy in [RELIABILITY_BRANCHING, HYBRID]:
+                    sb_pool.set_node(node_lower, node_upper,
+                                     engine.get_basis())
+                branching_var, counts = BranchingVariable(
+                    branch_strategy, var_values, relax, pseudo, s=s,
+                    rel_param=rel_param,
+                    average_num_pivot=count.average_num_pivot, sb_pool=sb_pool,
+                    score_rule=options.score_rule, integer=integer)
+                count.branched(counts)
+                if branching_var is not None and show_nodes:
+                    log.write("Branching on variable %s", branching_var)
+                # Bounds fixed by reduced cost go to both children
+                fixed = ()
+                if options.reduced_cost_fixing and \
+                        incumbent.value > -INFINITY and \
+                        not complete_enumeration:
+                    if not persistent:
+                        node_lower, node_upper = nodes.bounds(cur_index)
+                    fixed = ReducedCostFixing(rc, var_values, node_lower,
+                                              node_upper, relax,
+                                              incumbent.value,
+                                              integer=integer)
+                    count.node_fixings += len(fixed[0])
+                    if show_nodes and len(fixed[0]):
+                        log.write("%s variables fixed by reduced cost",
+                                  len(fixed[0]))
+                # Create new nodes
+                priority = ChildPriorities(search_strategy, cur_depth, relax,
+                                           var_values[branching_var], pseudo,
+                                           branching_var)
+                count.node_count = AddChildren(
+                    nodes, Q, count.node_count, cur_index, relax,
+                    branching_var, var_values[branching_var], priority, basis,
+                    fixed, tree, log)
+                # Primal heuristics on the LP solution of the node
+                if heur is not None and heur.due(count.iter_count):
+                    if not persistent:
+                        node_lower, node_upper = nodes.bounds(cur_index)
+                    if RunHeuristics(heur, var_values, node_lower,
+                                     node_upper, incumbent, cur_index,
+                                     time.time() - timer):
+                        incumbent_improved()
+            nodes.close(cur_index)
+            if persistent:
+                engine.restore()
+            if progress_interval and count.iter_count % progress_interval == 0:
+                log.progress(time.time() - timer, count.iter_count, len(Q),
+                             count.lp_count, incumbent.value,
+                             max(Q.best_bound(), incumbent.value))
+            if isinstance(tree, LiveTree) and T.root is not None and \
+                    display_interval is not None and \
+                    count.iter_count % display_interval == 0:
+                T.display(count=count.iter_count)
 
-    timer = int(math.ceil((time.time() - timer) * 1000))
-    print("")
-    print("===========================================")
-    print("Branch and bound completed in %sms" % timer)
-    print("Strategy: %s" % ACTUAL_BRANCH_STRATEGY)
-    if complete_enumeration:
-        print("Complete enumeration")
-    print("%s nodes visited " % node_count)
-    print("%s LP's solved" % lp_count)
-    print("===========================================")
-    print("Optimal solution")
-    # print optimal solution
-    for i in range(len(VARIABLES)):
-        if opt[i] > 0:
-            print("x%s = %s" % (i, opt[i]))
-    print("Objective function value")
-    print(LB)
-    print("===========================================")
-    if T.attr['display'] is not 'off':
-        T.display(count=iter_count)
-    T._lp_count = lp_count
+        if checkpoint is not None and stop_reason is not None:
+            save_checkpoint()
+        LB, opt = incumbent.value, incumbent.solution
+        timer = int(math.ceil((time.time() - timer) * 1000))
+        if stop_reason is None:
+            stop_reason = OPTIMAL if LB > -INFINITY else INFEASIBLE
+            best_bound = LB
+        else:
+            best_bound = max(Q.best_bound(), LB)
+        gap = Gap(LB, best_bound)[1]
+    finally:
+        if Q is not None:
+            Q.close()
+        if sb_pool is not None:
+            sb_pool.close()
+    if presolved is not None:
+        opt = presolved.solution(opt)
+    if log.summary:
+        log.write("")
+        log.write("===========================================")
+        log.write("Branch and bound completed in %sms", timer)
+        log.write("Strategy: %s", ACTUAL_BRANCH_STRATEGY)
+        if complete_enumeration:
+            log.write("Complete enumeration")
+        log.write("%s nodes visited ", count.node_count)
+        log.write("%s LP's solved", count.lp_count)
+        log.write("Stopped: %s, best bound: %s, gap: %s", stop_reason,
+                  best_bound, gap)
+        log.write("===========================================")
+        log.write("Optimal solution" if stop_reason == OPTIMAL else
+                  "Best solution found")
+        # print optimal solution
+        for i in range(len(VARIABLES)):
+            if opt[i] > 0:
+                log.write("x%s = %s", i, opt[i])
+        log.write("Objective function value")
+        log.write("%s", LB)
+        log.write("===========================================")
+    if isinstance(tree, LiveTree):
+        if T.attr['display'] != 'off':
+            T.display(count=count.iter_count)
+        T._lp_count = count.lp_count
 
+    if more_return or log.events:
+        stat = SearchStats(timer, count, Q, best_bound, gap, stop_reason,
+                           incumbent, options, ACTUAL_BRANCH_STRATEGY, heur,
+                           propagator)
+        if cut_stat is not None:
+            stat.update(CutStats(cut_stat, cut_pool, LB))
+            stat['Node Cuts'] = count.node_cuts
+        if presolved is not None:
+            stat.update(presolved.stats())
+        if checkpoint is not None:
+            stat['Checkpoints'] = checkpoint.count
+        if ACTUAL_BRANCH_STRATEGY in [RELIABILITY_BRANCHING, HYBRID]:
+            stat['Strong Branching Time'] = int(math.ceil(count.sb_time * 1000))
+        if warm_start:
+            stat['Warm Started'] = count.warm_count
+            stat['Pivots per Warm Start'] = \
+                count.warm_num_pivot / max(count.warm_count, 1)
+            if options.cold_sample:
+                sampled = max(count.cold_count, 1)
+                stat['Cold Solved (Sampled)'] = count.cold_count
+                stat['Pivots per Cold Solve (Sampled)'] = \
+                    count.cold_num_pivot / sampled
+                stat['Pivots Saved per Node (Sampled)'] = \
+                    (count.cold_num_pivot - count.sampled_num_pivot) / sampled
+    if log.events:
+        log.event('end', obj=LB, stat=stat)
+    log.close()
     if more_return:
-        stat = {'Time': timer, 'Size': node_count, 'LP Solved': lp_count}
-        if branch_strategy == RELIABILITY_BRANCHING:
-            stat['LP Solved for Bounds'] = lp_count - full_solved
-            stat['Halfly Solved'] = half_solved
-            stat['Fully Solved'] = full_solved
         return opt, LB, stat
-    
     return opt, LB
 
 
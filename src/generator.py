@@ -7,11 +7,24 @@ Last Modified: 2020-05-13 12:58
 Description:
 '''
 import random
+import numpy as np
+import scipy.sparse as sp
 
 
 def GenerateRandomMIP(numVars=40, numCons=20, density=0.2,
                       maxObjCoeff=10, maxConsCoeff=10,
-                      tightness=2, rand_seed=2, layout='dot'):
+                      tightness=2, rand_seed=2, layout='dot',
+                      sparse=False):
+    '''
+    sparse:
+        False - MAT is a dict of dense columns keyed by variable name
+        True  - MAT is a numCons x numVars scipy.sparse CSC matrix, drawn
+                with numpy from rand_seed (a different instance from the
+                dense one with the same seed)
+    '''
+    if sparse:
+        return GenerateSparseRandomMIP(numVars, numCons, density, maxObjCoeff,
+                                       maxConsCoeff, tightness, rand_seed)
     random.seed(rand_seed)
     CONSTRAINTS = ["C" + str(i) for i in range(numCons)]
     if layout == 'dot2tex':
@@ -26,3 +39,24 @@ def GenerateRandomMIP(numVars=40, numCons=20, density=0.2,
                           int(numVars * density * maxConsCoeff / 1.5))
            for i in CONSTRAINTS]
     return CONSTRAINTS, VARIABLES, OBJ, MAT, RHS
+
+
+def GenerateSparseRandomMIP(numVars=40, numCons=20, density=0.2,
+                            maxObjCoeff=10, maxConsCoeff=10,
+                            tightness=2, rand_seed=2):
+    rng = np.random.RandomState(rand_seed)
+    CONSTRAINTS = ["C" + str(i) for i in range(numCons)]
+    VARIABLES = ["x" + str(i) for i in range(numVars)]
+    OBJ = dict(zip(VARIABLES, rng.randint(1, maxObjCoeff + 1, numVars).tolist()))
+    # positions are drawn with replacement and duplicates dropped, which
+    # avoids enumerating all numCons * numVars positions
+    positions = np.unique(rng.randint(0, numCons * numVars,
+                                      int(round(density * numCons * numVars))))
+    values = rng.randint(1, maxConsCoeff + 1, len(positions))
+    MAT = sp.csc_matrix((values.astype(float),
+                         (positions % numCons, positions // numCons)),
+                        shape=(numCons, numVars))
+    RHS = rng.randint(int(numVars * density * maxConsCoeff / tightness),
+                      int(numVars * density * maxConsCoeff / 1.5) + 1,
+                      numCons).tolist()
+    return CONSTRAINTS, VARIABLES, OBJ, MAT, RHS
@@ -0,0 +1,259 @@
+'''
+File: heuristics.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-27 14:10
+Last Modified: 2020-05-27 14:10
+--------------------------------------------
+Description:
+Primal heuristics that look for integer solutions around the LP solution of
+a node. Simple rounding and greedy rounding only need the constraint
+matrix. Fractional and pseudocost diving fix one variable at a time on a
+persistent LP and reoptimize with the dual simplex until the LP solution
+is integral, infeasible or no better than the incumbent.
+'''
+import math
+import time
+import numpy as np
+import scipy.sparse as sp
+try:
+    from .lpEngine import PersistentLP
+except ImportError:
+    from lpEngine import PersistentLP
+
+SIMPLE_ROUNDING = 'Simple Rounding'
+GREEDY_ROUNDING = 'Greedy Rounding'
+FRACTIONAL_DIVING = 'Fractional Diving'
+PSEUDOCOST_DIVING = 'Pseudocost Diving'
+HEURISTICS = [SIMPLE_ROUNDING, GREEDY_ROUNDING, FRACTIONAL_DIVING,
+              PSEUDOCOST_DIVING]
+
+
+def _fractional(x, integer=None):
+    # same integrality tolerance as the search loop
+    frac = np.abs(np.round(x) - x) > .001
+    if integer is not None:
+        frac &= integer
+    return frac
+
+
+def _rounded(x, values, integer):
+    # continuous components keep their LP value
+    if integer is not None:
+        values[~integer] = x[~integer]
+    return values
+
+
+def SimpleRounding(x, lower, upper, has_pos, has_neg, integer=None):
+    '''
+    Round every fractional component of the LP solution x in a direction
+    in which no row MAT x <= RHS can become violated: down if its column
+    has no negative coefficient, up if it has no positive one. None if some
+    component can be rounded neither way.
+    '''
+    frac = _fractional(x, integer)
+    down = frac & ~has_neg
+    up = frac & has_neg & ~has_pos
+    if np.any(frac & ~down & ~up):
+        return None
+    values = _rounded(x, np.round(x), integer)
+    values[down] = np.floor(x[down])
+    values[up] = np.ceil(x[up])
+    return np.clip(values, lower, upper)
+
+
+def GreedyRounding(CSC, RHS, c, x, lower, upper, weight, integer=None):
+    '''
+    Round the LP solution x down and raise the variables with a positive
+    objective coefficient as far as the slack of MAT x <= RHS allows, the
+    ones the LP solution wants larger first and then by decreasing ratio of
+    objective coefficient to weight. Every step keeps the point feasible.
+    Continuous variables keep their LP value. None if the rounded down
+    point is infeasible.
+    '''
+    values = _rounded(x, np.clip(np.floor(x + .001), lower, upper), integer)
+    slack = RHS - CSC.dot(values)
+    if np.any(slack < -1e-6):
+        return None
+    candidates = (c > 0) & (values < upper)
+    if integer is not None:
+        candidates &= integer
+    candidates = np.flatnonzero(candidates)
+    order = candidates[np.lexsort((-c[candidates] / weight[candidates],
+                                   values[candidates] - x[candidates]))]
+    indptr, indices, data = CSC.indptr, CSC.indices, CSC.data
+    for j in order.tolist():
+        rows = indices[indptr[j]:indptr[j + 1]]
+        coef = data[indptr[j]:indptr[j + 1]]
+        pos = coef > 0
+        step = upper[j] - values[j]
+        if pos.any():
+            step = min(step, math.floor(np.min(slack[rows[pos]] / coef[pos]) +
+                                        1e-9))
+        if step < 1 or math.isinf(step):
+            continue
+        values[j] += step
+        slack[rows] -= step * coef
+    return values
+
+
+def FractionalDivingRule(x, frac, pseudo):
+    '''Variable closest to an integer, rounded to that integer.'''
+    idx = np.flatnonzero(frac)
+    down = x[idx] - np.floor(x[idx])
+    k = int(np.argmin(np.minimum(down, 1 - down)))
+    return idx[k], down[k] >= .5
+
+
+def PseudocostDivingRule(x, frac, pseudo):
+    '''
+    Every variable is rounded in the direction of the smaller pseudocost
+    estimate, and the variable whose estimate in that direction is smallest
+    relative to the other direction is chosen.
+    '''
+    idx = np.flatnonzero(frac)
+    down = x[idx] - np.floor(x[idx])
+    qm = np.maximum(pseudo.mean_d(idx) * down, 0)
+    qp = np.maximum(pseudo.mean_u(idx) * (1 - down), 0)
+    go_up = qp < qm
+    score = (1 + np.where(go_up, qm, qp)) / (1 + np.minimum(qm, qp))
+    k = int(np.argmax(score))
+    return idx[k], go_up[k]
+
+
+_DIVING_RULES = {FRACTIONAL_DIVING: FractionalDivingRule,
+                 PSEUDOCOST_DIVING: PseudocostDivingRule}
+
+
+def Dive(engine, lower, upper, LB, rule, pseudo=None, max_depth=None,
+         integer=None):
+    '''
+    Starting from the column bounds lower, upper of a node, fix the
+    variable chosen by rule to a rounded value and reoptimize, until the
+    LP solution is integral. Returns the solution (None if the dive failed)
+    and the number of LPs solved; the root bounds of engine are restored.
+    '''
+    lower = np.array(lower, dtype=float)
+    upper = np.array(upper, dtype=float)
+    if max_depth is None:
+        max_depth = engine.numVars
+    values = None
+    lp_count = 0
+    for _ in range(max_depth + 1):
+        s = engine.resolve(lower, upper)
+        lp_count += 1
+        if s.getStatusCode() != 0 or -s.objectiveValue <= LB:
+            break
+        x = np.round(engine.x, 7)
+        frac = _fractional(x, integer)
+        if not frac.any():
+            values = _rounded(x, np.round(x), integer)
+            break
+        j, up = rule(x, frac, pseudo)
+        if up:
+            lower[j] = math.ceil(x[j])
+        else:
+            upper[j] = math.floor(x[j])
+    engine.restore()
+    return values, lp_count
+
+
+class PrimalHeuristics(object):
+    '''
+    The primal heuristics of a search and their statistics.
+        heuristics: names of the heuristics, run in this order
+        interval:   run at the first node that is branched on, the root
+                    unless it is solved there, and then at the first node
+                    branched on once interval nodes have passed since the
+                    last run; None for the first node only
+        pseudo:     Pseudocost tables, used by PSEUDOCOST_DIVING
+        engine:     PersistentLP the dives run on, None to build one
+        integer:    mask of the integer variables, None if all are
+        attributes:
+            calls, solutions, lp_count, time: per heuristic, solutions are
+                                              the ones better than the
+                                              incumbent of the time
+            last:   iter_count of the node they last ran at, None before
+        methods:
+            due(iter_count):          True if the heuristics run at the
+                                      iter_count-th node, which is branched
+                                      on; the node becomes their last one
+            run(x, lower, upper, LB): best solution better than LB as
+                                      (name, value, values), or None
+            stats():                  statistics as a dict per heuristic
+    '''
+
+    def __init__(self, OBJ, MAT, RHS, root_lower, root_upper,
+                 heuristics=HEURISTICS, interval=None, pseudo=None,
+                 engine=None, solver='dynamic', integer=None):
+        for name in heuristics:
+            if name not in HEURISTICS:
+                raise ValueError("Unknown heuristic %s" % name)
+        self.heuristics = list(heuristics)
+        self.interval = interval
+        self.pseudo = pseudo
+        self.integer = integer
+        # OBJ is the minimization objective handed to Clp
+        self.c = -np.asarray(OBJ, dtype=float)
+        self.MAT = sp.csr_matrix(MAT, dtype=float)
+        self.CSC = self.MAT.tocsc()
+        self.RHS = np.asarray(RHS, dtype=float)
+        self.has_pos = np.asarray((self.CSC > 0).sum(axis=0)).ravel() > 0
+        self.has_neg = np.asarray((self.CSC < 0).sum(axis=0)).ravel() > 0
+        # share of the right hand sides a unit of every variable takes
+        self.weight = 1 + np.asarray(
+            self.CSC.maximum(0).T.dot(1 / np.maximum(np.abs(self.RHS), 1))
+        ).ravel()
+        if engine is None and any(name in _DIVING_RULES for name in heuristics):
+            engine = PersistentLP(OBJ, MAT, RHS, root_lower, root_upper,
+                                  solver)
+        self.engine = engine
+        self.calls = dict.fromkeys(self.heuristics, 0)
+        self.solutions = dict.fromkeys(self.heuristics, 0)
+        self.lp_count = dict.fromkeys(self.heuristics, 0)
+        self.time = dict.fromkeys(self.heuristics, 0.0)
+        self.last = None
+
+    def due(self, iter_count):
+        # only the nodes branched on are asked, the run is not lost when
+        # the interval-th node is solved or pruned
+        if self.last is not None and (self.interval is None or
+                                      iter_count - self.last < self.interval):
+            return False
+        self.last = iter_count
+        return True
+
+    def feasible(self, values):
+        return bool(np.all(self.MAT.dot(values) <= self.RHS + 1e-6))
+
+    def run(self, x, lower, upper, LB):
+        best = None
+        for name in self.heuristics:
+            start = time.time()
+            self.calls[name] += 1
+            if name == SIMPLE_ROUNDING:
+                values = SimpleRounding(x, lower, upper, self.has_pos,
+                                        self.has_neg, self.integer)
+            elif name == GREEDY_ROUNDING:
+                values = GreedyRounding(self.CSC, self.RHS, self.c, x, lower,
+                                        upper, self.weight, self.integer)
+            else:
+                values, lp_count = Dive(self.engine, lower, upper, LB,
+                                        _DIVING_RULES[name], self.pseudo,
+                                        integer=self.integer)
+                self.lp_count[name] += lp_count
+            self.time[name] += time.time() - start
+            if values is None:
+                continue
+            value = round(float(self.c.dot(values)), 7)
+            if value > LB and self.feasible(values):
+                self.solutions[name] += 1
+                LB = value
+                best = (name, value, values)
+        return best
+
+    def stats(self):
+        return dict((name, {'Calls': self.calls[name],
+                            'Solutions': self.solutions[name],
+                            'LP Solved': self.lp_count[name],
+                            'Time': int(math.ceil(self.time[name] * 1000))})
+                    for name in self.heuristics)
@@ -0,0 +1,174 @@
+'''
+File: lpEngine.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-20 10:12
+Last Modified: 2020-05-20 10:12
+--------------------------------------------
+Description:
+Persistent LP engine for branch and bound. The root LP is built once and
+every node is applied by changing column bounds on the same CyClpSimplex,
+so the node LP keeps the size of the root LP regardless of the depth.
+'''
+import numpy as np
+import scipy.sparse as sp
+from cylp.cy.CyClpSimplex import CyClpSimplex
+from cylp.py.modeling.CyLPModel import CyLPModel
+
+# Clp basis status of a basic column or row
+_BASIC = 1
+
+
+class PersistentLP(object):
+    '''
+    One CyClpSimplex shared by all the nodes of the tree.
+        attributes:
+            lower, upper: root column bounds, restored after each node
+            simplex:      the underlying CyClpSimplex
+            added_rows, added_rhs: the rows appended by add_rows
+            scaled:       (lower, upper, basis, rows) of the first dual
+                          simplex, Clp computes the scale factors of the LP
+                          there and keeps them, rows is the number of added
+                          rows at the time
+        methods:
+            solve(lower, upper):  apply node bounds and solve
+            restore():            reset the column bounds to the root bounds
+            get_basis():          compact copy of the current basis
+            resolve(lower, upper, basis):
+                                  dual simplex from a stored basis, or
+                                  from the current one if basis is None
+            add_rows(rows, rhs):  append the rows x <= rhs, basic
+            save_state(), load_state(state): the added rows, the scaling
+                                  solve and the basis, for checkpoints. A
+                                  new engine given the state pivots as the
+                                  saved one would have
+    '''
+
+    def __init__(self, OBJ, MAT, RHS, lower, upper, solver='dynamic'):
+        self.numVars = len(OBJ)
+        self.lower = np.array(lower, dtype=float)
+        self.upper = np.array(upper, dtype=float)
+        self.solver = solver
+        prob = CyLPModel()
+        x = prob.addVariable('x', dim=self.numVars)
+        prob.objective = OBJ * x
+        prob += MAT * x <= RHS
+        self.simplex = CyClpSimplex(prob)
+        self.simplex.logLevel = 0
+        self.added_rows = sp.csr_matrix((0, self.numVars))
+        self.added_rhs = np.zeros(0)
+        self.scaled = None
+        self.restore()
+
+    def restore(self):
+        self.simplex.variablesLower = self.lower
+        self.simplex.variablesUpper = self.upper
+
+    def apply(self, lower, upper):
+        self.simplex.variablesLower = lower
+        self.simplex.variablesUpper = upper
+
+    def solve(self, lower=None, upper=None):
+        '''
+        Solve the LP under the given column bounds (root bounds if None)
+        and return the simplex object.
+        '''
+        s = self.simplex
+        if lower is not None:
+            self.apply(lower, upper)
+        if self.solver == 'primalSimplex':
+            s.initialPrimalSolve()
+        elif self.solver == 'dualSimplex':
+            s.initialDualSolve()
+        else:
+            s.initialSolve()
+        return s
+
+    def get_basis(self):
+        '''
+        Basis status of columns and rows packed two per byte. Clp uses the
+        values 0-5, so each status fits in a nibble. A basis is padded with
+        the basic status, which is the status of the rows added after it
+        was taken.
+        '''
+        cstat, rstat = self.simplex.getBasisStatus()
+        status = np.concatenate((cstat, rstat)).astype(np.uint8)
+        if len(status) % 2:
+            status = np.append(status, np.uint8(_BASIC))
+        return (status[0::2] << 4) | status[1::2]
+
+    def set_basis(self, basis):
+        status = np.empty(2 * len(basis), dtype=np.int32)
+        status[0::2] = basis >> 4
+        status[1::2] = basis & 15
+        n = self.numVars
+        m = self.simplex.nConstraints
+        if len(status) < n + m:
+            # rows added since the basis was taken
+            status = np.append(status, np.full(n + m - len(status), _BASIC,
+                                               dtype=np.int32))
+        self.simplex.setBasisStatus(status[:n], status[n:n + m])
+
+    def add_rows(self, rows, rhs):
+        '''
+        Append the rows rows x <= rhs (a sparse matrix) to the LP, with
+        their slacks basic so that the current basis stays a basis.
+        '''
+        rows = sp.csr_matrix(rows)
+        self.added_rows = sp.vstack([self.added_rows, rows]).tocsr()
+        self.added_rhs = np.concatenate((self.added_rhs,
+                                         np.asarray(rhs, dtype=float)))
+        for i in range(rows.shape[0]):
+            start, end = rows.indptr[i], rows.indptr[i + 1]
+            self.simplex.CLP_addConstraint(
+                end - start, rows.indices[start:end].astype(np.int32),
+                rows.data[start:end].astype(np.double), -np.inf,
+                float(rhs[i]))
+
+    def resolve(self, lower, upper, basis=None):
+        '''
+        Reoptimize with the dual simplex starting from basis, which is
+        dual feasible after a bound change on a parent's optimal basis.
+        '''
+        s = self.simplex
+        self.apply(lower, upper)
+        if basis is not None:
+            self.set_basis(basis)
+        if self.scaled is None:
+            self.scaled = (np.array(lower, dtype=float),
+                           np.array(upper, dtype=float), self.get_basis(),
+                           len(self.added_rhs))
+        s.dual()
+        return s
+
+    def save_state(self):
+        state = {'data': self.added_rows.data,
+                 'indices': self.added_rows.indices,
+                 'indptr': self.added_rows.indptr, 'rhs': self.added_rhs,
+                 'basis': self.get_basis()}
+        if self.scaled is not None:
+            (state['scale_lower'], state['scale_upper'],
+             state['scale_basis'], state['scale_rows']) = self.scaled
+        return state
+
+    def load_state(self, state):
+        rhs = state['rhs']
+        rows = sp.csr_matrix((state['data'], state['indices'],
+                              state['indptr']),
+                             shape=(len(rhs), self.numVars))
+        num = len(rhs)
+        if 'scale_lower' in state:
+            # the scaling solve is repeated on the rows there were then,
+            # the solution is dropped but the scale factors are kept
+            num = int(state['scale_rows'])
+            if num:
+                self.add_rows(rows[:num], rhs[:num])
+            self.resolve(state['scale_lower'], state['scale_upper'],
+                         state['scale_basis'])
+            self.restore()
+        if num < len(rhs):
+            self.add_rows(rows[num:], rhs[num:])
+        self.set_basis(state['basis'])
+
+    @property
+    def x(self):
+        return self.simplex.primalVariableSolution['x']
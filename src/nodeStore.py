@@ -0,0 +1,304 @@
+'''
+File: nodeStore.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-21 14:02
+Last Modified: 2020-05-21 14:02
+--------------------------------------------
+Description:
+Array-backed storage of the branch and bound nodes. Every node keeps the
+index of its parent and only its own bound changes (the delta), the full
+bound vectors are rebuilt from the deltas on the path to the root.
+'''
+import numpy as np
+
+LOWER = 0
+UPPER = 1
+
+
+def ChildDeltas(branch_var, side, value, fixed=()):
+    '''
+    Bound changes of a child: its branching bound followed by the bound
+    changes (variables, sides, values) fixed at the parent for its subtree.
+    '''
+    if not fixed:
+        return [branch_var], [side], [value]
+    variables, sides, values = fixed
+    return (np.concatenate(([branch_var], variables)),
+            np.concatenate(([side], sides)),
+            np.concatenate(([value], values)))
+
+
+class NodeStore(object):
+    '''
+    Parallel arrays indexed by slot, the slot of node id i is slot[i]. Deltas
+    are kept in flat arrays and the node in slot k owns
+    delta_var[delta_start[k]:delta_start[k] + delta_len[k]].
+    A node is freed once it is closed (popped and processed, or pruned) and
+    its subtree holds no open node, so only the open nodes and their
+    ancestors are stored. Freed slots are reused and the deltas of freed
+    nodes are packed away before the delta arrays grow.
+        attributes:
+            slot:   dict of the slot of every stored node id
+            parent: slot of the parent, -1 for the root
+            depth:  depth in the tree
+            obj:    objective value of the LP relaxation
+            iicount, iisum: integer infeasibility count and sum
+        methods:
+            close(index):   the node is done, free it and the ancestors left
+                            without open descendants
+            len():          number of stored nodes
+            save_state(), load_state(state): the nodes as a dict of arrays,
+                                             for checkpoints
+    '''
+
+    def __init__(self, root_lower, root_upper, capacity=1024):
+        self.root_lower = np.asarray(root_lower, dtype=float)
+        self.root_upper = np.asarray(root_upper, dtype=float)
+        self.slot = {}
+        self.node_id = np.full(capacity, -1, dtype=np.int64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.depth = np.zeros(capacity, dtype=np.int32)
+        self.obj = np.zeros(capacity)
+        self.iicount = np.zeros(capacity, dtype=np.int64)
+        self.iisum = np.zeros(capacity)
+        # stored children and whether the node itself is done
+        self.children = np.zeros(capacity, dtype=np.int32)
+        self.closed = np.zeros(capacity, dtype=bool)
+        self.delta_start = np.zeros(capacity, dtype=np.int64)
+        self.delta_len = np.zeros(capacity, dtype=np.int32)
+        self.delta_var = np.zeros(capacity, dtype=np.int32)
+        self.delta_side = np.zeros(capacity, dtype=np.uint8)
+        self.delta_val = np.zeros(capacity)
+        self.num_deltas = 0  # end of the used part of the delta arrays
+        self.live_deltas = 0  # deltas of the stored nodes
+        self.free = list(range(capacity - 1, -1, -1))
+        # bounds of the last node, children of that node are rebuilt
+        # incrementally, which is always the case during a dive
+        self._cached = None
+
+    def __len__(self):
+        return len(self.slot)
+
+    def _grow_nodes(self):
+        capacity = len(self.parent)
+        for name in ['node_id', 'parent', 'depth', 'obj', 'iicount', 'iisum',
+                     'children', 'closed', 'delta_start', 'delta_len']:
+            old = getattr(self, name)
+            new = np.zeros(2 * capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self.node_id[capacity:] = -1
+        self.parent[capacity:] = -1
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _grow_deltas(self, size):
+        capacity = len(self.delta_var)
+        if size <= capacity:
+            return
+        if 2 * (self.live_deltas + size - self.num_deltas) <= capacity:
+            # most deltas belong to freed nodes, pack the others instead
+            self._pack_deltas()
+            return
+        new_capacity = max(2 * capacity, size)
+        for name in ['delta_var', 'delta_side', 'delta_val']:
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _pack_deltas(self):
+        # the deltas of the stored nodes to the front, in slot order
+        slots = np.flatnonzero(self.node_id >= 0)
+        idx = self._delta_index(slots)
+        for name in ['delta_var', 'delta_side', 'delta_val']:
+            array = getattr(self, name)
+            array[:len(idx)] = array[idx]
+        lens = self.delta_len[slots]
+        self.delta_start[slots] = np.cumsum(lens) - lens
+        self.num_deltas = len(idx)
+
+    def add(self, index, parent, variables=(), sides=(), values=()):
+        '''
+        Register node index as a child of parent with its own bound changes,
+        side is LOWER for x >= value and UPPER for x <= value.
+        '''
+        if not self.free:
+            self._grow_nodes()
+        slot = self.free.pop()
+        k = len(variables)
+        self._grow_deltas(self.num_deltas + k)
+        start = self.num_deltas
+        self.delta_var[start:start + k] = variables
+        self.delta_side[start:start + k] = sides
+        self.delta_val[start:start + k] = values
+        self.num_deltas += k
+        self.live_deltas += k
+        self.delta_start[slot] = start
+        self.delta_len[slot] = k
+        self.slot[index] = slot
+        self.node_id[slot] = index
+        self.children[slot] = 0
+        self.closed[slot] = False
+        if parent is None:
+            self.parent[slot] = -1
+            self.depth[slot] = 0
+        else:
+            parent = self.slot[parent]
+            self.parent[slot] = parent
+            self.depth[slot] = self.depth[parent] + 1
+            self.children[parent] += 1
+
+    def close(self, index):
+        '''
+        Node index is done: it was processed, and branched on if it has
+        children, or it was pruned. It is freed once none of its children is
+        stored, and so are its ancestors that are left closed and childless.
+        '''
+        slot = self.slot[index]
+        self.closed[slot] = True
+        while slot >= 0 and self.closed[slot] and not self.children[slot]:
+            parent = self.parent[slot]
+            del self.slot[int(self.node_id[slot])]
+            self.node_id[slot] = -1
+            self.live_deltas -= int(self.delta_len[slot])
+            self.free.append(int(slot))
+            if parent >= 0:
+                self.children[parent] -= 1
+            slot = parent
+
+    def tighten_root(self, variables, sides, values):
+        '''
+        Tighten the root bounds, which then hold for every node, the
+        bounds of the cached node are rebuilt from the new root bounds.
+        '''
+        is_upper = sides == UPPER
+        np.minimum.at(self.root_upper, variables[is_upper], values[is_upper])
+        np.maximum.at(self.root_lower, variables[~is_upper], values[~is_upper])
+        self._cached = None
+
+    def tighten(self, index, variables, sides, values):
+        '''
+        Add bound changes to the deltas of node index, for the node and its
+        subtree. Unless they are the last ones, the deltas of the node are
+        first moved to the end of the flat arrays.
+        '''
+        slot = self.slot[index]
+        k = len(variables)
+        length = self.delta_len[slot]
+        self._grow_deltas(self.num_deltas + length + k)
+        start = self.delta_start[slot]
+        if start + length != self.num_deltas:
+            for name in ['delta_var', 'delta_side', 'delta_val']:
+                array = getattr(self, name)
+                array[self.num_deltas:self.num_deltas + length] = \
+                    array[start:start + length]
+            start = self.delta_start[slot] = self.num_deltas
+            self.num_deltas += length
+        end = start + length
+        self.delta_var[end:end + k] = variables
+        self.delta_side[end:end + k] = sides
+        self.delta_val[end:end + k] = values
+        self.num_deltas += k
+        self.live_deltas += k
+        self.delta_len[slot] += k
+        if self._cached is not None and self._cached[0] == index:
+            is_upper = sides == UPPER
+            np.minimum.at(self._cached[2], variables[is_upper],
+                          values[is_upper])
+            np.maximum.at(self._cached[1], variables[~is_upper],
+                          values[~is_upper])
+
+    def _path(self, slot):
+        # slots from slot up to the root
+        slots = []
+        while slot >= 0:
+            slots.append(slot)
+            slot = self.parent[slot]
+        return slots
+
+    def path(self, index):
+        '''Node ids from index up to the root.'''
+        return self.node_id[self._path(self.slot[index])].tolist()
+
+    def _delta_index(self, slots):
+        # positions of the deltas of slots in the flat arrays
+        if len(slots) == 1:
+            start = self.delta_start[slots[0]]
+            return np.arange(start, start + self.delta_len[slots[0]])
+        starts = self.delta_start[slots]
+        lens = self.delta_len[slots]
+        return np.repeat(starts - np.cumsum(lens) + lens, lens) + \
+            np.arange(lens.sum())
+
+    def deltas(self, nodes):
+        '''Variables, sides and values of the bound changes of nodes.'''
+        idx = self._delta_index(np.array([self.slot[index] for index in nodes],
+                                         dtype=np.int64))
+        return self.delta_var[idx], self.delta_side[idx], self.delta_val[idx]
+
+    def bounds(self, index):
+        '''
+        Full lower and upper bound vectors of a node, from the cached
+        bounds of the node or its parent when possible and otherwise in one
+        vectorized pass over the deltas of the path.
+        '''
+        if self._cached is not None and self._cached[0] == index:
+            return self._cached[1].copy(), self._cached[2].copy()
+        slot = self.slot[index]
+        parent = self.parent[slot]
+        if self._cached is not None and parent >= 0 and \
+                self._cached[0] == self.node_id[parent]:
+            lower = self._cached[1].copy()
+            upper = self._cached[2].copy()
+            slots = np.array([slot])
+        else:
+            lower = self.root_lower.copy()
+            upper = self.root_upper.copy()
+            slots = np.array(self._path(slot), dtype=np.int64)
+        idx = self._delta_index(slots)
+        variables, sides, values = (self.delta_var[idx], self.delta_side[idx],
+                                    self.delta_val[idx])
+        is_upper = sides == UPPER
+        np.minimum.at(upper, variables[is_upper], values[is_upper])
+        np.maximum.at(lower, variables[~is_upper], values[~is_upper])
+        self._cached = (index, lower, upper)
+        return lower.copy(), upper.copy()
+
+    def save_state(self):
+        # the stored nodes by slot, parents as node ids and the deltas
+        # packed in the same order
+        slots = np.flatnonzero(self.node_id >= 0)
+        state = dict((name, getattr(self, name)[slots]) for name in
+                     ['node_id', 'depth', 'obj', 'iicount', 'iisum',
+                      'children', 'closed', 'delta_len'])
+        parent = self.parent[slots]
+        state['parent'] = np.where(parent >= 0,
+                                   self.node_id[np.maximum(parent, 0)], -1)
+        idx = self._delta_index(slots)
+        state.update((name, getattr(self, name)[idx]) for name in
+                     ['delta_var', 'delta_side', 'delta_val'])
+        state['root_lower'] = self.root_lower
+        state['root_upper'] = self.root_upper
+        return state
+
+    def load_state(self, state):
+        n = len(state['node_id'])
+        while len(self.parent) < n:
+            self._grow_nodes()
+        for name in ['node_id', 'depth', 'obj', 'iicount', 'iisum',
+                     'children', 'closed', 'delta_len']:
+            getattr(self, name)[:n] = state[name]
+        self.slot = dict((int(index), slot) for slot, index in
+                         enumerate(state['node_id'].tolist()))
+        self.parent[:n] = [-1 if index < 0 else self.slot[index]
+                           for index in state['parent'].tolist()]
+        self.free = list(range(len(self.parent) - 1, n - 1, -1))
+        lens = self.delta_len[:n]
+        self.delta_start[:n] = np.cumsum(lens) - lens
+        self.num_deltas = self.live_deltas = len(state['delta_var'])
+        self._grow_deltas(self.num_deltas)
+        for name in ['delta_var', 'delta_side', 'delta_val']:
+            getattr(self, name)[:self.num_deltas] = state[name]
+        self.root_lower = np.array(state['root_lower'], dtype=float)
+        self.root_upper = np.array(state['root_upper'], dtype=float)
+        self._cached = None
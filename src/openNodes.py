@@ -0,0 +1,386 @@
+'''
+File: openNodes.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-26 10:05
+Last Modified: 2020-05-26 17:30
+--------------------------------------------
+Description:
+Open nodes of the tree search. The nodes are kept in parallel numpy columns
+and the heap of the search strategy only holds (priority, sequence number,
+slot) triples. The bound column is scanned in one vectorized pass when the
+incumbent improves, so all nodes that it dominates are dropped at once
+instead of one by one when they are popped.
+The largest bound over the open nodes, the global bound of the search, is
+kept up to date with a heap of the distinct bounds and their counts.
+With a budget, the open nodes of lowest priority are written in batches to
+a memory-mapped file once the budget is exceeded and a batch is read back
+as soon as it holds the next node to pop.
+'''
+import os
+import heapq
+import itertools
+import tempfile
+import numpy as np
+
+# flags
+GEQ = 1  # sense is '>=', otherwise '<='
+BRANCHED = 2  # the node has a branching constraint (not the root)
+HAS_BASIS = 4  # the node carries a warm start basis
+# two basic statuses, the padding of a packed basis
+BASIC_PAD = 0x11
+
+
+def _record_dtype(width):
+    # an open node in the spill file, bases are width bytes
+    fields = [('priority', 'f8'), ('seq', 'i8'), ('index', 'i8'),
+              ('parent', 'i8'), ('relax', 'f8'), ('branch_var', 'i8'),
+              ('branch_var_value', 'f8'), ('rhs', 'i8'), ('flags', 'u1')]
+    if width:
+        fields.append(('basis', 'u1', (width,)))
+    return np.dtype(fields)
+
+
+def _widen(records, width):
+    # records in the dtype of bases width bytes long
+    wide = np.zeros(len(records), dtype=_record_dtype(width))
+    for name in records.dtype.names:
+        if name != 'basis':
+            wide[name] = records[name]
+    if width:
+        wide['basis'] = BASIC_PAD
+        if 'basis' in records.dtype.names:
+            wide['basis'][:, :records.dtype['basis'].shape[0]] = \
+                records['basis']
+    return wide
+
+
+class OpenNodes(object):
+    '''
+    Priority queue of open nodes stored in numpy columns.
+    Nodes go in and come out as the queue entries of the search loops,
+        (index, parent, relax, branch_var, branch_var_value, sense, rhs, basis)
+    where relax is the LP value of the parent (None for the root) and
+    bounds the node from above. Nodes of equal priority are popped in the
+    order they were pushed.
+        budget:    largest number of open nodes kept in memory, None for
+                   no limit. Past the budget the nodes of lowest priority
+                   are spilled until half of the budget is left
+        spill_dir: directory of the spill file, None for the system default
+        attributes:
+            purged:  number of nodes dropped by prune
+            peak:    largest number of open nodes
+            spilled: number of nodes written to the spill file
+        methods:
+            push(key, priority, node), pop(), isEmpty(), len()
+            prune(LB, removed=None):
+                          drop every node with bound <= LB and return their
+                          number, their (index, parent) pairs are appended
+                          to the list removed if one is given
+            best_bound(): largest bound of an open node, -inf if there is
+                          none and inf while the root is open
+            close():      remove the spill file
+            save_state(), load_state(state): the open nodes, in memory and
+                          spilled, as a dict of arrays, for checkpoints
+    '''
+
+    def __init__(self, capacity=1024, budget=None, spill_dir=None):
+        self.heap = []  # (priority, seq, slot)
+        self.counter = itertools.count()
+        self.size = 0  # nodes in memory
+        self.purged = 0
+        self.peak = 0
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.spill_file = None
+        self.spill_end = 0
+        # [offset, count, (priority, seq) of its first node, largest bound,
+        #  record dtype]
+        self.batches = []
+        self.on_disk = 0
+        self.spilled = 0
+        # distinct bounds of the nodes in memory, siblings share theirs
+        self.bound_count = {}
+        self.bound_heap = []  # negated bounds, may hold stale ones
+        self.unbounded = 0  # open root nodes
+        # one slot per open node, seq is -1 for free slots
+        self.seq = np.full(capacity, -1, dtype=np.int64)
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.parent = np.zeros(capacity, dtype=np.int64)
+        self.relax = np.zeros(capacity)
+        self.branch_var = np.zeros(capacity, dtype=np.int64)
+        self.branch_var_value = np.zeros(capacity)
+        self.rhs = np.zeros(capacity, dtype=np.int64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.basis = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return self.size + self.on_disk
+
+    def isEmpty(self):
+        return self.size + self.on_disk == 0
+
+    def _grow(self):
+        capacity = len(self.seq)
+        for name in ['seq', 'index', 'parent', 'relax', 'branch_var',
+                     'branch_var_value', 'rhs', 'flags']:
+            old = getattr(self, name)
+            new = np.zeros(2 * capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self.seq[capacity:] = -1
+        self.basis.extend([None] * capacity)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def push(self, key, priority, node):
+        (_, parent, relax, branch_var, branch_var_value, sense, rhs,
+         basis) = node
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        seq = next(self.counter)
+        self.seq[slot] = seq
+        self.index[slot] = key
+        self.basis[slot] = basis
+        if parent is None:
+            self.flags[slot] = 0
+        else:
+            self.parent[slot] = parent
+            self.relax[slot] = relax
+            self.branch_var[slot] = branch_var
+            self.branch_var_value[slot] = branch_var_value
+            self.rhs[slot] = rhs
+            self.flags[slot] = BRANCHED | (GEQ if sense == '>=' else 0)
+        heapq.heappush(self.heap, (priority, seq, slot))
+        self.size += 1
+        self._count(slot, 1)
+        if self.size + self.on_disk > self.peak:
+            self.peak = self.size + self.on_disk
+        if self.budget is not None and self.size > self.budget:
+            self._spill(self.size - self.budget // 2)
+
+    def _node(self, slot):
+        flags = self.flags[slot]
+        if not flags & BRANCHED:
+            return (int(self.index[slot]), None, None, None, None, None, None,
+                    self.basis[slot])
+        return (int(self.index[slot]), int(self.parent[slot]),
+                float(self.relax[slot]), int(self.branch_var[slot]),
+                self.branch_var_value[slot], '>=' if flags & GEQ else '<=',
+                int(self.rhs[slot]), self.basis[slot])
+
+    def _count(self, slot, step):
+        if not self.flags[slot] & BRANCHED:
+            self.unbounded += step
+            return
+        bound = float(self.relax[slot])
+        count = self.bound_count.get(bound, 0) + step
+        if count:
+            if count == 1 and step == 1:
+                heapq.heappush(self.bound_heap, -bound)
+                if len(self.bound_heap) > 2 * len(self.bound_count) + 1024:
+                    self.bound_heap = [-b for b in self.bound_count]
+                    heapq.heapify(self.bound_heap)
+            self.bound_count[bound] = count
+        else:
+            del self.bound_count[bound]
+
+    def best_bound(self):
+        if self.unbounded:
+            return np.inf
+        heap = self.bound_heap
+        while heap and -heap[0] not in self.bound_count:
+            heapq.heappop(heap)
+        bound = -heap[0] if heap else -np.inf
+        for batch in self.batches:
+            bound = max(bound, batch[3])
+        return bound
+
+    def _release(self, slot):
+        self._count(slot, -1)
+        self.seq[slot] = -1
+        self.basis[slot] = None
+        self.free.append(slot)
+        self.size -= 1
+
+    def pop(self):
+        while True:
+            # entries of removed nodes off the top
+            while self.heap and \
+                    self.seq[self.heap[0][2]] != self.heap[0][1]:
+                heapq.heappop(self.heap)
+            # a spilled node comes before the top of the heap
+            if self.batches:
+                batch = min(self.batches, key=lambda batch: batch[2])
+                if not self.heap or batch[2] < self.heap[0][:2]:
+                    self._page_in(batch)
+                    continue
+            if not self.heap:
+                raise KeyError('pop from an empty queue')
+            slot = heapq.heappop(self.heap)[2]
+            node = self._node(slot)
+            self._release(slot)
+            return node
+
+    def prune(self, LB, removed=None):
+        dominated = np.flatnonzero((self.seq >= 0) &
+                                   (self.flags & BRANCHED > 0) &
+                                   (self.relax <= LB))
+        count = len(dominated)
+        if removed is not None:
+            # the root is never dominated, every removed node has a parent
+            removed.extend(zip(self.index[dominated].tolist(),
+                               self.parent[dominated].tolist()))
+        for slot in dominated.tolist():
+            self._release(slot)
+        # spilled batches that are dominated as a whole, only read back
+        # when the nodes are asked for
+        for batch in [batch for batch in self.batches if batch[3] <= LB]:
+            self.batches.remove(batch)
+            self.on_disk -= batch[1]
+            count += batch[1]
+            if removed is not None:
+                records = self._read(batch)
+                removed.extend(zip(records['index'].tolist(),
+                                   records['parent'].tolist()))
+        self._truncate()
+        self.purged += count
+        # the heap entries of removed nodes stay until they are popped,
+        # keep only the live ones once they are the minority
+        if len(self.heap) > 2 * self.size + 64:
+            seq = self.seq
+            self.heap = [entry for entry in self.heap
+                         if seq[entry[2]] == entry[1]]
+            heapq.heapify(self.heap)
+        return count
+
+    def _records(self, entries):
+        # (priority, seq, slot) heap entries as records of the spill file
+        slots = np.array([entry[2] for entry in entries], dtype=np.int64)
+        basis = [self.basis[slot] for slot in slots.tolist()]
+        # bases grow with the rows added to the LP, every batch has the
+        # width of its longest basis
+        width = max([len(b) for b in basis if b is not None] or [0])
+        records = np.zeros(len(entries), dtype=_record_dtype(width))
+        records['priority'] = [entry[0] for entry in entries]
+        records['seq'] = self.seq[slots]
+        for name in ['index', 'parent', 'relax', 'branch_var',
+                     'branch_var_value', 'rhs', 'flags']:
+            records[name] = getattr(self, name)[slots]
+        has_basis = np.array([b is not None for b in basis], dtype=bool)
+        if has_basis.any():
+            # shorter bases are padded with basic statuses, the status of
+            # the rows added after them (see PersistentLP.get_basis)
+            padded = np.full((has_basis.sum(), width), BASIC_PAD, dtype=np.uint8)
+            for row, b in zip(padded, [b for b in basis if b is not None]):
+                row[:len(b)] = b
+            records['basis'][has_basis] = padded
+            records['flags'][has_basis] |= HAS_BASIS
+        return records
+
+    def _write(self, records):
+        # append a batch of records to the spill file
+        if self.spill_file is None:
+            fd, self.spill_file = tempfile.mkstemp(suffix='.nodes',
+                                                   dir=self.spill_dir)
+            os.close(fd)
+        with open(self.spill_file, 'r+b') as f:
+            f.seek(self.spill_end)
+            f.write(records.tobytes())
+        # the root has no bound, a batch holding it is never dominated
+        bound = np.where(records['flags'] & BRANCHED > 0, records['relax'],
+                         np.inf)
+        first = np.lexsort((records['seq'], records['priority']))[0]
+        self.batches.append([self.spill_end, len(records),
+                             (float(records['priority'][first]),
+                              int(records['seq'][first])), bound.max(),
+                             records.dtype])
+        self.spill_end += records.nbytes
+        self.on_disk += len(records)
+
+    def _spill(self, num):
+        # the num live nodes of lowest priority go to the end of the file
+        seq = self.seq
+        live = sorted(entry for entry in self.heap if seq[entry[2]] == entry[1])
+        # a sorted list is a heap
+        self.heap = live[:len(live) - num]
+        out = live[len(live) - num:]
+        self._write(self._records(out))
+        for entry in out:
+            self._release(entry[2])
+        self.spilled += len(out)
+
+    def _read(self, batch):
+        offset, count = batch[0], batch[1]
+        records = np.memmap(self.spill_file, dtype=batch[4], mode='r',
+                            offset=offset, shape=(count,))
+        return np.array(records)
+
+    def _page_in(self, batch):
+        # nodes keep their sequence numbers so ties are still broken by push
+        # order, past the budget the nodes of lowest priority go back out
+        self.batches.remove(batch)
+        records = self._read(batch)
+        self.on_disk -= len(records)
+        self._truncate()
+        self._insert(records)
+        if self.budget is not None and self.size > self.budget:
+            self._spill(self.size - max(self.budget // 2, 1))
+
+    def _insert(self, records):
+        # records back into memory, under their priorities and sequence
+        # numbers
+        for record in records:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            for name in ['seq', 'index', 'parent', 'relax', 'branch_var',
+                         'branch_var_value', 'rhs']:
+                getattr(self, name)[slot] = record[name]
+            flags = int(record['flags'])
+            self.flags[slot] = flags & (GEQ | BRANCHED)
+            self.basis[slot] = np.array(record['basis']) \
+                if flags & HAS_BASIS else None
+            self.heap.append((float(record['priority']), int(record['seq']),
+                              slot))
+            self.size += 1
+            self._count(slot, 1)
+        heapq.heapify(self.heap)
+
+    def _truncate(self):
+        # the file is reused once every batch has been read back
+        if not self.batches and self.spill_end:
+            with open(self.spill_file, 'r+b') as f:
+                f.truncate(0)
+            self.spill_end = 0
+
+    def close(self):
+        if self.spill_file is not None:
+            os.remove(self.spill_file)
+            self.spill_file = None
+
+    def save_state(self):
+        seq = self.seq
+        live = [entry for entry in self.heap if seq[entry[2]] == entry[1]]
+        parts = [self._records(live)] + [self._read(batch)
+                                         for batch in self.batches]
+        width = max(part.dtype['basis'].shape[0] if 'basis' in
+                    part.dtype.names else 0 for part in parts)
+        # the batch of every node, -1 for the nodes in memory
+        batch = np.repeat(np.arange(-1, len(self.batches)),
+                          [len(part) for part in parts])
+        next_seq = next(self.counter)
+        self.counter = itertools.count(next_seq)
+        return {'records': np.concatenate([_widen(part, width)
+                                           for part in parts]),
+                'batch': batch, 'next_seq': next_seq, 'purged': self.purged,
+                'peak': self.peak, 'spilled': self.spilled}
+
+    def load_state(self, state):
+        records, batch = state['records'], state['batch']
+        for k in range(int(batch.max(initial=-1)) + 1):
+            self._write(records[batch == k])
+        self._insert(records[batch < 0])
+        self.counter = itertools.count(int(state['next_seq']))
+        for name in ['purged', 'peak', 'spilled']:
+            setattr(self, name, int(state[name]))
@@ -0,0 +1,410 @@
+'''
+File: parallelSearch.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-23 15:20
+Last Modified: 2020-05-23 15:20
+--------------------------------------------
+Description:
+Parallel tree search. Worker processes hold their own persistent LP, solve
+the node LPs and choose the branching variables, while the master owns the
+open nodes, the incumbent and the pseudocost tables. Results are folded in
+by the master one at a time, so updates of the incumbent and of the
+pseudocosts are atomic.
+'''
+import math
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+import numpy as np
+from coinor.grumpy import PSEUDOCOST_BRANCHING, INFINITY
+from cylp.py.modeling.CyLPModel import CyLPArray
+try:
+    from .lpEngine import PersistentLP
+    from .pseudocost import Pseudocost
+    from .nodeStore import NodeStore
+    from .branching import BranchingVariable, UpdatePseudocost, ChildPriorities
+    from .branching import RELIABILITY_BRANCHING, HYBRID
+    from .searchLog import SearchLog
+    from .openNodes import OpenNodes
+    from .searchLimits import SearchLimits, Gap, OPTIMAL, INFEASIBLE
+    from .heuristics import PrimalHeuristics
+    from .reducedCostFixing import ReducedCostFixing
+    from .propagation import BoundPropagator
+    from .searchOptions import PERSISTENT_LP
+    from .workerProcesses import Send, Receive, StopWorkers
+    from .searchSteps import EvaluateSolution, NodeStatus, Incumbent, \
+        SearchCounters, NodePruned, RunHeuristics, IncumbentImproved, \
+        AddChildren, SearchStats
+except ImportError:
+    from lpEngine import PersistentLP
+    from pseudocost import Pseudocost
+    from nodeStore import NodeStore
+    from branching import BranchingVariable, UpdatePseudocost, ChildPriorities
+    from branching import RELIABILITY_BRANCHING, HYBRID
+    from searchLog import SearchLog
+    from openNodes import OpenNodes
+    from searchLimits import SearchLimits, Gap, OPTIMAL, INFEASIBLE
+    from heuristics import PrimalHeuristics
+    from reducedCostFixing import ReducedCostFixing
+    from propagation import BoundPropagator
+    from searchOptions import PERSISTENT_LP
+    from workerProcesses import Send, Receive, StopWorkers
+    from searchSteps import EvaluateSolution, NodeStatus, Incumbent, \
+        SearchCounters, NodePruned, RunHeuristics, IncumbentImproved, \
+        AddChildren, SearchStats
+
+
+def _solve_node(engine, pseudo, message, OBJ, MAT, RHS, rel_param, integer,
+                cuts):
+    # the LP and the branching variable of one node
+    (_, cur_index, lower, upper, basis, LB, changed,
+     branch_strategy, average_num_pivot, complete_enumeration,
+     score_rule, reduced_costs) = message
+    start = time.time()
+    if changed is not None:
+        pseudo.set_columns(*changed)
+    if basis is not None:
+        s = engine.resolve(lower, upper, basis)
+    else:
+        s = engine.solve(lower, upper)
+    result = {'index': cur_index, 'code': s.getStatusCode(),
+              'iteration': s.iteration, 'branching_var': None,
+              'counts': None}
+    if result['code'] == 0:
+        (var_values, relax, integer_solution, result['iicount'],
+         result['iisum']) = EvaluateSolution(
+            np.round(engine.x, 7), -round(s.objectiveValue, 7), integer,
+            OBJ, MAT, RHS, (lower, upper) if cuts else None)
+        result['relax'] = relax
+        result['var_values'] = var_values
+        result['integer'] = integer_solution
+        result['basis'] = engine.get_basis()
+        if reduced_costs:
+            result['reduced_costs'] = np.array(s.dualVariableSolution['x'])
+        if not integer_solution and (complete_enumeration or relax > LB):
+            result['branching_var'], result['counts'] = BranchingVariable(
+                branch_strategy, var_values, relax, pseudo,
+                s=s, rel_param=rel_param,
+                average_num_pivot=average_num_pivot, score_rule=score_rule,
+                integer=integer)
+    result['time'] = time.time() - start
+    engine.restore()
+    return result
+
+
+def _node_worker(conn, OBJ, MAT, RHS, lower, upper, solver, rel_param,
+                 integer, cuts):
+    engine = PersistentLP(CyLPArray(OBJ), MAT, CyLPArray(RHS), lower, upper,
+                          solver)
+    # a copy of the master's pseudocosts, kept up to date column by column
+    pseudo = Pseudocost(-OBJ, rel_param[0])
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] != 'node':
+                break
+            conn.send(_solve_node(engine, pseudo, message, OBJ, MAT, RHS,
+                                  rel_param, integer, cuts))
+    except (EOFError, BrokenPipeError):
+        # the master is gone
+        pass
+    conn.close()
+
+
+def ParallelSearch(OBJ, MAT, RHS, root_lower, root_upper, branch_strategy,
+                   search_strategy, complete_enumeration, solver, rel_param,
+                   options, log=None, tree=None, limits=None, integer=None):
+    '''
+    Branch and bound with options.node_workers node workers, the other
+    options (a SearchOptions) as in BranchAndBound.
+        deterministic:
+            True  - nodes are handed out in rounds of node_workers and the
+                    results are folded in pop order, which makes a run
+                    reproducible for a given number of workers
+            False - every worker gets a new node as soon as it is idle and
+                    results are folded in the order they arrive
+        heuristics: run by the master when it folds in a node, the dives on
+                an LP of its own
+        reduced_cost_fixing: the workers send the reduced costs back with
+                the LP solution
+        propagation: run by the master before it hands out a node
+        log:  SearchLog of the run, a default one if None
+        tree: LiveTree or TreeRecorder that receives the node events
+        limits: SearchLimits, once a limit is hit no more nodes are handed
+                out and the nodes being solved are folded in
+        integer: mask of the integer variables, None if all are
+    The workers keep a copy of the pseudocosts and every node carries the
+    columns that changed since the worker's previous node.
+    Returns opt, LB and the stats dict of BranchAndBound, with the total
+    node evaluation time of the workers and their utilization, the share of
+    the run's wall time that the workers spent on nodes.
+    '''
+    ACTUAL_BRANCH_STRATEGY = branch_strategy
+    numVars = len(OBJ)
+    num_workers = options.node_workers
+    warm_start = options.warm_start and options.lp_engine == PERSISTENT_LP
+    reduced_cost_fixing = options.reduced_cost_fixing
+    if integer is None:
+        integer = np.ones(numVars, dtype=bool)
+    if log is None:
+        log = SearchLog()
+    if limits is None:
+        limits = SearchLimits()
+    show_nodes = log.nodes
+    progress_interval = log.progress_interval
+    count = SearchCounters()
+    incumbent = Incumbent(numVars, log)
+    # pseudocosts start from the objective coefficients
+    pseudo = Pseudocost(-np.asarray(OBJ, dtype=float), rel_param[0])
+    heur = None
+    if options.heuristics:
+        heur = PrimalHeuristics(OBJ, MAT, RHS, root_lower, root_upper,
+                                options.heuristics, options.heuristic_interval,
+                                pseudo, solver=solver, integer=integer)
+    # reduced costs, solution and value of the root LP
+    root_rc = root_x = root_relax = None
+    worker_time = 0.0
+    uses_pseudocost = branch_strategy in [PSEUDOCOST_BRANCHING,
+                                          RELIABILITY_BRANCHING, HYBRID]
+    nodes = NodeStore(root_lower, root_upper)
+    propagator = BoundPropagator(MAT, RHS, integer) \
+        if options.propagation else None
+    Q = OpenNodes(budget=options.open_node_budget,
+                  spill_dir=options.spill_dir)
+    timer = time.time()
+    nodes.add(0, None)
+    Q.push(0, -INFINITY, (0, None, None, None, None, None, None, None))
+    running = {}
+
+    def dispatch(conn, node):
+        nonlocal branch_strategy
+        cur_index, basis = node[0], node[7]
+        # maximum allowed strong branch performed
+        if branch_strategy == HYBRID and nodes.depth[
+                nodes.slot[cur_index]] > max(int(numVars * 0.2), 5):
+            branch_strategy = PSEUDOCOST_BRANCHING
+        lower, upper = nodes.bounds(cur_index)
+        columns = None
+        if uses_pseudocost and changed[conn]:
+            idx = np.array(sorted(changed[conn]))
+            columns = (idx, pseudo.columns(idx))
+            changed[conn].clear()
+        Send(conn, worker_of[conn],
+             ('node', cur_index, lower, upper, basis if warm_start else None,
+              incumbent.value, columns, branch_strategy,
+              count.average_num_pivot, complete_enumeration,
+              options.score_rule, reduced_cost_fixing))
+        running[conn] = node
+
+    def fold(result, node):
+        # the master's view of the search changes only here
+        nonlocal worker_time, root_rc, root_x, root_relax
+        (cur_index, parent, relax, branch_var, branch_var_value, sense,
+         rhs, basis) = node
+        cur_depth = int(nodes.depth[nodes.slot[cur_index]])
+        # nodes found infeasible by propagation had no LP
+        if not result.get('propagated'):
+            count.solved(result['iteration'])
+            worker_time += result['time']
+        count.iter_count += 1
+        if result['counts'] is not None:
+            count.branched(result['counts'])
+        if progress_interval and count.iter_count % progress_interval == 0:
+            log.progress(time.time() - timer, count.iter_count,
+                         len(Q) + len(running), count.lp_count,
+                         incumbent.value, global_bound())
+        infeasible = result['code'] != 0
+        if infeasible:
+            if show_nodes:
+                log.write("Node: %s, Depth: %s, infeasible", cur_index,
+                          cur_depth)
+            relax = INFINITY
+            var_values = iicount = iisum = None
+        else:
+            relax = result['relax']
+            var_values = result['var_values']
+            iicount, iisum = result['iicount'], result['iisum']
+            if show_nodes:
+                log.write("Node: %s, Depth: %s, obj: %s", cur_index,
+                          cur_depth, relax)
+            if branch_var is not None:
+                UpdatePseudocost(pseudo, branch_var, sense, rhs,
+                                 branch_var_value,
+                                 nodes.obj[nodes.slot[parent]], relax)
+                for variables in changed.values():
+                    variables.add(branch_var)
+            if reduced_cost_fixing and parent is None:
+                root_rc, root_x, root_relax = (result['reduced_costs'],
+                                               var_values, relax)
+            if result['integer'] and relax > incumbent.value:
+                incumbent.update(relax, var_values, 'LP', cur_index,
+                                 time.time() - timer)
+                incumbent_improved()
+            if complete_enumeration:
+                relax = incumbent.value - 1
+        status, relax, iicount, iisum = NodeStatus(
+            nodes, cur_index, parent, relax, incumbent.value, infeasible,
+            result.get('integer', False), iicount, iisum,
+            complete_enumeration, integer)
+        if tree is not None or log.events:
+            fields = dict(index=cur_index, parent=parent,
+                          depth=cur_depth, status=status,
+                          obj=relax, iicount=iicount, iisum=iisum,
+                          branch_var=branch_var,
+                          branch_var_value=branch_var_value, sense=sense,
+                          rhs=rhs)
+            if tree is not None:
+                tree.node(**fields)
+            if log.events:
+                log.event('node', **fields)
+        branching_var = result['branching_var']
+        if status != 'candidate' or branching_var is None:
+            nodes.close(cur_index)
+            return
+        # Bounds fixed by reduced cost go to both children
+        fixed = ()
+        if reduced_cost_fixing and incumbent.value > -INFINITY and \
+                not complete_enumeration:
+            lower, upper = nodes.bounds(cur_index)
+            fixed = ReducedCostFixing(result['reduced_costs'], var_values,
+                                      lower, upper, relax, incumbent.value,
+                                      integer=integer)
+            count.node_fixings += len(fixed[0])
+        priority = ChildPriorities(search_strategy, cur_depth, relax,
+                                   var_values[branching_var], pseudo,
+                                   branching_var)
+        count.node_count = AddChildren(
+            nodes, Q, count.node_count, cur_index, relax, branching_var,
+            var_values[branching_var], priority, result['basis'], fixed, tree,
+            log)
+        # Primal heuristics on the LP solution of the node
+        if heur is not None and heur.due(count.iter_count):
+            if RunHeuristics(heur, var_values, *nodes.bounds(cur_index),
+                             incumbent, cur_index, time.time() - timer):
+                incumbent_improved()
+        nodes.close(cur_index)
+
+    def incumbent_improved():
+        # the workers receive the root fixings with the bounds of every node
+        count.root_fixings += IncumbentImproved(
+            incumbent.value, Q, nodes, None if root_rc is None else
+            (root_rc, root_x, root_relax), integer, tree, log)
+
+    def next_node():
+        # pop the next node that is not pruned by bound, nor infeasible by
+        # propagation
+        while not Q.isEmpty():
+            node = Q.pop()
+            if node[2] is not None and node[2] <= incumbent.value:
+                NodePruned(nodes, node[0], node[1], tree, log)
+                continue
+            if propagator is not None:
+                infeasible, fixed = propagator.propagate(
+                    *nodes.bounds(node[0]))
+                if infeasible:
+                    fold({'code': 1, 'propagated': True, 'counts': None},
+                         node)
+                    continue
+                if len(fixed[0]) and node[0] == 0:
+                    nodes.tighten_root(*fixed)
+                elif len(fixed[0]):
+                    nodes.tighten(node[0], *fixed)
+            return node
+        return None
+
+    def global_bound():
+        # open nodes and the nodes being solved
+        bound = max(Q.best_bound(), incumbent.value)
+        for node in running.values():
+            bound = max(bound, np.inf if node[2] is None else node[2])
+        return bound
+
+    stop_reason = None
+    connections = []
+    workers = []
+    try:
+        for _ in range(num_workers):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_node_worker,
+                args=(child_conn, np.asarray(OBJ, dtype=float), MAT,
+                      np.asarray(RHS, dtype=float), root_lower, root_upper,
+                      solver, rel_param, integer, bool(options.cuts)))
+            worker.daemon = True
+            worker.start()
+            child_conn.close()
+            connections.append(parent_conn)
+            workers.append(worker)
+        # variables whose pseudocosts changed since a worker last got a node
+        changed = {conn: set() for conn in connections}
+        # the worker at the other end of every pipe
+        worker_of = dict(zip(connections, workers))
+        idle = list(connections)
+        while not Q.isEmpty() or running:
+            if limits.active and stop_reason is None:
+                stop_reason = limits.check(time.time() - timer,
+                                           count.iter_count, incumbent.value,
+                                           global_bound())
+            if stop_reason is not None:
+                if not running:
+                    break
+                for conn in wait(list(running.keys())):
+                    fold(Receive(conn, worker_of[conn]), running.pop(conn))
+                continue
+            if options.deterministic:
+                batch = []
+                for conn in connections:
+                    node = next_node()
+                    if node is None:
+                        break
+                    dispatch(conn, node)
+                    batch.append(conn)
+                for conn in batch:
+                    fold(Receive(conn, worker_of[conn]), running.pop(conn))
+            else:
+                while idle:
+                    node = next_node()
+                    if node is None:
+                        break
+                    conn = idle.pop()
+                    dispatch(conn, node)
+                if not running:
+                    continue
+                for conn in wait(list(running.keys())):
+                    fold(Receive(conn, worker_of[conn]), running.pop(conn))
+                    idle.append(conn)
+    finally:
+        # also when a worker died or the search raised
+        StopWorkers(connections, workers)
+        Q.close()
+    LB, opt = incumbent.value, incumbent.solution
+    if stop_reason is None:
+        stop_reason = OPTIMAL if LB > -INFINITY else INFEASIBLE
+        best_bound = LB
+    else:
+        best_bound = global_bound()
+    gap = Gap(LB, best_bound)[1]
+    timer = int(math.ceil((time.time() - timer) * 1000))
+    utilization = worker_time * 1000 / (max(timer, 1) * num_workers)
+    if log.summary:
+        log.write("")
+        log.write("===========================================")
+        log.write("Branch and bound completed in %sms", timer)
+        log.write("Strategy: %s", ACTUAL_BRANCH_STRATEGY)
+        log.write("%s workers, worker utilization: %.2f", num_workers,
+                  utilization)
+        log.write("%s nodes visited ", count.node_count)
+        log.write("%s LP's solved", count.lp_count)
+        log.write("Stopped: %s, best bound: %s, gap: %s", stop_reason,
+                  best_bound, gap)
+        log.write("===========================================")
+        log.write("Objective function value")
+        log.write("%s", LB)
+        log.write("===========================================")
+    stat = SearchStats(timer, count, Q, best_bound, gap, stop_reason,
+                       incumbent, options, ACTUAL_BRANCH_STRATEGY, heur,
+                       propagator)
+    stat['Workers'] = num_workers
+    stat['Worker Time'] = int(math.ceil(worker_time * 1000))
+    stat['Worker Utilization'] = utilization
+    return opt, LB, stat
@@ -0,0 +1,291 @@
+'''
+File: presolve.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-29 16:40
+Last Modified: 2020-05-29 16:40
+--------------------------------------------
+Description:
+Root presolve of max c x s.t. MAT x <= RHS, lower <= x <= upper, with some
+or all of x integer.
+Bounds are propagated through the rows, rows that cannot bind under the
+bounds are removed, columns that are fixed, or that the objective and all
+of their rows push to the same bound (dual fixing, which covers empty
+columns), are removed, and the coefficients of the binary variables of
+every row are tightened to the slack the rest of the row leaves. Probing
+sets every binary variable to 0 and to 1 and propagates: an infeasible side
+fixes the variable, a bound both sides imply holds for the problem, and
+the implications between binary variables are added as rows. The search
+runs on the reduced problem, in which one column fixed at 1 carries the
+objective of the removed columns, and solutions are mapped back.
+'''
+import time
+import math
+import numpy as np
+import scipy.sparse as sp
+try:
+    from .propagation import BoundPropagator
+    from .nodeStore import UPPER
+except ImportError:
+    from propagation import BoundPropagator
+    from nodeStore import UPPER
+
+
+def _max_activity(A, lower, upper):
+    # largest activity of every row of the CSR matrix A, inf if unbounded
+    cols = A.indices
+    bound = np.where(A.data > 0, upper[cols], lower[cols])
+    infinite = np.isinf(bound)
+    row_of = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    activity = np.bincount(row_of, np.where(infinite, 0, A.data * bound),
+                           minlength=A.shape[0]).astype(float)
+    activity[np.bincount(row_of, infinite, minlength=A.shape[0]) > 0] = np.inf
+    return activity
+
+
+def _apply(lower, upper, fixed):
+    # bound changes as NodeStore deltas applied to copies of the bounds
+    lower, upper = lower.copy(), upper.copy()
+    variables, sides, values = fixed
+    is_upper = sides == UPPER
+    np.minimum.at(upper, variables[is_upper], values[is_upper])
+    np.maximum.at(lower, variables[~is_upper], values[~is_upper])
+    return lower, upper
+
+
+class Presolve(object):
+    '''
+    Presolve of the problem in the form handed to Clp, OBJ is the
+    minimization objective.
+        integer:          mask of the integer variables, None if all are
+        probing:          probe the binary variables
+        max_probes:       binary variables probed at most
+        max_implications: implication rows added at most, the number of
+                          rows of MAT if None
+        log:              SearchLog the summary of the reductions goes to
+        attributes:
+            infeasible:             the presolve proved the problem
+                                    infeasible, nothing is reduced then
+            OBJ, MAT, RHS, lower, upper, integer, numVars: the reduced
+                                    problem
+            columns:                original index of the reduced columns,
+                                    the last reduced column carries the
+                                    removed objective if carrier
+        methods:
+            solution(values):  solution of the reduced problem (dict or
+                               array) as a dict over the original columns
+            stats():           reductions and time
+    '''
+
+    def __init__(self, OBJ, MAT, RHS, lower, upper, probing=True,
+                 max_probes=1000, max_implications=None, max_rounds=10,
+                 tol=1e-9, integer=None, log=None):
+        start = time.time()
+        self.c = -np.asarray(OBJ, dtype=float)
+        self.A = sp.csr_matrix(MAT, dtype=float)
+        self.A.sum_duplicates()
+        self.A.eliminate_zeros()
+        self.b = np.array(RHS, dtype=float)
+        self.lo = np.array(lower, dtype=float)
+        self.up = np.array(upper, dtype=float)
+        self.numCons, self.numOrigVars = self.A.shape
+        if integer is None:
+            integer = np.ones(self.numOrigVars, dtype=bool)
+        self.is_integer = np.asarray(integer, dtype=bool)
+        self.alive = np.ones(self.numCons, dtype=bool)
+        self.original = (self.c, self.A.copy(), self.b.copy(), self.lo.copy(),
+                         self.up.copy())
+        self.max_rounds = max_rounds
+        self.tol = tol
+        self.infeasible = False
+        self.bounds_tightened = 0
+        self.coefficients_tightened = 0
+        self.dual_fixings = 0
+        self.probing_fixings = 0
+        self.implications = 0
+        self._reduce()
+        if probing and not self.infeasible:
+            if max_implications is None:
+                max_implications = self.numCons
+            self._probe(max_probes, max_implications)
+            if not self.infeasible:
+                self._reduce()
+        self._build()
+        self.time = time.time() - start
+        if log is not None and log.summary:
+            log.write("Presolve: %s rows and %s columns removed, %s "
+                      "coefficients tightened, %s fixings and %s "
+                      "implications by probing", self.rows_removed,
+                      len(self.removed), self.coefficients_tightened,
+                      self.probing_fixings, self.implications)
+
+    def _reduce(self):
+        for _ in range(self.max_rounds):
+            changed = False
+            A = self.A[self.alive]
+            b = self.b[self.alive]
+            # bounds implied by the rows
+            infeasible, fixed = BoundPropagator(
+                A, b, self.is_integer).propagate(self.lo, self.up)
+            if infeasible:
+                self.infeasible = True
+                return
+            if len(fixed[0]):
+                self.lo, self.up = _apply(self.lo, self.up, fixed)
+                self.bounds_tightened += len(fixed[0])
+                changed = True
+            # rows that hold for all the bounds
+            redundant = _max_activity(A, self.lo, self.up) <= b + self.tol
+            if redundant.any():
+                self.alive[np.flatnonzero(self.alive)[redundant]] = False
+                A = self.A[self.alive]
+                b = self.b[self.alive]
+                changed = True
+            # dual fixing: lowering a column with no negative entry only
+            # makes room in its rows, and so does raising one with no
+            # positive entry
+            has_pos = np.asarray((A > 0).sum(axis=0)).ravel() > 0
+            has_neg = np.asarray((A < 0).sum(axis=0)).ravel() > 0
+            free = self.lo < self.up
+            down = free & ~has_neg & (self.c <= 0) & np.isfinite(self.lo)
+            up = free & ~has_pos & (self.c >= 0) & np.isfinite(self.up) & \
+                ~down
+            if down.any() or up.any():
+                self.up[down] = self.lo[down]
+                self.lo[up] = self.up[up]
+                self.dual_fixings += int(down.sum() + up.sum())
+                changed = True
+            # coefficient tightening: a binary variable whose coefficient
+            # exceeds the gap between the largest activity and the right
+            # hand side gets the gap as coefficient, the gap is the same
+            # before and after
+            binary = (self.lo == 0) & (self.up == 1) & self.is_integer
+            gap = _max_activity(self.A, self.lo, self.up) - self.b
+            row_of = np.repeat(np.arange(self.A.shape[0]),
+                               np.diff(self.A.indptr))
+            a = self.A.data
+            g = gap[row_of]
+            candidate = self.alive[row_of] & binary[self.A.indices] & \
+                np.isfinite(g) & (g > self.tol)
+            pos = candidate & (a > g + self.tol)
+            neg = candidate & (-a > g + self.tol)
+            if pos.any() or neg.any():
+                self.b -= np.bincount(row_of[pos], a[pos] - g[pos],
+                                      minlength=len(self.b))
+                a[pos] = g[pos]
+                a[neg] = -g[neg]
+                self.coefficients_tightened += int(pos.sum() + neg.sum())
+                changed = True
+            if not changed:
+                break
+
+    def _probe(self, max_probes, max_implications):
+        propagator = BoundPropagator(self.A[self.alive], self.b[self.alive],
+                                     self.is_integer)
+        binary = (self.lo == 0) & (self.up == 1) & self.is_integer
+        rows = {}
+        for j in np.flatnonzero(binary)[:max_probes].tolist():
+            if self.lo[j] == self.up[j]:
+                continue
+            sides = []
+            for value in (0, 1):
+                lower, upper = self.lo.copy(), self.up.copy()
+                lower[j] = upper[j] = value
+                infeasible, fixed = propagator.propagate(lower, upper)
+                sides.append((infeasible,) + _apply(lower, upper, fixed))
+            (infeasible0, lower0, upper0), (infeasible1, lower1, upper1) = sides
+            if infeasible0 and infeasible1:
+                self.infeasible = True
+                return
+            if infeasible0 or infeasible1:
+                lower, upper = (lower1, upper1) if infeasible0 else \
+                    (lower0, upper0)
+            else:
+                # bounds both sides imply
+                lower = np.minimum(lower0, lower1)
+                upper = np.maximum(upper0, upper1)
+            fixings = int(np.count_nonzero((lower > self.lo) |
+                                           (upper < self.up)))
+            self.probing_fixings += fixings
+            self.lo = np.maximum(self.lo, lower)
+            self.up = np.minimum(self.up, upper)
+            if infeasible0 or infeasible1 or len(rows) >= max_implications:
+                continue
+            # implications between binaries, as rows a_j x_j + a_k x_k <= r
+            others = (self.lo == 0) & (self.up == 1) & self.is_integer
+            others[j] = False
+            for k in np.flatnonzero(others & (upper1 == 0)).tolist():
+                # x_j = 1 => x_k = 0
+                rows[((min(j, k), 1), (max(j, k), 1), 1)] = None
+            for k in np.flatnonzero(others & (lower1 == 1)).tolist():
+                # x_j = 1 => x_k = 1
+                rows[tuple(sorted([(j, 1), (k, -1)])) + (0,)] = None
+            for k in np.flatnonzero(others & (upper0 == 0)).tolist():
+                # x_j = 0 => x_k = 0
+                rows[tuple(sorted([(j, -1), (k, 1)])) + (0,)] = None
+            for k in np.flatnonzero(others & (lower0 == 1)).tolist():
+                # x_j = 0 => x_k = 1
+                rows[((min(j, k), -1), (max(j, k), -1), -1)] = None
+        if rows:
+            chosen = list(rows)[:max_implications]
+            cols = [row[i][0] for row in chosen for i in (0, 1)]
+            coefs = [row[i][1] for row in chosen for i in (0, 1)]
+            implication = sp.csr_matrix(
+                (np.array(coefs, dtype=float),
+                 (np.repeat(np.arange(len(chosen)), 2), cols)),
+                shape=(len(chosen), self.numOrigVars))
+            self.A = sp.vstack([self.A, implication]).tocsr()
+            self.b = np.concatenate((self.b, [row[2] for row in chosen]))
+            self.alive = np.concatenate((self.alive,
+                                         np.ones(len(chosen), dtype=bool)))
+            self.implications = len(chosen)
+
+    def _build(self):
+        if self.infeasible:
+            # the search runs on the original problem and proves it
+            self.c, self.A, self.b, self.lo, self.up = self.original
+            self.alive = np.ones(self.numCons, dtype=bool)
+            kept = np.arange(self.numOrigVars)
+        else:
+            kept = np.flatnonzero(self.lo < self.up)
+        rows = np.flatnonzero(self.alive)
+        removed = np.setdiff1d(np.arange(self.numOrigVars), kept)
+        A = self.A[rows]
+        self.columns = kept
+        self.fixed_values = self.lo[removed]
+        self.removed = removed
+        self.offset = float(self.c[removed].dot(self.lo[removed]))
+        self.rows_removed = len(self.alive) - len(rows)
+        self.MAT = A[:, kept]
+        self.RHS = self.b[rows] - A[:, removed].dot(self.lo[removed])
+        self.OBJ = -self.c[kept]
+        self.lower = self.lo[kept]
+        self.upper = self.up[kept]
+        self.integer = self.is_integer[kept]
+        self.carrier = self.offset != 0 or not len(kept)
+        if self.carrier:
+            self.MAT = sp.hstack([self.MAT,
+                                  sp.csr_matrix((len(rows), 1))]).tocsr()
+            self.OBJ = np.append(self.OBJ, -self.offset)
+            self.lower = np.append(self.lower, 1.0)
+            self.upper = np.append(self.upper, 1.0)
+            self.integer = np.append(self.integer, True)
+        else:
+            self.MAT = sp.csr_matrix(self.MAT)
+        self.numVars = len(self.OBJ)
+
+    def solution(self, values):
+        full = np.zeros(self.numOrigVars)
+        full[self.removed] = self.fixed_values
+        full[self.columns] = [values[i] for i in range(len(self.columns))]
+        return dict(enumerate(full.tolist()))
+
+    def stats(self):
+        return {'Rows Removed': self.rows_removed,
+                'Columns Removed': len(self.removed),
+                'Bounds Tightened': self.bounds_tightened,
+                'Dual Fixings': self.dual_fixings,
+                'Coefficients Tightened': self.coefficients_tightened,
+                'Probing Fixings': self.probing_fixings,
+                'Implications Added': self.implications,
+                'Presolve Infeasible': self.infeasible,
+                'Presolve Time': int(math.ceil(self.time * 1000))}
@@ -0,0 +1,179 @@
+'''
+File: propagation.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-29 10:15
+Last Modified: 2020-05-29 10:15
+--------------------------------------------
+Description:
+Activity-based bound propagation on the rows MAT x <= RHS. The smallest
+activity of a row under the column bounds leaves every variable of the row
+only the slack the other variables do not need, which bounds it, and a row
+whose smallest activity exceeds its right hand side proves the bounds
+infeasible without an LP. The activities are kept from one call to the
+next and updated only for the columns whose bounds changed, which during a
+dive are a handful.
+'''
+import time
+import numpy as np
+import scipy.sparse as sp
+try:
+    from .nodeStore import LOWER, UPPER
+except ImportError:
+    from nodeStore import LOWER, UPPER
+
+
+def _gather(indptr, items):
+    # positions of the entries of the rows (columns) items of a CSR (CSC)
+    # matrix, and the row (column) every entry belongs to
+    starts = indptr[items]
+    lens = indptr[items + 1] - starts
+    idx = np.repeat(starts - np.cumsum(lens) + lens, lens) + \
+        np.arange(lens.sum())
+    return idx, np.repeat(items, lens)
+
+
+def _contribution(a, lower, upper):
+    # smallest value of a x over lower <= x <= upper, the infinite ones are
+    # flagged and counted apart
+    bound = np.where(a > 0, lower, upper)
+    infinite = np.isinf(bound)
+    return np.where(infinite, 0, a * bound), infinite
+
+
+class BoundPropagator(object):
+    '''
+    Bound propagation on MAT x <= RHS.
+        integer:    mask of the integer variables, whose bounds are rounded,
+                    None if all of them are
+        max_passes: passes per call, every pass visits the rows of the
+                    columns tightened by the one before
+        attributes:
+            calls, fixings, infeasible: calls, bounds tightened and calls
+                                        that proved the bounds infeasible
+            time:                       seconds spent in propagate
+        methods:
+            propagate(lower, upper):  infeasible and the tightened bounds as
+                                      variables, sides and values of
+                                      NodeStore deltas
+    '''
+
+    def __init__(self, MAT, RHS, integer=None, max_passes=20, tol=1e-6):
+        self.CSR = sp.csr_matrix(MAT, dtype=float)
+        self.CSR.sum_duplicates()
+        self.CSR.eliminate_zeros()
+        self.CSC = self.CSR.tocsc()
+        self.RHS = np.asarray(RHS, dtype=float)
+        self.numCons, self.numVars = self.CSR.shape
+        if integer is None:
+            integer = np.ones(self.numVars, dtype=bool)
+        self.integer = np.asarray(integer, dtype=bool)
+        self.max_passes = max_passes
+        self.tol = tol
+        self.slack_tol = tol * np.maximum(np.abs(self.RHS), 1)
+        # row of every CSR entry
+        self.row_of = np.repeat(np.arange(self.numCons),
+                                np.diff(self.CSR.indptr))
+        # bounds the activities are kept for
+        self.lower = self.upper = None
+        self.min_activity = None
+        self.num_infinite = None
+        self.updates = 0
+        self.calls = 0
+        self.fixings = 0
+        self.infeasible = 0
+        self.time = 0.0
+
+    def _reset(self, lower, upper):
+        self.lower = lower.copy()
+        self.upper = upper.copy()
+        cols = self.CSR.indices
+        value, infinite = _contribution(self.CSR.data, lower[cols], upper[cols])
+        self.min_activity = np.bincount(self.row_of, value,
+                                        minlength=self.numCons).astype(float)
+        self.num_infinite = np.bincount(self.row_of, infinite,
+                                        minlength=self.numCons)
+        self.updates = 0
+        return np.arange(self.numCons)
+
+    def _update(self, cols, lower, upper):
+        # move the activities to the new bounds of cols, returns the rows
+        # that changed
+        idx, owner = _gather(self.CSC.indptr, cols)
+        a = self.CSC.data[idx]
+        rows = self.CSC.indices[idx]
+        old, old_infinite = _contribution(a, self.lower[owner],
+                                          self.upper[owner])
+        new, new_infinite = _contribution(a, lower[owner], upper[owner])
+        np.add.at(self.min_activity, rows, new - old)
+        np.add.at(self.num_infinite, rows,
+                  new_infinite.astype(np.int64) - old_infinite)
+        self.lower[cols] = lower[cols]
+        self.upper[cols] = upper[cols]
+        self.updates += 1
+        return np.unique(rows)
+
+    def propagate(self, lower, upper):
+        start = time.time()
+        self.calls += 1
+        lower = np.array(lower, dtype=float)
+        upper = np.array(upper, dtype=float)
+        if self.lower is None or self.updates > 1000:
+            # start over now and then, the updates accumulate round off
+            rows = self._reset(lower, upper)
+        else:
+            changed = np.flatnonzero((lower != self.lower) |
+                                     (upper != self.upper))
+            if len(changed) > self.numVars // 4:
+                rows = self._reset(lower, upper)
+            else:
+                rows = self._update(changed, lower, upper)
+        infeasible = False
+        for _ in range(self.max_passes):
+            if not len(rows):
+                break
+            if np.any((self.num_infinite[rows] == 0) &
+                      (self.min_activity[rows] > self.RHS[rows] +
+                       self.slack_tol[rows])):
+                infeasible = True
+                break
+            idx, owner = _gather(self.CSR.indptr, rows)
+            cols = self.CSR.indices[idx]
+            a = self.CSR.data[idx]
+            value, infinite = _contribution(a, self.lower[cols],
+                                            self.upper[cols])
+            # the rest of the row has to be finite to bound the variable
+            usable = self.num_infinite[owner] - infinite == 0
+            cols, a = cols[usable], a[usable]
+            bound = (self.RHS[owner] - self.min_activity[owner] +
+                     value)[usable] / a
+            integer = self.integer[cols]
+            bound[integer & (a > 0)] = np.floor(bound[integer & (a > 0)] +
+                                                self.tol)
+            bound[integer & (a < 0)] = np.ceil(bound[integer & (a < 0)] -
+                                               self.tol)
+            new_lower = self.lower.copy()
+            new_upper = self.upper.copy()
+            np.minimum.at(new_upper, cols[a > 0], bound[a > 0])
+            np.maximum.at(new_lower, cols[a < 0], bound[a < 0])
+            tightened = np.flatnonzero((new_upper < self.upper - self.tol) |
+                                       (new_lower > self.lower + self.tol))
+            if not len(tightened):
+                break
+            rows = self._update(tightened, new_lower, new_upper)
+            if np.any(self.lower[tightened] > self.upper[tightened] +
+                      self.tol):
+                infeasible = True
+                break
+        self.time += time.time() - start
+        if infeasible:
+            self.infeasible += 1
+            return True, (np.zeros(0, dtype=np.int64),
+                          np.zeros(0, dtype=np.uint8), np.zeros(0))
+        up = np.flatnonzero(self.upper < upper)
+        down = np.flatnonzero(self.lower > lower)
+        self.fixings += len(up) + len(down)
+        return False, (np.concatenate((up, down)),
+                       np.concatenate((np.full(len(up), UPPER, dtype=np.uint8),
+                                       np.full(len(down), LOWER,
+                                               dtype=np.uint8))),
+                       np.concatenate((self.upper[up], self.lower[down])))
@@ -0,0 +1,122 @@
+'''
+File: pseudocost.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-24 10:47
+Last Modified: 2020-05-24 10:47
+--------------------------------------------
+Description:
+Pseudocost tables backed by numpy arrays, with vectorized candidate scores.
+'''
+import numpy as np
+
+# score rules
+MIN_SCORE = 'min'  # min(q^-, q^+)
+WEIGHTED_SCORE = 'weighted'  # (1 - mu) * min(q^-, q^+) + mu * max(q^-, q^+)
+PRODUCT_SCORE = 'product'  # max(q^-, eps) * max(q^+, eps)
+
+
+class Pseudocost(object):
+    '''
+    Sums and counts of the objective change per unit of bound change for the
+    down and the up direction of every variable.
+        attributes:
+            init:          value used while a direction has no observation
+            sum_d, sum_u:  sums of the observed changes
+            count_d, count_u: number of observations
+            reliable:      min(count_d, count_u) >= eta_rel
+        methods:
+            update(var, sense, gain):   add one observation
+            mean_d(idx), mean_u(idx):   pseudocosts of variables idx
+            score(idx, down, up, rule): vectorized scores of variables idx
+            save_state(), load_state(state): the tables and the counts
+                                        as a dict of arrays, for checkpoints
+            columns(idx), set_columns(idx, columns): the sums and counts of
+                                        variables idx, to copy them to the
+                                        tables of a node worker
+    '''
+
+    def __init__(self, init, eta_rel=1):
+        init = np.asarray(init, dtype=float)
+        n = len(init)
+        self.init = init.copy()
+        self.eta_rel = eta_rel
+        self.sum_d = np.zeros(n)
+        self.sum_u = np.zeros(n)
+        self.count_d = np.zeros(n, dtype=np.int64)
+        self.count_u = np.zeros(n, dtype=np.int64)
+        self.reliable = np.zeros(n, dtype=bool) if eta_rel > 0 else \
+            np.ones(n, dtype=bool)
+
+    def update(self, var, sense, gain):
+        '''gain is the objective change divided by the bound change.'''
+        if sense == '<=':
+            self.sum_d[var] += gain
+            self.count_d[var] += 1
+        else:
+            self.sum_u[var] += gain
+            self.count_u[var] += 1
+        self.reliable[var] = min(self.count_d[var], self.count_u[var]) >= self.eta_rel
+
+    def save_state(self):
+        return {'init': self.init, 'eta_rel': self.eta_rel,
+                'sum_d': self.sum_d, 'sum_u': self.sum_u,
+                'count_d': self.count_d, 'count_u': self.count_u,
+                'reliable': self.reliable}
+
+    def load_state(self, state):
+        for name in ['init', 'sum_d', 'sum_u', 'count_d', 'count_u',
+                     'reliable']:
+            setattr(self, name, np.array(state[name],
+                                         dtype=getattr(self, name).dtype))
+        self.eta_rel = state['eta_rel'].item()
+
+    def columns(self, idx):
+        return (self.sum_d[idx], self.sum_u[idx], self.count_d[idx],
+                self.count_u[idx])
+
+    def set_columns(self, idx, columns):
+        (self.sum_d[idx], self.sum_u[idx], self.count_d[idx],
+         self.count_u[idx]) = columns
+        self.reliable[idx] = np.minimum(self.count_d[idx],
+                                        self.count_u[idx]) >= self.eta_rel
+
+    def mean_d(self, idx=slice(None)):
+        count = self.count_d[idx]
+        return np.where(count > 0, self.sum_d[idx] / np.maximum(count, 1),
+                        self.init[idx])
+
+    def mean_u(self, idx=slice(None)):
+        count = self.count_u[idx]
+        return np.where(count > 0, self.sum_u[idx] / np.maximum(count, 1),
+                        self.init[idx])
+
+    def estimates(self, idx, down, up):
+        '''q^- and q^+ of variables idx at fractional distances down, up.'''
+        return self.mean_d(idx) * down, self.mean_u(idx) * up
+
+    def score(self, idx, down, up, rule=MIN_SCORE, mu=1 / 6, eps=1e-6):
+        qm, qp = self.estimates(idx, down, up)
+        return Score(qm, qp, rule, mu, eps)
+
+
+def Score(qm, qp, rule=MIN_SCORE, mu=1 / 6, eps=1e-6):
+    if rule == MIN_SCORE:
+        return np.minimum(qm, qp)
+    elif rule == WEIGHTED_SCORE:
+        return (1 - mu) * np.minimum(qm, qp) + mu * np.maximum(qm, qp)
+    elif rule == PRODUCT_SCORE:
+        return np.maximum(qm, eps) * np.maximum(qp, eps)
+    raise ValueError("Unknown score rule %s" % rule)
+
+
+def TopCandidates(scores, k):
+    '''
+    Positions of the k largest scores by decreasing score, ties in position
+    order, selected with argpartition instead of a full sort.
+    '''
+    k = min(k, len(scores))
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.lexsort((top, -scores[top]))]
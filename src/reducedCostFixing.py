@@ -0,0 +1,53 @@
+'''
+File: reducedCostFixing.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-28 09:40
+Last Modified: 2020-05-28 09:40
+--------------------------------------------
+Description:
+Reduced cost fixing. A variable at a bound of an optimal LP with reduced
+cost rc loses at least |rc| of the LP value per unit it moves away from
+that bound, so once the LP value minus that loss is no better than the
+incumbent, the variable can be kept within the units it can still move.
+At the root the bounds hold for the whole tree, at a node for its subtree.
+'''
+import numpy as np
+try:
+    from .nodeStore import LOWER, UPPER
+except ImportError:
+    from nodeStore import LOWER, UPPER
+
+
+def ReducedCostFixing(rc, x, lower, upper, relax, LB, tol=1e-7,
+                      integer=None):
+    '''
+        rc:           reduced costs of Clp's minimization of -objective
+        x:            optimal LP solution under the bounds lower, upper
+        relax, LB:    LP value and incumbent value (maximization)
+        integer:      mask of the integer variables, the only ones fixed,
+                      None if all are
+    Returns the tightened bounds as the variables, sides (LOWER or UPPER)
+    and values of NodeStore deltas, only those that change a bound.
+    '''
+    rc = np.asarray(rc, dtype=float)
+    slack = relax - LB
+    # units a variable at its bound may still move without falling to LB,
+    # the small margin keeps the fixings on the safe side of round off
+    at_lower = (rc > tol) & (x <= lower + tol) & np.isfinite(lower)
+    at_upper = (rc < -tol) & (x >= upper - tol) & np.isfinite(upper)
+    if integer is not None:
+        at_lower &= integer
+        at_upper &= integer
+    new_upper = lower[at_lower] + np.floor(slack / rc[at_lower] + 1e-6)
+    new_lower = upper[at_upper] - np.floor(slack / -rc[at_upper] + 1e-6)
+    up_vars = np.flatnonzero(at_lower)
+    down_vars = np.flatnonzero(at_upper)
+    tighter_upper = new_upper < upper[up_vars]
+    tighter_lower = new_lower > lower[down_vars]
+    variables = np.concatenate((up_vars[tighter_upper],
+                                down_vars[tighter_lower]))
+    sides = np.concatenate((np.full(tighter_upper.sum(), UPPER, dtype=np.uint8),
+                            np.full(tighter_lower.sum(), LOWER, dtype=np.uint8)))
+    values = np.concatenate((new_upper[tighter_upper],
+                             new_lower[tighter_lower]))
+    return variables, sides, values
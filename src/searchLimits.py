@@ -0,0 +1,62 @@
+'''
+File: searchLimits.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-27 09:20
+Last Modified: 2020-05-27 09:20
+--------------------------------------------
+Description:
+Stopping rules of the tree search and the optimality gap between the
+incumbent and the global bound (the largest bound over the open nodes).
+'''
+import math
+from coinor.grumpy import INFINITY
+
+# stop reasons
+OPTIMAL = 'Optimal'
+INFEASIBLE = 'Infeasible'
+TIME_LIMIT = 'Time Limit'
+NODE_LIMIT = 'Node Limit'
+GAP_LIMIT = 'Gap Limit'
+
+
+def Gap(LB, bound):
+    '''
+    Absolute and relative gap of the incumbent value LB to the global bound
+    of a maximization problem, inf while there is no incumbent.
+    '''
+    if LB <= -INFINITY or bound >= INFINITY:
+        return math.inf, math.inf
+    gap = max(bound - LB, 0.0)
+    return gap, gap / max(abs(LB), 1e-10)
+
+
+class SearchLimits(object):
+    '''
+        time_limit:    seconds
+        node_limit:    number of nodes processed
+        relative_gap:  stop once (bound - LB) / |LB| <= relative_gap
+        absolute_gap:  stop once bound - LB <= absolute_gap
+    None switches a rule off. check(...) returns the stop reason or None.
+    '''
+
+    def __init__(self, time_limit=None, node_limit=None, relative_gap=None,
+                 absolute_gap=None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.relative_gap = relative_gap
+        self.absolute_gap = absolute_gap
+        self.active = any(limit is not None for limit in
+                          [time_limit, node_limit, relative_gap, absolute_gap])
+
+    def check(self, elapsed, num_nodes, LB, bound):
+        if self.time_limit is not None and elapsed >= self.time_limit:
+            return TIME_LIMIT
+        if self.node_limit is not None and num_nodes >= self.node_limit:
+            return NODE_LIMIT
+        if self.relative_gap is not None or self.absolute_gap is not None:
+            gap, relative = Gap(LB, bound)
+            if self.absolute_gap is not None and gap <= self.absolute_gap:
+                return GAP_LIMIT
+            if self.relative_gap is not None and relative <= self.relative_gap:
+                return GAP_LIMIT
+        return None
@@ -0,0 +1,94 @@
+'''
+File: searchLog.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-25 09:12
+Last Modified: 2020-05-25 09:12
+--------------------------------------------
+Description:
+Leveled output of the tree search and an optional JSON lines event sink.
+Call sites test the level flags before they build a message, so nothing is
+formatted for the levels that are switched off.
+'''
+import sys
+import json
+import numpy as np
+from coinor.grumpy import INFINITY
+try:
+    from .searchLimits import Gap
+except ImportError:
+    from searchLimits import Gap
+
+# log levels
+SILENT = 0  # nothing
+SUMMARY = 1  # banner, new incumbents, progress lines and the final summary
+NODE = 2  # one block per node
+DEBUG = 3  # also the nonzero components of every LP solution
+
+
+def _to_json(value):
+    # numpy scalars and arrays that end up in events
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError("%s is not JSON serializable" % type(value).__name__)
+
+
+class SearchLog(object):
+    '''
+    Output of one branch and bound run.
+        attributes:
+            summary, nodes, debug: level >= SUMMARY, NODE, DEBUG
+            progress_interval:     a progress line every that many nodes,
+                                   None for no progress lines
+            events:                True if there is an event sink
+        methods:
+            write(fmt, *args):     print fmt % args
+            progress(...):         print a progress line
+            event(kind, **fields): write one JSON line to the sink
+            close():               close the sink if it was opened here
+    '''
+
+    def __init__(self, level=DEBUG, progress_interval=None, event_sink=None,
+                 stream=None):
+        self.level = level
+        self.summary = level >= SUMMARY
+        self.nodes = level >= NODE
+        self.debug = level >= DEBUG
+        self.progress_interval = progress_interval if self.summary else None
+        # None writes to whatever sys.stdout is at the time of the call
+        self.stream = stream
+        self._own_sink = isinstance(event_sink, str)
+        if self._own_sink:
+            self.sink = open(event_sink, 'w')
+        else:
+            self.sink = event_sink
+        self.events = self.sink is not None
+        self._progress_header = False
+
+    def write(self, fmt='', *args):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write((fmt % args if args else fmt) + '\n')
+
+    def progress(self, elapsed, iter_count, open_count, lp_count, LB, bound):
+        if not self._progress_header:
+            self.write("%10s %10s %10s %10s %16s %16s %10s", 'Time(s)', 'Nodes',
+                       'Open', 'LPs', 'Incumbent', 'Bound', 'Gap')
+            self._progress_header = True
+        gap = Gap(LB, bound)[1]
+        self.write("%10.2f %10d %10d %10d %16s %16s %10s", elapsed, iter_count,
+                   open_count, lp_count, LB if LB > -INFINITY else '-',
+                   bound if bound < INFINITY else 'inf',
+                   '%.2f%%' % (100 * gap) if gap < INFINITY else '-')
+
+    def event(self, kind, **fields):
+        fields['event'] = kind
+        self.sink.write(json.dumps(fields, default=_to_json) + '\n')
+
+    def close(self):
+        if self._own_sink:
+            self.sink.close()
+        elif self.sink is not None:
+            self.sink.flush()
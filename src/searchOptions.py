@@ -0,0 +1,232 @@
+'''
+File: searchOptions.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-31 14:30
+Last Modified: 2020-05-31 14:30
+--------------------------------------------
+Description:
+Options of BranchAndBound beyond those of the grumpy port (branch and
+search strategy, complete enumeration, display interval, binary variables,
+solver, rel_param and more_return). They are collected in one SearchOptions
+object, which BranchAndBound builds from its keyword arguments or takes as
+options=, and which the serial and the parallel search read.
+'''
+try:
+    from .searchLog import DEBUG
+except ImportError:
+    from searchLog import DEBUG
+
+# lp engines
+REBUILD_LP = 'Rebuild LP'
+PERSISTENT_LP = 'Persistent LP'
+
+_DEFAULTS = dict(
+    score_rule=None,
+    lp_engine=REBUILD_LP,
+    warm_start=False,
+    cold_sample=None,
+    strong_branching_workers=1,
+    node_workers=1,
+    deterministic=True,
+    speedup=False,
+    log_level=DEBUG,
+    progress_interval=None,
+    event_log=None,
+    open_node_budget=None,
+    spill_dir=None,
+    time_limit=None,
+    node_limit=None,
+    relative_gap=None,
+    absolute_gap=None,
+    heuristics=None,
+    heuristic_interval=None,
+    reduced_cost_fixing=False,
+    cuts=None,
+    cut_rounds=10,
+    node_cut_rounds=0,
+    propagation=False,
+    presolve=False,
+    probing=True,
+    lower=None,
+    upper=None,
+    integer=None,
+    checkpoint=None,
+    checkpoint_interval=60,
+    resume=False)
+
+# the options that change the search, a checkpoint is only resumed with the
+# same ones; the limits, the log and where things are written may change
+_SEARCH = ['score_rule', 'lp_engine', 'warm_start', 'strong_branching_workers',
+           'open_node_budget', 'heuristics', 'heuristic_interval',
+           'reduced_cost_fixing', 'cuts', 'cut_rounds', 'node_cut_rounds',
+           'propagation', 'presolve', 'probing']
+
+
+class SearchOptions(object):
+    '''
+        score_rule:
+            scoring of the pseudocost estimates q^- and q^+, one of
+            MIN_SCORE, WEIGHTED_SCORE (mu weighted, see rel_param) and
+            PRODUCT_SCORE; None uses WEIGHTED_SCORE for reliability
+            branching and MIN_SCORE otherwise
+        lp_engine:
+            REBUILD_LP    - build a new CyLPModel at every node and add one
+                            row per branching constraint on the path
+            PERSISTENT_LP - build the root LP once and apply every node by
+                            changing column bounds, which are restored after
+                            the node is processed
+        warm_start:
+            True - (PERSISTENT_LP only) every open node carries the optimal
+                   basis of its parent and its LP is reoptimized from there
+                   with the dual simplex instead of a cold solve. The stats
+                   report 'Warm Started' and 'Pivots per Warm Start'
+        cold_sample:
+            (warm_start only) every cold_sample-th warm started node LP is
+            also solved cold, on an LP built anew with the rows and bounds
+            of the node, which does not change the search. The stats report
+            'Cold Solved (Sampled)', 'Pivots per Cold Solve (Sampled)' and
+            'Pivots Saved per Node (Sampled)', the cold less the warm start
+            pivots averaged over the sampled nodes. The cold solves count in
+            'Time' but not in 'LP Solved'; None samples no node
+        strong_branching_workers:
+            (PERSISTENT_LP only) number of worker processes for the strong
+            branching LPs of RELIABILITY_BRANCHING and HYBRID. Every worker
+            holds its own copy of the LP and receives each node once, the
+            branching decisions are the same for any number of workers
+        node_workers:
+            number of worker processes solving open nodes at the same time,
+            each with its own persistent LP. The incumbent and the
+            pseudocosts are owned by the master and updated one result at
+            a time. The stats also report the total worker time and the
+            worker utilization, the share of the wall time the workers
+            spent on nodes, which says how busy they were and not how much
+            faster the search is (see speedup)
+        deterministic:
+            (node_workers > 1) hand out nodes in rounds and fold the results
+            in pop order so that runs are reproducible; otherwise results
+            are folded as they arrive
+        speedup:
+            True - (node_workers > 1) the problem is also solved by the
+                   serial search with the same options, and the stats
+                   report its 'Time' as 'Serial Time' and 'Speedup', the
+                   serial over the parallel search time
+        log_level:
+            SILENT  - no output
+            SUMMARY - banner, new incumbents, progress and final summary
+            NODE    - also one block per node
+            DEBUG   - also the nonzero values of every LP solution
+        progress_interval:
+            (SUMMARY and above) print a progress line every that many nodes
+        event_log:
+            file name or open file that receives one JSON object per line
+            for the start, every node, every new incumbent and the end of
+            the search
+        open_node_budget:
+            largest number of open nodes kept in memory, None for no limit.
+            Past the budget the open nodes of lowest priority under the
+            search strategy are written in batches to a memory-mapped file
+            in spill_dir (None for the system temporary directory) and read
+            back as soon as they hold the next node by priority, so the
+            search order does not change. The node store frees every node
+            whose subtree has no open node left
+        time_limit, node_limit, relative_gap, absolute_gap:
+            stop after time_limit seconds, after node_limit nodes, or once
+            the gap between the incumbent and the global bound (the largest
+            bound of an open node) is at most relative_gap (relative to the
+            incumbent) or absolute_gap. None switches a rule off. The stats
+            report 'Best Bound', 'Gap' (relative) and 'Stop Reason'
+        heuristics:
+            primal heuristics run on the LP solution of the root and then
+            of the first node branched on once heuristic_interval nodes
+            have passed since their last run (None for the root only), a
+            list of SIMPLE_ROUNDING, GREEDY_ROUNDING, FRACTIONAL_DIVING and
+            PSEUDOCOST_DIVING from heuristics.py (HEURISTICS for all of
+            them); None runs no heuristic. The dives run on the persistent
+            LP, with REBUILD_LP on one built for them. The stats report
+            calls, improving solutions, LPs and time per heuristic
+            ('Heuristics') and which one found the final incumbent
+            ('Incumbent Found By', 'LP' for a node LP). 'First Incumbent
+            Time' is always reported
+        reduced_cost_fixing:
+            True - once there is an incumbent, variables whose reduced cost
+                   shows that leaving their bound cannot beat it are fixed
+                   there: by the root LP for the whole tree (again whenever
+                   the incumbent improves) and by a node LP for the children
+                   of the node, as part of their bound changes. The stats
+                   report 'Root Fixings' and 'Node Fixings'
+        cuts:
+            cut separators of cuts.py run on the root LP before the search,
+            [GOMORY_CUTS] for Gomory mixed-integer cuts; None for no cuts.
+            At most cut_rounds rounds are run, and the loop stops early
+            when a round hardly moves the bound. The cuts binding at the
+            end are added to the constraints, for every node LP. The stats
+            report 'Cut Rounds', 'Cuts Generated', 'Cuts Added', 'Root
+            Bound' and 'Root Bound After Cuts', 'Root Gap Closed' (against
+            the final incumbent) and 'Cut Time', which is not part of 'Time'.
+            [GOMORY_CUTS, COVER_CUTS] adds lifted cover cuts of the knapsack
+            rows. Cuts go through a pool that drops duplicates and is
+            checked before separating again; 'Cuts by Separator', 'Pool
+            Size', 'Cuts from Pool' and 'Pool Evicted' report on it
+        node_cut_rounds:
+            rounds of cuts at every node, pooled cuts first and then cover
+            cuts, which stay in the LP for the rest of the search; 'Node
+            Cuts' counts them. Only with PERSISTENT_LP and a serial search
+            without strong branching workers, the root only otherwise
+        propagation:
+            True - before the LP of every node, the bounds of the node are
+                   propagated through the rows by their smallest activity.
+                   Tightened bounds become bound changes of the node and
+                   hold in its subtree (at the root, for the whole tree),
+                   and a node whose bounds the rows cannot meet is
+                   infeasible without solving its LP. The stats report
+                   'Propagation Fixings', 'Infeasible by Propagation' and
+                   'Propagation Time'
+        presolve:
+            True - the problem is presolved before the search (presolve.py):
+                   bounds are propagated, rows that cannot bind and fixed or
+                   dual fixed columns are removed and the coefficients of
+                   binary variables are tightened, and with probing=True
+                   the binary variables are probed for fixings and
+                   implications, which are added as rows. The search, the
+                   tree and the log work on the reduced problem, opt is
+                   mapped back to the original variables. The stats report
+                   the reductions and 'Presolve Time'
+        lower, upper:
+            bounds of the variables, a dict keyed by variable name (variables
+            left out keep the default) or a sequence in the order of
+            VARIABLES; None for 0 and 1 with binary_vars=True and no bounds
+            otherwise. Branching only ever tightens one bound of a variable
+            in a node, so general integer variables need no extra rows
+        integer:
+            integrality of the variables, given like the bounds; None if all
+            are integer. Continuous variables are never branched on, fixed
+            by reduced cost or rounded by the heuristics, so mixed binary,
+            integer and continuous models are solved as such
+        checkpoint:
+            file the state of the search is written to every
+            checkpoint_interval seconds and when a limit stops the search
+            (checkpoint.py): the open nodes with their warm start bases, the
+            nodes, the pseudocost tables with their reliability counts, the
+            cut pool and the rows it added to the LP, the incumbent and the
+            counters. Serial search only; the stats report 'Checkpoints'
+        resume:
+            True - continue the search where checkpoint left it. The problem
+                   and the options have to be those of the run that wrote
+                   it, presolve and the root cuts are redone and the rest is
+                   read back. The limits, 'Time' and the counters cover the
+                   whole search, the tree only gets the nodes processed
+                   after the resume
+    Options left out take their defaults (_DEFAULTS), an unknown option
+    raises TypeError. search_options() lists the values of the options that
+    change the search.
+    '''
+
+    def __init__(self, **options):
+        for name in options:
+            if name not in _DEFAULTS:
+                raise TypeError("Unknown option %s" % name)
+        for name, default in _DEFAULTS.items():
+            setattr(self, name, options.get(name, default))
+
+    def search_options(self):
+        return [[name, getattr(self, name)] for name in _SEARCH]
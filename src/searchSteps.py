@@ -0,0 +1,315 @@
+'''
+File: searchSteps.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-31 10:05
+Last Modified: 2020-05-31 10:05
+--------------------------------------------
+Description:
+Steps of the tree search shared by the serial loop in cylpBranchAndBound.py
+and by parallelSearch.py: the integrality of a node LP solution, the
+status of a node, the incumbent and the pruning it sets off, the children
+of a branched node and the stats of the run. Both searches take these
+steps through the same code, so that they do not drift apart.
+'''
+import math
+import numpy as np
+from coinor.grumpy import INFINITY
+try:
+    from .nodeStore import ChildDeltas, LOWER, UPPER
+    from .branching import RELIABILITY_BRANCHING
+    from .reducedCostFixing import ReducedCostFixing
+except ImportError:
+    from nodeStore import ChildDeltas, LOWER, UPPER
+    from branching import RELIABILITY_BRANCHING
+    from reducedCostFixing import ReducedCostFixing
+
+
+def EvaluateSolution(var_values, relax, integer, OBJ, MAT, RHS, bounds=None):
+    '''
+    Integrality of the optimal LP solution var_values of value relax.
+        bounds: (lower, upper) of the node when there are cuts in the LP. A
+                solution integral only within the tolerance, as at some
+                vertices made by cuts, is then replaced by its rounding if
+                that is within the bounds and meets the rows. None keeps
+                the solution as it is
+    Returns var_values, relax, integer_solution and the integer
+    infeasibility count and sum.
+    '''
+    integer_solution = not np.any(np.abs(np.round(var_values[integer]) -
+                                         var_values[integer]) > .001)
+    if bounds is not None and integer_solution and \
+            np.any(np.round(var_values[integer]) != var_values[integer]):
+        rounded = np.where(integer, np.round(var_values), var_values)
+        lower, upper = bounds
+        if np.all(lower <= rounded) and np.all(rounded <= upper) and \
+                np.all(MAT.dot(rounded) <= RHS + 1e-6):
+            var_values = rounded
+            relax = round(float(-OBJ.dot(rounded)), 7)
+    # Determine integer_infeasibility_count and
+    # Integer_infeasibility_sum for scatterplot and such
+    frac = var_values[integer] - np.floor(var_values[integer])
+    frac = frac[frac > 0]
+    return (var_values, relax, integer_solution, int(len(frac)),
+            float(np.sum(np.minimum(frac, 1.0 - frac))))
+
+
+def NodeStatus(nodes, cur_index, parent, relax, LB, infeasible,
+               integer_solution, iicount, iisum, complete_enumeration,
+               integer):
+    '''
+    Status of a processed node: 'integer', 'infeasible', 'fathomed' (pruned
+    by bound), 'L' (a leaf, all integer variables fixed) or 'candidate'.
+    An infeasible node is shown with the bound and the integer infeasibility
+    of its parent. The bound, and for a candidate the integer infeasibility,
+    are recorded in nodes.
+    Returns status, relax, iicount and iisum as shown in the tree.
+    '''
+    if integer_solution:
+        status = 'integer'
+    elif infeasible:
+        status = 'infeasible'
+    elif not complete_enumeration and relax <= LB:
+        status = 'fathomed'
+    elif np.all(np.equal(*nodes.bounds(cur_index))[integer]):
+        status = 'L'
+    else:
+        status = 'candidate'
+    if parent is not None:
+        if status == 'infeasible':
+            parent = nodes.slot[parent]
+            iicount = nodes.iicount[parent]
+            iisum = nodes.iisum[parent]
+            relax = nodes.obj[parent]
+        elif status == 'integer':
+            iicount = iisum = None
+    elif status != 'candidate':
+        iicount = iisum = None
+    slot = nodes.slot[cur_index]
+    nodes.obj[slot] = relax
+    if status == 'candidate':
+        nodes.iicount[slot] = iicount
+        nodes.iisum[slot] = iisum
+    return status, relax, iicount, iisum
+
+
+class Incumbent(object):
+    '''
+    Best solution of the search.
+        attributes:
+            value:      objective value, -INFINITY until there is one
+            solution:   dict of the variable values by column index
+            source:     'LP' for a node LP or the heuristic that found it
+            first_time: seconds from the start to the first solution
+        methods:
+            update(value, values, source, index, elapsed):
+                        take a better solution found at node index, with
+                        its log line and event
+            save_state(), load_state(state): for checkpoints
+    '''
+
+    def __init__(self, numVars, log):
+        self.value = -INFINITY
+        self.solution = dict([(i, 0) for i in range(numVars)])
+        self.source = None
+        self.first_time = None
+        self.log = log
+
+    def update(self, value, values, source, index, elapsed):
+        self.value = value
+        self.solution = dict(enumerate(values.tolist()))
+        self.source = source
+        if self.first_time is None:
+            self.first_time = elapsed
+        log = self.log
+        if source == 'LP':
+            if log.summary:
+                log.write("New best solution found, objective: %s", value)
+            if log.events:
+                log.event('incumbent', index=index, obj=value, time=elapsed)
+        else:
+            if log.summary:
+                log.write("New best solution found by %s, objective: %s",
+                          source, value)
+            if log.events:
+                log.event('incumbent', index=index, obj=value, time=elapsed,
+                          heuristic=source)
+
+    def save_state(self):
+        return {'value': self.value,
+                'solution': [self.solution[i]
+                             for i in range(len(self.solution))],
+                'source': self.source, 'first_time': self.first_time}
+
+    def load_state(self, state):
+        self.value = state['value']
+        self.solution = dict(enumerate(state['solution']))
+        self.source = state['source']
+        self.first_time = state['first_time']
+
+
+class SearchCounters(object):
+    '''
+    Counters of a search.
+        node_count:        nodes created
+        iter_count:        nodes processed
+        lp_count:          LPs solved, those of strong branching included
+        full_solved, half_solved: strong branching LPs solved to the end
+                           and stopped by the iteration limit
+        sb_time:           seconds spent in strong branching
+        total_num_pivot, average_num_pivot: simplex pivots of the node LPs
+        root_fixings, node_fixings: variables fixed by reduced cost at the
+                           root and at the nodes
+        node_cuts:         cuts added at the nodes
+        warm_count, warm_num_pivot: warm started node LPs and their pivots
+        cold_count, cold_num_pivot, sampled_num_pivot: node LPs also solved
+                           cold, their cold and their warm start pivots
+    save_state() and load_state(state) are for checkpoints.
+    '''
+    _NAMES = ['node_count', 'iter_count', 'lp_count', 'full_solved',
+              'half_solved', 'sb_time', 'total_num_pivot',
+              'average_num_pivot', 'root_fixings', 'node_fixings',
+              'node_cuts', 'warm_count', 'warm_num_pivot', 'cold_count',
+              'cold_num_pivot', 'sampled_num_pivot']
+
+    def __init__(self):
+        self.node_count = 1
+        self.iter_count = 0
+        self.lp_count = 0
+        self.full_solved = self.half_solved = 0
+        self.sb_time = 0.0
+        self.total_num_pivot = self.average_num_pivot = 0
+        self.root_fixings = self.node_fixings = 0
+        self.node_cuts = 0
+        self.warm_count = self.warm_num_pivot = 0
+        self.cold_count = self.cold_num_pivot = self.sampled_num_pivot = 0
+
+    def solved(self, pivots):
+        # a node LP solved in pivots simplex iterations
+        self.lp_count += 1
+        self.total_num_pivot += pivots
+        self.average_num_pivot = self.total_num_pivot / self.lp_count
+
+    def sampled(self, warm_pivots, cold_pivots):
+        # a warm started node LP that was also solved cold
+        self.cold_count += 1
+        self.cold_num_pivot += cold_pivots
+        self.sampled_num_pivot += warm_pivots
+
+    def branched(self, counts):
+        # the LPs strong branching solved to choose a branching variable
+        self.lp_count += counts['lp_count']
+        self.full_solved += counts['full_solved']
+        self.half_solved += counts['half_solved']
+        self.sb_time += counts.get('sb_time', 0.0)
+
+    def save_state(self):
+        return dict((name, getattr(self, name)) for name in self._NAMES)
+
+    def load_state(self, state):
+        for name in self._NAMES:
+            setattr(self, name, state[name])
+
+
+def NodePruned(nodes, index, parent, tree, log):
+    '''Close an open node pruned by bound, with its tree and event.'''
+    nodes.close(index)
+    if tree is not None:
+        tree.pruned(index, parent)
+    if log.events:
+        log.event('pruned', index=index, parent=parent)
+
+
+def RunHeuristics(heur, x, lower, upper, incumbent, index, elapsed):
+    '''
+    Primal heuristics on the LP solution x of node index, under the bounds
+    lower, upper. Returns True if they improved the incumbent.
+    '''
+    found = heur.run(x, lower, upper, incumbent.value)
+    if found is None:
+        return False
+    source, value, values = found
+    incumbent.update(value, values, source, index, elapsed)
+    return True
+
+
+def IncumbentImproved(LB, Q, nodes, root, integer, tree, log):
+    '''
+    Drop the open nodes the incumbent value LB dominates and fix variables
+    for the whole tree by the reduced costs of the root LP, root is
+    (reduced costs, solution, value) of the root LP or None.
+    Returns the number of variables fixed at the root.
+    '''
+    removed = []
+    purged = Q.prune(LB, removed)
+    if log.nodes and purged:
+        log.write("%s open nodes pruned by bound", purged)
+    for index, parent in removed:
+        NodePruned(nodes, index, parent, tree, log)
+    if root is None:
+        return 0
+    rc, x, relax = root
+    fixed = ReducedCostFixing(rc, x, nodes.root_lower, nodes.root_upper,
+                              relax, LB, integer=integer)
+    if len(fixed[0]):
+        nodes.tighten_root(*fixed)
+        if log.nodes:
+            log.write("%s variables fixed at the root by reduced cost",
+                      len(fixed[0]))
+    return len(fixed[0])
+
+
+def AddChildren(nodes, Q, node_count, cur_index, relax, branching_var,
+                value, priority, basis, fixed, tree, log):
+    '''
+    Add the children x <= floor(value) and x >= ceil(value) of node
+    cur_index, branched on branching_var, to the node store and the open
+    nodes, with the bound changes fixed (as for ChildDeltas) and the basis
+    they are warm started from. Returns the new node count.
+    '''
+    node_count += 1
+    nodes.add(node_count, cur_index,
+              *ChildDeltas(branching_var, UPPER, math.floor(value), fixed))
+    Q.push(node_count, priority[0], (node_count, cur_index, relax,
+                                     branching_var, value, '<=',
+                                     math.floor(value), basis))
+    node_count += 1
+    nodes.add(node_count, cur_index,
+              *ChildDeltas(branching_var, LOWER, math.ceil(value), fixed))
+    Q.push(node_count, priority[1], (node_count, cur_index, relax,
+                                     branching_var, value, '>=',
+                                     math.ceil(value), basis))
+    if tree is not None:
+        tree.branch(cur_index, branching_var, value,
+                    [node_count - 1, node_count])
+    if log.events:
+        log.event('branch', index=cur_index, branch_var=branching_var,
+                  value=value, children=[node_count - 1, node_count])
+    return node_count
+
+
+def SearchStats(timer, count, Q, best_bound, gap, stop_reason, incumbent,
+                options, branch_strategy, heur=None, propagator=None):
+    '''The stats of a search, those of its options included.'''
+    stat = {'Time': timer, 'Size': count.node_count,
+            'LP Solved': count.lp_count, 'Pivots': count.total_num_pivot,
+            'Purged': Q.purged, 'Peak Open Nodes': Q.peak,
+            'Best Bound': best_bound, 'Gap': gap, 'Stop Reason': stop_reason,
+            'First Incumbent Time': None if incumbent.first_time is None
+            else int(math.ceil(incumbent.first_time * 1000))}
+    if heur is not None:
+        stat['Heuristics'] = heur.stats()
+        stat['Incumbent Found By'] = incumbent.source
+    if options.reduced_cost_fixing:
+        stat['Root Fixings'] = count.root_fixings
+        stat['Node Fixings'] = count.node_fixings
+    if propagator is not None:
+        stat['Propagation Fixings'] = propagator.fixings
+        stat['Infeasible by Propagation'] = propagator.infeasible
+        stat['Propagation Time'] = int(math.ceil(propagator.time * 1000))
+    if options.open_node_budget is not None:
+        stat['Spilled'] = Q.spilled
+    if branch_strategy == RELIABILITY_BRANCHING:
+        stat['LP Solved for Bounds'] = count.lp_count - count.full_solved
+        stat['Halfly Solved'] = count.half_solved
+        stat['Fully Solved'] = count.full_solved
+    return stat
@@ -0,0 +1,215 @@
+'''
+File: searchTree.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-25 15:40
+Last Modified: 2020-05-25 15:40
+--------------------------------------------
+Description:
+Recording of the search tree. LiveTree draws into a grumpy BBTree while the
+search runs, TreeRecorder only keeps the node outcomes in numpy arrays, and
+ReplayEvents builds the BBTree afterwards from a recorder or from the JSON
+lines event log of searchLog.py. All three see the same node, pruned and
+branch events.
+'''
+import json
+import numpy as np
+from coinor.grumpy import BBTree
+
+STATUSES = ['candidate', 'integer', 'infeasible', 'fathomed', 'L']
+SENSES = [None, '<=', '>=']
+_COLOR = {'candidate': 'yellow', 'integer': 'lightblue',
+          'infeasible': 'orange', 'fathomed': 'red', 'L': 'red'}
+
+
+def DrawLegend(T):
+    if T.get_layout() == 'dot2tex':
+        cluster_attrs = {'name': 'Key', 'label': r'\text{Key}', 'fontsize': '12'}
+        T.add_node('C', label=r'\text{Candidate}', style='filled',
+                   color='yellow', fillcolor='yellow')
+        T.add_node('I', label=r'\text{Infeasible}', style='filled',
+                   color='orange', fillcolor='orange')
+        T.add_node('S', label=r'\text{Solution}', style='filled',
+                   color='lightblue', fillcolor='lightblue')
+        T.add_node('P', label=r'\text{Pruned}', style='filled',
+                   color='red', fillcolor='red')
+        T.add_node('PC', label=r'\text{Pruned}$\\ $\text{Candidate}', style='filled',
+                   color='red', fillcolor='yellow')
+    else:
+        cluster_attrs = {'name': 'Key', 'label': 'Key', 'fontsize': '12'}
+        T.add_node('C', label='Candidate', style='filled',
+                   color='yellow', fillcolor='yellow')
+        T.add_node('I', label='Infeasible', style='filled',
+                   color='orange', fillcolor='orange')
+        T.add_node('S', label='Solution', style='filled',
+                   color='lightblue', fillcolor='lightblue')
+        T.add_node('P', label='Pruned', style='filled',
+                   color='red', fillcolor='red')
+        T.add_node('PC', label='Pruned \n Candidate', style='filled',
+                   color='red', fillcolor='yellow')
+    T.add_edge('C', 'I', style='invisible', arrowhead='none')
+    T.add_edge('I', 'S', style='invisible', arrowhead='none')
+    T.add_edge('S', 'P', style='invisible', arrowhead='none')
+    T.add_edge('P', 'PC', style='invisible', arrowhead='none')
+    T.create_cluster(['C', 'I', 'S', 'P', 'PC'], cluster_attrs)
+
+
+class LiveTree(object):
+    '''
+    Draws the events into the BBTree T as they happen, as BranchAndBound
+    has always done.
+    '''
+
+    def __init__(self, T):
+        self.T = T
+        DrawLegend(T)
+
+    def node(self, index, parent, depth, status, obj, iicount, iisum,
+             branch_var, branch_var_value, sense, rhs):
+        T = self.T
+        color = _COLOR[status]
+        if status == 'infeasible':
+            if T.get_layout() == 'dot2tex':
+                label = '\text{I}'
+            else:
+                label = 'I'
+        else:
+            label = "%.1f" % obj
+        if parent is None:
+            T.AddOrUpdateNode(index, None, None, 'candidate', obj, iicount,
+                              iisum, label=label, obj=obj, color=color,
+                              style='filled', fillcolor=color)
+        else:
+            _direction = {'<=': 'L', '>=': 'R'}
+            T.AddOrUpdateNode(index, parent, _direction[sense], status, obj,
+                              iicount, iisum, branch_var=branch_var,
+                              branch_var_value=branch_var_value,
+                              sense=sense, rhs=rhs, obj=obj, color=color,
+                              style='filled', label=label, fillcolor=color)
+            if T.get_layout() == 'dot2tex':
+                _dot2tex_label = {'>=': ' \geq ', '<=': ' \leq '}
+                T.set_edge_attr(parent, index, 'label',
+                                str(branch_var) + _dot2tex_label[sense] +
+                                str(rhs))
+            else:
+                T.set_edge_attr(parent, index, 'label',
+                                str(branch_var) + sense + str(rhs))
+        if status == 'integer':
+            T._previous_incumbent_value = T._incumbent_value
+            T._incumbent_value = obj
+            T._incumbent_parent = -1 if parent is None else parent
+            T._new_integer_solution = True
+
+    def pruned(self, index, parent):
+        self.T.set_node_attr(parent, 'color', 'red')
+
+    def branch(self, index, branch_var, value, children):
+        self.T.set_node_attr(index, _COLOR['candidate'], 'green')
+
+
+class TreeRecorder(object):
+    '''
+    Node outcomes of a search in parallel arrays, in the order the nodes
+    were processed, at a few dozen bytes per node.
+        methods:
+            node(...), pruned(...), branch(...): record an event
+            events():      the recorded events as dicts
+            to_bbtree(T):  replay into a BBTree (a new one if T is None)
+    '''
+
+    def __init__(self, capacity=1024):
+        self.num_nodes = 0
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.parent = np.zeros(capacity, dtype=np.int64)
+        self.depth = np.zeros(capacity, dtype=np.int32)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.obj = np.zeros(capacity)
+        self.iicount = np.zeros(capacity, dtype=np.int64)
+        self.iisum = np.zeros(capacity)
+        self.branch_var = np.zeros(capacity, dtype=np.int64)
+        self.branch_var_value = np.zeros(capacity)
+        self.sense = np.zeros(capacity, dtype=np.uint8)
+        self.rhs = np.zeros(capacity)
+        # pruned parents and branched nodes
+        self.pruned_parent = []
+        self.branched = []
+
+    def _grow(self):
+        capacity = len(self.index)
+        if self.num_nodes < capacity:
+            return
+        for name in ['index', 'parent', 'depth', 'status', 'obj', 'iicount',
+                     'iisum', 'branch_var', 'branch_var_value', 'sense', 'rhs']:
+            old = getattr(self, name)
+            new = np.zeros(2 * capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def node(self, index, parent, depth, status, obj, iicount, iisum,
+             branch_var, branch_var_value, sense, rhs):
+        self._grow()
+        k = self.num_nodes
+        # -1 and nan stand for None
+        self.index[k] = index
+        self.parent[k] = -1 if parent is None else parent
+        self.depth[k] = depth
+        self.status[k] = STATUSES.index(status)
+        self.obj[k] = obj
+        self.iicount[k] = -1 if iicount is None else iicount
+        self.iisum[k] = np.nan if iisum is None else iisum
+        self.branch_var[k] = -1 if branch_var is None else branch_var
+        self.branch_var_value[k] = np.nan if branch_var_value is None \
+            else branch_var_value
+        self.sense[k] = SENSES.index(sense)
+        self.rhs[k] = np.nan if rhs is None else rhs
+        self.num_nodes += 1
+
+    def pruned(self, index, parent):
+        self.pruned_parent.append(parent)
+
+    def branch(self, index, branch_var, value, children):
+        self.branched.append(index)
+
+    def events(self):
+        for k in range(self.num_nodes):
+            parent = int(self.parent[k])
+            yield {'event': 'node', 'index': int(self.index[k]),
+                   'parent': None if parent < 0 else parent,
+                   'depth': int(self.depth[k]),
+                   'status': STATUSES[self.status[k]],
+                   'obj': float(self.obj[k]),
+                   'iicount': None if self.iicount[k] < 0 else int(self.iicount[k]),
+                   'iisum': None if np.isnan(self.iisum[k]) else float(self.iisum[k]),
+                   'branch_var': None if parent < 0 else int(self.branch_var[k]),
+                   'branch_var_value': None if parent < 0 else
+                   float(self.branch_var_value[k]),
+                   'sense': SENSES[self.sense[k]],
+                   'rhs': None if parent < 0 else int(self.rhs[k])}
+        for parent in self.pruned_parent:
+            yield {'event': 'pruned', 'index': None, 'parent': parent}
+        for index in self.branched:
+            yield {'event': 'branch', 'index': index, 'branch_var': None,
+                   'value': None, 'children': None}
+
+    def to_bbtree(self, T=None):
+        return ReplayEvents(self.events(), T)
+
+
+def ReplayEvents(events, T=None):
+    '''
+    Build the BBTree of a finished search. events is an iterable of event
+    dicts (TreeRecorder.events()) or the name of an event log file.
+    '''
+    if isinstance(events, str):
+        with open(events) as f:
+            events = [json.loads(line) for line in f]
+    if T is None:
+        T = BBTree()
+    tree = LiveTree(T)
+    for event in events:
+        fields = dict(event)
+        kind = fields.pop('event')
+        if kind in ['node', 'pruned', 'branch']:
+            getattr(tree, kind)(**fields)
+        elif kind == 'end':
+            T._lp_count = fields['stat']['LP Solved']
+    return T
@@ -0,0 +1,219 @@
+'''
+File: strongBranching.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-22 09:31
+Last Modified: 2020-05-22 09:31
+--------------------------------------------
+Description:
+Strong branching on the node LP itself. Every probe tightens the bounds of
+one column of the solved node CyClpSimplex, runs an iteration limited dual
+simplex from the node's optimal basis, and then restores the bounds and the
+basis, so no copy of the LP is ever made.
+StrongBranchingPool spreads the probes over worker processes that each hold
+their own copy of the LP and receive the node bounds and basis once per node.
+'''
+import math
+import multiprocessing
+import numpy as np
+from cylp.py.modeling.CyLPModel import CyLPArray
+try:
+    from .lpEngine import PersistentLP
+    from .workerProcesses import Send, Receive, StopWorkers
+except ImportError:
+    from lpEngine import PersistentLP
+    from workerProcesses import Send, Receive, StopWorkers
+
+
+def ProbeBounds(s, variables, lowers, uppers, max_iter, stop=None):
+    '''
+    For every k solve the node LP with variables[k] in [lowers[k], uppers[k]]
+    (nan keeps the node bound) by at most max_iter dual simplex iterations.
+        s:    solved node CyClpSimplex, left as it was found
+        stop: stop(k, status, objective) is called after probe k and the
+              remaining probes are skipped once it returns True
+    Returns the Clp status codes and objective values, probes that were
+    skipped have status -1 and objective nan.
+    '''
+    num = len(variables)
+    status = np.full(num, -1, dtype=np.int32)
+    objective = np.full(num, np.nan)
+    if num == 0:
+        return status, objective
+    cstat, rstat = s.getBasisStatus()
+    # copies, the arrays returned by CyClpSimplex are views on Clp's bounds
+    col_lower = np.array(s.variablesLower)
+    col_upper = np.array(s.variablesUpper)
+    max_num_iteration = s.maxNumIteration
+    s.maxNumIteration = int(max_iter)
+    for k in range(num):
+        var = int(variables[k])
+        if not math.isnan(lowers[k]):
+            s.setColumnLower(var, lowers[k])
+        if not math.isnan(uppers[k]):
+            s.setColumnUpper(var, uppers[k])
+        s.dual()
+        status[k] = s.getStatusCode()
+        objective[k] = s.objectiveValue
+        s.setColumnLower(var, col_lower[var])
+        s.setColumnUpper(var, col_upper[var])
+        s.setBasisStatus(cstat, rstat)
+        if stop is not None and stop(k, status[k], objective[k]):
+            break
+    s.maxNumIteration = max_num_iteration
+    return status, objective
+
+
+def _pair_stop(stop):
+    # stop rule over single probes from one over (down, up) probe pairs,
+    # the probes of candidate j are 2 j (down) and 2 j + 1 (up)
+    down = {}
+
+    def pair_stop(k, status, objective):
+        if k % 2 == 0:
+            down['status'], down['obj'] = status, objective
+            return False
+        return stop(k // 2, down['status'], down['obj'], status, objective)
+    return pair_stop
+
+
+def StrongBranch(s, candidates, values, max_iter, stop=None):
+    '''
+    Down (x <= floor) and up (x >= ceil) probes for the whole candidate list
+    in one call. s is the solved node CyClpSimplex or a StrongBranchingPool
+    which has been given the node.
+        stop: stop(j, down_status, down_obj, up_status, up_obj) is called
+              once both probes of candidate j are done
+    Returns down_status, down_obj, up_status, up_obj.
+    '''
+    values = np.asarray(values, dtype=float)
+    num = len(candidates)
+    variables = np.repeat(np.asarray(candidates, dtype=np.int64), 2)
+    lowers = np.full(2 * num, np.nan)
+    uppers = np.full(2 * num, np.nan)
+    uppers[0::2] = np.floor(values)
+    lowers[1::2] = np.ceil(values)
+    pair_stop = None if stop is None else _pair_stop(stop)
+    if isinstance(s, StrongBranchingPool):
+        status, objective = s.probe_bounds(variables, lowers, uppers, max_iter,
+                                           pair_stop)
+    else:
+        status, objective = ProbeBounds(s, variables, lowers, uppers, max_iter,
+                                        pair_stop)
+    return status[0::2], objective[0::2], status[1::2], objective[1::2]
+
+
+def _strong_branching_worker(conn, OBJ, MAT, RHS, lower, upper):
+    engine = PersistentLP(CyLPArray(OBJ), MAT, CyLPArray(RHS), lower, upper)
+    s = engine.simplex
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'node':
+                # node LP and its optimal basis, the dual simplex only has
+                # to refactorize before the probes start from the same basis
+                _, lower, upper, basis = message
+                engine.resolve(lower, upper, basis)
+            elif message[0] == 'probe':
+                _, variables, lowers, uppers, max_iter = message
+                conn.send(ProbeBounds(s, variables, lowers, uppers, max_iter))
+            else:
+                break
+    except (EOFError, BrokenPipeError):
+        # the master is gone
+        pass
+    conn.close()
+
+
+class StrongBranchingPool(object):
+    '''
+    Worker processes for strong branching on the persistent LP.
+        set_node(lower, upper, basis): send the node LP to every worker
+        probe_bounds(...):             same as ProbeBounds on the node
+        close():                       stop the workers, also on leaving
+                                       a with block; a worker that does
+                                       not stop is terminated
+        save_state(), load_state(state): the first node, in which the
+                                       workers scale their LPs, for
+                                       checkpoints
+    The probes are dealt out in rounds of round_size probes per worker and
+    the stop rule is applied in candidate order after every round, results
+    past the stopping point are discarded. Every probe starts from the
+    node's optimal basis, so the outcome does not depend on the number of
+    workers. A worker that dies raises RuntimeError in the master.
+    '''
+
+    def __init__(self, num_workers, OBJ, MAT, RHS, lower, upper, round_size=2):
+        self.num_workers = num_workers
+        self.round_size = round_size
+        self.scaled = None
+        self.connections = []
+        self.workers = []
+        for _ in range(num_workers):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_strong_branching_worker,
+                args=(child_conn, np.asarray(OBJ, dtype=float), MAT,
+                      np.asarray(RHS, dtype=float), lower, upper))
+            worker.daemon = True
+            worker.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.workers.append(worker)
+
+    def set_node(self, lower, upper, basis):
+        if self.scaled is None:
+            self.scaled = (np.array(lower, dtype=float),
+                           np.array(upper, dtype=float), basis)
+        for conn, worker in zip(self.connections, self.workers):
+            Send(conn, worker, ('node', lower, upper, basis))
+
+    def probe_bounds(self, variables, lowers, uppers, max_iter, stop=None):
+        num = len(variables)
+        status = np.full(num, -1, dtype=np.int32)
+        objective = np.full(num, np.nan)
+        if stop is None:
+            chunk = int(math.ceil(num / self.num_workers))
+        else:
+            chunk = self.round_size
+        start = 0
+        while start < num:
+            # one contiguous chunk per worker
+            jobs = []
+            for conn, worker in zip(self.connections, self.workers):
+                end = min(start + chunk, num)
+                if start >= end:
+                    break
+                Send(conn, worker, ('probe', variables[start:end],
+                                    lowers[start:end], uppers[start:end],
+                                    max_iter))
+                jobs.append((conn, worker, start, end))
+                start = end
+            for (conn, worker, begin, end) in jobs:
+                status[begin:end], objective[begin:end] = Receive(conn, worker)
+            if stop is not None:
+                for k in range(jobs[0][2], jobs[-1][3]):
+                    if stop(k, status[k], objective[k]):
+                        status[k + 1:] = -1
+                        objective[k + 1:] = np.nan
+                        return status, objective
+        return status, objective
+
+    def save_state(self):
+        if self.scaled is None:
+            return {}
+        return dict(zip(['lower', 'upper', 'basis'], self.scaled))
+
+    def load_state(self, state):
+        # the workers of a new pool scale their LPs in the same node
+        if state:
+            self.set_node(state['lower'], state['upper'], state['basis'])
+
+    def close(self):
+        StopWorkers(self.connections, self.workers)
+        self.connections, self.workers = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,63 @@
+'''
+File: workerProcesses.py
+Author: Yutong Dai and Muqing Zheng
+File Created: 2020-05-31 16:20
+Last Modified: 2020-05-31 16:20
+--------------------------------------------
+Description:
+Receiving from and stopping the worker processes of the strong branching
+pool and of the parallel search. Every worker has a Pipe to the master and
+stops on a ('close',) message, or when the master's end of the pipe is
+gone.
+'''
+
+# seconds a worker is given to stop before it is terminated
+STOP_TIMEOUT = 5
+
+
+def _died(worker):
+    worker.join(STOP_TIMEOUT)
+    return RuntimeError("Worker process %s exited with code %s" %
+                        (worker.pid, worker.exitcode))
+
+
+def Send(conn, worker, message):
+    '''
+    conn.send(message) on the pipe to worker, a worker that died raises
+    RuntimeError instead of BrokenPipeError.
+    '''
+    try:
+        conn.send(message)
+    except BrokenPipeError:
+        raise _died(worker)
+
+
+def Receive(conn, worker):
+    '''
+    conn.recv() of the pipe to worker, a worker that died before it sent
+    its result raises RuntimeError instead of EOFError.
+    '''
+    try:
+        return conn.recv()
+    except EOFError:
+        raise _died(worker)
+
+
+def StopWorkers(connections, workers, timeout=STOP_TIMEOUT):
+    '''
+    Ask every worker to stop, close the pipes and join the workers. A
+    worker still running after timeout seconds, busy or hung, is
+    terminated.
+    '''
+    for conn in connections:
+        try:
+            conn.send(('close',))
+        except OSError:
+            # the worker is gone already
+            pass
+        conn.close()
+    for worker in workers:
+        worker.join(timeout)
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
@@ -0,0 +1,20 @@
+# the tests import the solver as the notebooks do, from the project root
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from src.generator import GenerateRandomMIP
+
+
+@pytest.fixture
+def mip():
+    # mip(seed) builds the GenerateRandomMIP instance the tests solve, the
+    # size and density can be given as for GenerateRandomMIP
+    def instance(seed, numVars=20, numCons=10, density=0.3):
+        return GenerateRandomMIP(numVars=numVars, numCons=numCons,
+                                 rand_seed=seed, density=density)
+    return instance
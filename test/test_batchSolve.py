@@ -0,0 +1,25 @@
+from coinor.grumpy import MOST_FRACTIONAL, PSEUDOCOST_BRANCHING
+
+from src.batchSolve import BatchSolve, TERMINATED
+
+
+def test_rows_in_job_order_with_repeated_names(mip):
+    instances = [mip(1), mip(2)]
+    # two configurations of the same name are two jobs
+    configs = [dict(branch_strategy=MOST_FRACTIONAL),
+               dict(branch_strategy=MOST_FRACTIONAL),
+               dict(branch_strategy=PSEUDOCOST_BRANCHING)]
+    rows = BatchSolve(instances, configs, workers=2)
+    assert [(row['Instance'], row['Config']) for row in rows] == \
+        [(k, config['branch_strategy']) for k in range(2)
+         for config in configs]
+    assert all(row['Stop Reason'] == 'Optimal' for row in rows)
+    assert rows[0]['Objective'] == rows[1]['Objective'] == rows[2]['Objective']
+
+
+def test_job_timeout_terminates_the_job(mip):
+    rows = BatchSolve([mip(3, 100, 50)], [dict(branch_strategy=MOST_FRACTIONAL)],
+                      workers=1, job_timeout=0.01)
+    assert rows[0]['Stop Reason'] == TERMINATED
+    assert 'Objective' not in rows[0]
+    assert rows[0]['Variables'] == 100
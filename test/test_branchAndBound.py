@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from scipy.optimize import milp, LinearConstraint, Bounds
+
+from coinor.grumpy import BBTree, MOST_FRACTIONAL, PSEUDOCOST_BRANCHING
+from coinor.grumpy import DEPTH_FIRST, BEST_FIRST, BEST_ESTIMATE
+from src.cylpBranchAndBound import BranchAndBound, RELIABILITY_BRANCHING, \
+    HYBRID, PERSISTENT_LP
+from src.benchmark import ArchivedSolvers, ARCHIVED_CYLP
+from src.cuts import GOMORY_CUTS, COVER_CUTS
+from src.heuristics import HEURISTICS
+from src.searchLog import SILENT
+
+SEEDS = [1, 2, 3, 4]
+CONFIGS = {
+    'default': {},
+    'best first': dict(branch_strategy=MOST_FRACTIONAL,
+                       search_strategy=BEST_FIRST),
+    'best estimate': dict(branch_strategy=PSEUDOCOST_BRANCHING,
+                          search_strategy=BEST_ESTIMATE),
+    'reliability': dict(branch_strategy=RELIABILITY_BRANCHING,
+                        search_strategy=BEST_FIRST, lp_engine=PERSISTENT_LP,
+                        warm_start=True),
+    'hybrid': dict(branch_strategy=HYBRID),
+    'everything': dict(search_strategy=BEST_FIRST, lp_engine=PERSISTENT_LP,
+                       warm_start=True, heuristics=HEURISTICS,
+                       heuristic_interval=3, reduced_cost_fixing=True,
+                       cuts=[GOMORY_CUTS, COVER_CUTS], node_cut_rounds=1,
+                       propagation=True, presolve=True, open_node_budget=4),
+    'parallel': dict(search_strategy=BEST_FIRST, node_workers=2),
+}
+
+
+def _milp(VARIABLES, OBJ, MAT, RHS, upper=1, integer=None):
+    # the optimum by the MILP solver of scipy, HiGHS
+    c = -np.array([OBJ[v] for v in VARIABLES], dtype=float)
+    A = np.array([MAT[v] for v in VARIABLES], dtype=float).T
+    integrality = np.ones(len(VARIABLES)) if integer is None else \
+        np.asarray(integer, dtype=float)
+    result = milp(c, constraints=LinearConstraint(A, -np.inf, RHS),
+                  bounds=Bounds(0, upper), integrality=integrality)
+    assert result.success
+    return -result.fun
+
+
+def _check_solution(opt, VARIABLES, OBJ, MAT, RHS, LB, upper=1,
+                    integer=None):
+    x = np.array([opt[i] for i in range(len(VARIABLES))])
+    A = np.array([MAT[v] for v in VARIABLES], dtype=float).T
+    if integer is None:
+        integer = np.ones(len(VARIABLES), dtype=bool)
+    assert np.all(A.dot(x) <= np.array(RHS) + 1e-6)
+    assert np.all(x >= -1e-9) and np.all(x <= np.asarray(upper) + 1e-9)
+    assert np.allclose(x[integer], np.round(x[integer]))
+    value = sum(OBJ[v] * x[i] for i, v in enumerate(VARIABLES))
+    assert abs(value - LB) < 1e-6
+
+
+@pytest.mark.parametrize('name', sorted(CONFIGS))
+def test_optimum(name, mip):
+    for seed in SEEDS:
+        CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(seed)
+        opt, LB = BranchAndBound(None, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
+                                 log_level=SILENT, **CONFIGS[name])
+        assert LB == pytest.approx(_milp(VARIABLES, OBJ, MAT, RHS))
+        _check_solution(opt, VARIABLES, OBJ, MAT, RHS, LB)
+
+
+@pytest.mark.parametrize('strategy', [MOST_FRACTIONAL, PSEUDOCOST_BRANCHING])
+def test_optimum_of_the_archived_baseline(strategy, mip):
+    solvers, skipped = ArchivedSolvers()
+    if ARCHIVED_CYLP not in solvers:
+        pytest.skip(skipped[ARCHIVED_CYLP])
+    for seed in SEEDS[:2]:
+        instance = mip(seed)
+        T = BBTree()
+        T.set_display_mode('off')
+        baseline = solvers[ARCHIVED_CYLP](T, *instance,
+                                          branch_strategy=strategy,
+                                          search_strategy=DEPTH_FIRST)
+        _, LB = BranchAndBound(None, *instance, log_level=SILENT,
+                               branch_strategy=strategy)
+        assert LB == baseline
+
+
+@pytest.mark.parametrize('lp_engine', [None, PERSISTENT_LP])
+def test_general_integer_bounds(lp_engine, mip):
+    options = {} if lp_engine is None else dict(lp_engine=lp_engine,
+                                                warm_start=True)
+    upper = [3] * 20
+    integer = [True] * 16 + [False] * 4
+    for seed in SEEDS:
+        CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(seed)
+        opt, LB = BranchAndBound(None, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
+                                 log_level=SILENT, binary_vars=False,
+                                 search_strategy=BEST_FIRST, lower=[0] * 20,
+                                 upper=upper, integer=integer, **options)
+        assert LB == pytest.approx(_milp(VARIABLES, OBJ, MAT, RHS, upper,
+                                         integer))
+        _check_solution(opt, VARIABLES, OBJ, MAT, RHS, LB, upper,
+                        np.array(integer))
+
+
+@pytest.mark.parametrize('strategy', [PSEUDOCOST_BRANCHING,
+                                      RELIABILITY_BRANCHING])
+def test_parallel_search_speedup(strategy, mip):
+    instance = mip(1)
+    _, LB, stat = BranchAndBound(None, *instance, more_return=True,
+                                 log_level=SILENT, branch_strategy=strategy,
+                                 search_strategy=BEST_FIRST,
+                                 lp_engine=PERSISTENT_LP, node_workers=2,
+                                 speedup=True)
+    assert LB == pytest.approx(_milp(*instance[1:]))
+    assert stat['Workers'] == 2
+    assert stat['Serial Time'] > 0
+    assert stat['Speedup'] == pytest.approx(
+        stat['Serial Time'] / max(stat['Time'], 1))
+
+
+def test_cold_sample_measures_warm_start(mip):
+    instance = mip(3)
+    options = dict(more_return=True, log_level=SILENT,
+                   branch_strategy=PSEUDOCOST_BRANCHING,
+                   lp_engine=PERSISTENT_LP, warm_start=True)
+    _, LB, stat = BranchAndBound(None, *instance, **options)
+    _, sampled_LB, sampled = BranchAndBound(None, *instance, cold_sample=1,
+                                            **options)
+    # the cold solves leave the search as it was
+    assert sampled_LB == LB
+    for name in ['Size', 'LP Solved', 'Pivots', 'Pivots per Warm Start']:
+        assert sampled[name] == stat[name]
+    assert sampled['Cold Solved (Sampled)'] == sampled['Warm Started'] > 0
+    assert sampled['Pivots Saved per Node (Sampled)'] == pytest.approx(
+        sampled['Pivots per Cold Solve (Sampled)'] -
+        sampled['Pivots per Warm Start'])
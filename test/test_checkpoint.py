@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from coinor.grumpy import BEST_FIRST, PSEUDOCOST_BRANCHING
+from src.checkpoint import PackState, UnpackState, SaveCheckpoint, \
+    LoadCheckpoint
+from src.cylpBranchAndBound import BranchAndBound, RELIABILITY_BRANCHING, \
+    PERSISTENT_LP
+from src.cuts import GOMORY_CUTS, COVER_CUTS
+from src.heuristics import HEURISTICS
+from src.searchLog import SILENT
+
+CONFIGS = {
+    'reliability': dict(branch_strategy=RELIABILITY_BRANCHING,
+                        search_strategy=BEST_FIRST, lp_engine=PERSISTENT_LP,
+                        warm_start=True),
+    'pseudocost': dict(branch_strategy=PSEUDOCOST_BRANCHING,
+                       search_strategy=BEST_FIRST, heuristics=HEURISTICS,
+                       heuristic_interval=3, reduced_cost_fixing=True),
+    'cuts': dict(search_strategy=BEST_FIRST, lp_engine=PERSISTENT_LP,
+                 warm_start=True, cuts=[GOMORY_CUTS, COVER_CUTS],
+                 node_cut_rounds=1, propagation=True, open_node_budget=4),
+}
+KEYS = ['Size', 'LP Solved', 'Pivots', 'Purged', 'Stop Reason']
+
+
+def _solve(instance, **options):
+    opt, LB, stat = BranchAndBound(None, *instance, more_return=True,
+                                   log_level=SILENT, **options)
+    return opt, LB, dict((key, stat[key]) for key in KEYS)
+
+
+def test_pack_and_unpack():
+    arrays = PackState('nodes', {'parent': [-1, 0], 'obj': [1.5, 2.0]})
+    assert sorted(arrays) == ['nodes.obj', 'nodes.parent']
+    arrays['open.seq'] = np.arange(3)
+    state = UnpackState('nodes', arrays)
+    assert sorted(state) == ['obj', 'parent']
+    assert state['parent'].tolist() == [-1, 0]
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'search.npz')
+    arrays = {'nodes.obj': np.array([1.5, 2.0]),
+              'open.basis': np.array([[17, 34]], dtype=np.uint8)}
+    scalars = {'LB': 3.0, 'node_count': np.int64(7), 'source': None,
+               'heuristics': [1, 2.5]}
+    SaveCheckpoint(path, arrays, scalars)
+    loaded, loaded_scalars = LoadCheckpoint(path)
+    assert sorted(loaded) == sorted(arrays)
+    assert loaded['open.basis'].dtype == np.uint8
+    assert loaded['nodes.obj'].tolist() == [1.5, 2.0]
+    assert loaded_scalars == {'LB': 3.0, 'node_count': 7, 'source': None,
+                              'heuristics': [1, 2.5]}
+    assert not (tmp_path / 'search.npz.partial').exists()
+
+
+@pytest.mark.parametrize('name', sorted(CONFIGS))
+def test_resume_matches_an_uninterrupted_run(name, mip, tmp_path):
+    instance = mip(11, 25, 15)
+    options = CONFIGS[name]
+    path = str(tmp_path / 'search.npz')
+    expected = _solve(instance, **options)
+    for node_limit in [3, expected[2]['Size'] // 3]:
+        stopped = _solve(instance, node_limit=node_limit, checkpoint=path,
+                         **options)
+        assert stopped[2]['Stop Reason'] != 'Optimal'
+        assert _solve(instance, checkpoint=path, resume=True,
+                      **options) == expected
+
+
+@pytest.mark.parametrize('name', sorted(CONFIGS))
+def test_checkpoints_do_not_change_the_search(name, mip, tmp_path):
+    instance = mip(11, 25, 15)
+    options = CONFIGS[name]
+    path = str(tmp_path / 'search.npz')
+    assert _solve(instance, checkpoint=path, checkpoint_interval=0,
+                  **options) == _solve(instance, **options)
+
+
+def test_resume_checks_the_problem(mip, tmp_path):
+    path = str(tmp_path / 'search.npz')
+    _solve(mip(11, 25, 15), node_limit=3, checkpoint=path)
+    with pytest.raises(ValueError):
+        _solve(mip(12, 25, 15), checkpoint=path, resume=True)
+    with pytest.raises(ValueError):
+        _solve(mip(11, 25, 15), resume=True)
+    # one objective coefficient changed, the sizes stay the same
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(11, 25, 15)
+    OBJ = dict(OBJ, x0=OBJ['x0'] + 1)
+    with pytest.raises(ValueError):
+        _solve((CONSTRAINTS, VARIABLES, OBJ, MAT, RHS), checkpoint=path,
+               resume=True)
+
+
+@pytest.mark.parametrize('option', [dict(heuristics=HEURISTICS),
+                                    dict(rel_param=(8, 3, 1 / 6, 5)),
+                                    dict(upper=[2] * 25, binary_vars=False),
+                                    dict(open_node_budget=4)])
+def test_resume_checks_the_options(option, mip, tmp_path):
+    path = str(tmp_path / 'search.npz')
+    _solve(mip(11, 25, 15), node_limit=3, checkpoint=path)
+    with pytest.raises(ValueError):
+        _solve(mip(11, 25, 15), checkpoint=path, resume=True, **option)
+    # the limits may change
+    _solve(mip(11, 25, 15), checkpoint=path, resume=True, node_limit=5,
+           time_limit=60)
@@ -0,0 +1,121 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, LinearConstraint, Bounds
+from cylp.py.modeling.CyLPModel import CyLPArray
+
+from src.cuts import CutPool, RootCutLoop, GOMORY_CUTS
+from src.cylpBranchAndBound import ToSparseMatrix
+from src.searchSteps import EvaluateSolution
+
+
+def _cuts(rows):
+    return sp.csr_matrix(np.array(rows, dtype=float))
+
+
+def test_scaled_duplicates_map_to_one_cut():
+    pool = CutPool(3)
+    ids = pool.add(_cuts([[1, 1, 0], [0, 1, 1]]), np.array([1.0, 1.0]))
+    assert ids.tolist() == [0, 1]
+    # the same cuts scaled, in another order
+    ids = pool.add(_cuts([[0, 2, 2], [3, 3, 0]]), np.array([2.0, 3.0]))
+    assert ids.tolist() == [1, 0]
+    assert pool.generated == 2
+    assert len(pool) == 2
+    rows, rhs = pool.rows(np.array([0]))
+    assert rows.toarray().tolist() == [[1, 1, 0]]
+    assert rhs.tolist() == [1.0]
+
+
+def test_violated_cuts_are_found_and_reset():
+    pool = CutPool(3, max_age=2)
+    pool.add(_cuts([[1, 1, 0], [0, 1, 1]]), np.array([1.0, 1.0]))
+    ids = pool.violated(np.array([1.0, 0.5, 0.0]))
+    assert ids.tolist() == [0]
+    assert pool.reused == 1
+    assert pool.age.tolist() == [0, 1]
+
+
+def test_cuts_in_the_lp_do_not_age():
+    pool = CutPool(2, max_age=1)
+    pool.add(_cuts([[1, 1]]), np.array([1.0]))
+    pool.in_lp[0] = True
+    for _ in range(5):
+        assert len(pool.violated(np.zeros(2))) == 0
+    assert len(pool) == 1
+    assert pool.evicted == 0
+
+
+def test_old_cuts_are_evicted_and_can_come_back():
+    pool = CutPool(2, max_age=2)
+    pool.add(_cuts([[1, 1]]), np.array([1.0]))
+    for _ in range(3):
+        pool.violated(np.zeros(2))
+    assert len(pool) == 0
+    assert pool.evicted == 1
+    # separated again, the cut is new
+    ids = pool.add(_cuts([[1, 1]]), np.array([1.0]))
+    assert ids.tolist() == [1]
+    assert len(pool) == 1
+    assert pool.generated == 2
+
+
+def test_save_and_load_state():
+    pool = CutPool(3, max_age=1)
+    pool.add(_cuts([[1, 1, 0], [0, 1, 1], [1, 0, 1]]),
+             np.array([1.0, 1.0, 1.0]))
+    pool.in_lp[2] = True
+    pool.violated(np.array([1.0, 0.5, 0.0]))
+    pool.violated(np.array([1.0, 0.5, 0.0]))
+    copy = CutPool(3, max_age=1)
+    copy.load_state(pool.save_state())
+    assert len(copy) == len(pool) == 2
+    assert copy.keys == pool.keys
+    assert copy.age.tolist() == pool.age.tolist()
+    assert copy.in_lp.tolist() == pool.in_lp.tolist()
+    assert (copy.generated, copy.reused, copy.evicted) == \
+        (pool.generated, pool.reused, pool.evicted)
+    ids = copy.add(_cuts([[2, 2, 0], [0, 1, 1]]), np.array([2.0, 1.0]))
+    assert ids.tolist() == [0, 3]
+
+
+def test_gomory_cuts_keep_the_integer_optimum(mip):
+    added = 0
+    for seed in [1, 2, 3]:
+        _, VARIABLES, OBJ, MAT, RHS = mip(seed)
+        OBJ = np.array([-OBJ[v] for v in VARIABLES], dtype=float)
+        MAT = ToSparseMatrix(MAT, VARIABLES)
+        RHS = np.array(RHS, dtype=float)
+        lower, upper = np.zeros(len(VARIABLES)), np.ones(len(VARIABLES))
+        cut_MAT, cut_RHS, stat = RootCutLoop(CyLPArray(OBJ), MAT,
+                                             CyLPArray(RHS), lower, upper,
+                                             separators=[GOMORY_CUTS])
+        result = milp(OBJ, constraints=LinearConstraint(MAT.toarray(),
+                                                        -np.inf, RHS),
+                      bounds=Bounds(0, 1), integrality=np.ones(len(OBJ)))
+        assert result.success
+        # the cuts are appended to the rows and hold at the integer optimum
+        assert cut_MAT.shape[0] == MAT.shape[0] + stat['Cuts Added']
+        assert np.all(cut_MAT.dot(np.round(result.x)) <= cut_RHS + 1e-6)
+        assert stat['Root Bound After Cuts'] <= stat['Root Bound'] + 1e-9
+        assert stat['Root Bound After Cuts'] >= -result.fun - 1e-6
+        added += stat['Cuts Added']
+    assert added > 0
+
+
+def test_near_integral_solution_is_rounded_within_the_bounds():
+    OBJ = np.array([-1.0, -1.0])
+    MAT = sp.csr_matrix(np.array([[1.0, 1.0]]))
+    RHS = np.array([2.0])
+    x = np.array([0.9995, 0.0])
+    integer = np.ones(2, dtype=bool)
+    values, relax, integral, _, _ = EvaluateSolution(
+        x, 0.9995, integer, OBJ, MAT, RHS, (np.zeros(2), np.ones(2)))
+    assert integral and values.tolist() == [1, 0] and relax == 1
+    # the rounding is out of the bounds of the node
+    values, relax, integral, _, _ = EvaluateSolution(
+        x, 0.9995, integer, OBJ, MAT, RHS, (np.zeros(2), np.array([0.9995, 1])))
+    assert values.tolist() == x.tolist() and relax == 0.9995
+    # without cuts the solution is kept
+    values, _, integral, _, _ = EvaluateSolution(x, 0.9995, integer, OBJ,
+                                                 MAT, RHS)
+    assert integral and values.tolist() == x.tolist()
@@ -0,0 +1,26 @@
+import numpy as np
+from cylp.py.modeling.CyLPModel import CyLPArray
+
+from src.cylpBranchAndBound import ToSparseMatrix
+from src.heuristics import PrimalHeuristics, SIMPLE_ROUNDING
+
+
+def _heuristics(mip, interval):
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(5)
+    OBJ = CyLPArray([-OBJ[v] for v in VARIABLES])
+    return PrimalHeuristics(OBJ, ToSparseMatrix(MAT, VARIABLES),
+                            CyLPArray(RHS), np.zeros(len(OBJ)),
+                            np.ones(len(OBJ)), [SIMPLE_ROUNDING], interval)
+
+
+def test_due_at_the_next_node_branched_on(mip):
+    heur = _heuristics(mip, 5)
+    # the nodes branched on, the 5th and 10th are solved or pruned
+    branched = [1, 2, 4, 7, 8, 9, 11, 13, 14, 16]
+    assert [k for k in branched if heur.due(k)] == [1, 7, 13]
+    assert heur.last == 13
+
+
+def test_due_at_the_first_node_only_without_interval(mip):
+    heur = _heuristics(mip, None)
+    assert [k for k in [2, 3, 10, 20] if heur.due(k)] == [2]
@@ -0,0 +1,114 @@
+import numpy as np
+
+from src.nodeStore import NodeStore, ChildDeltas, LOWER, UPPER
+
+
+def _tree():
+    # root, 1: x0 <= 0, 2: x0 >= 1, 3 (child of 1): x2 >= 1
+    nodes = NodeStore(np.zeros(4), np.ones(4))
+    nodes.add(0, None)
+    nodes.add(1, 0, *ChildDeltas(0, UPPER, 0))
+    nodes.add(2, 0, *ChildDeltas(0, LOWER, 1))
+    nodes.add(3, 1, *ChildDeltas(2, LOWER, 1))
+    return nodes
+
+
+def test_bounds_from_deltas():
+    nodes = _tree()
+    lower, upper = nodes.bounds(3)
+    assert lower.tolist() == [0, 0, 1, 0]
+    assert upper.tolist() == [0, 1, 1, 1]
+    # a node off the cached path is rebuilt from the root
+    lower, upper = nodes.bounds(2)
+    assert lower.tolist() == [1, 0, 0, 0]
+    assert upper.tolist() == [1, 1, 1, 1]
+    assert nodes.depth[nodes.slot[3]] == 2
+
+
+def test_bounds_are_copies():
+    nodes = _tree()
+    lower, _ = nodes.bounds(3)
+    lower[:] = 5
+    assert nodes.bounds(3)[0].tolist() == [0, 0, 1, 0]
+
+
+def test_path_and_deltas():
+    nodes = _tree()
+    assert nodes.path(3) == [3, 1, 0]
+    variables, sides, values = nodes.deltas(nodes.path(3))
+    assert variables.tolist() == [2, 0]
+    assert sides.tolist() == [LOWER, UPPER]
+    assert values.tolist() == [1, 0]
+    assert len(nodes.deltas([0])[0]) == 0
+
+
+def test_child_deltas_carry_fixings():
+    fixed = (np.array([3]), np.array([UPPER]), np.array([0.0]))
+    variables, sides, values = ChildDeltas(1, LOWER, 1, fixed)
+    assert variables.tolist() == [1, 3]
+    assert sides.tolist() == [LOWER, UPPER]
+    assert values.tolist() == [1, 0]
+
+
+def test_tighten_moves_deltas_and_reaches_subtree():
+    nodes = _tree()
+    # node 1 is not the last node added, its deltas are moved
+    nodes.tighten(1, np.array([3]), np.array([UPPER]), np.array([0.0]))
+    assert nodes.bounds(1)[1].tolist() == [0, 1, 1, 0]
+    assert nodes.bounds(3)[1].tolist() == [0, 1, 1, 0]
+    assert nodes.bounds(2)[1].tolist() == [1, 1, 1, 1]
+    assert nodes.bounds(3)[0].tolist() == [0, 0, 1, 0]
+
+
+def test_tighten_root_holds_for_every_node():
+    nodes = _tree()
+    nodes.bounds(3)
+    nodes.tighten_root(np.array([1]), np.array([LOWER]), np.array([1.0]))
+    for index in range(4):
+        assert nodes.bounds(index)[0][1] == 1
+
+
+def test_save_and_load_state():
+    nodes = _tree()
+    nodes.tighten(1, np.array([3]), np.array([UPPER]), np.array([0.0]))
+    nodes.obj[[nodes.slot[index] for index in range(4)]] = [10, 9, 8, 7]
+    copy = NodeStore(np.zeros(4), np.ones(4))
+    copy.load_state(nodes.save_state())
+    for index in range(4):
+        for mine, theirs in zip(nodes.bounds(index), copy.bounds(index)):
+            assert mine.tolist() == theirs.tolist()
+    assert [copy.obj[copy.slot[index]] for index in range(4)] == \
+        [10, 9, 8, 7]
+    assert copy.path(3) == [3, 1, 0]
+
+
+def test_closed_subtrees_are_freed():
+    nodes = _tree()
+    nodes.close(0)
+    nodes.close(3)
+    # node 1 is still open, so are its ancestors
+    assert sorted(nodes.slot) == [0, 1, 2]
+    nodes.close(1)
+    assert sorted(nodes.slot) == [0, 2]
+    # the freed slots are reused and the bounds still come from the deltas
+    nodes.add(4, 2, *ChildDeltas(3, UPPER, 0))
+    assert len(nodes) == 3
+    assert nodes.bounds(4)[1].tolist() == [1, 1, 1, 0]
+    nodes.close(2)
+    nodes.close(4)
+    assert len(nodes) == 0
+
+
+def test_deltas_of_freed_nodes_are_packed():
+    # children of the root that are closed as they are processed, the
+    # store keeps its first arrays
+    nodes = NodeStore(np.zeros(3), np.ones(3), capacity=4)
+    nodes.add(0, None)
+    nodes.add(1, 0, *ChildDeltas(0, UPPER, 0))
+    for index in range(2, 200):
+        nodes.add(index, 0, *ChildDeltas(index % 3, LOWER, 1))
+        nodes.close(index - 1)
+    assert len(nodes) == 2
+    assert len(nodes.delta_var) == len(nodes.parent) == 4
+    assert nodes.bounds(199)[0].tolist() == [0, 1, 0]
+    assert nodes.depth[nodes.slot[199]] == 1
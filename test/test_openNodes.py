@@ -0,0 +1,129 @@
+import numpy as np
+
+from src.openNodes import OpenNodes
+
+
+def _node(index, parent=0, relax=10.0, basis=None):
+    return (index, parent, relax, 1, 0.5, '<=' if index % 2 else '>=',
+            0 if index % 2 else 1, basis)
+
+
+def _fill(Q, priorities, relax=None):
+    for k, priority in enumerate(priorities):
+        index = k + 1
+        Q.push(index, priority,
+               _node(index, relax=10.0 if relax is None else relax[k]))
+
+
+def test_pop_by_priority_then_push_order():
+    Q = OpenNodes()
+    _fill(Q, [3, 1, 2, 1])
+    assert [Q.pop()[0] for _ in range(4)] == [2, 4, 3, 1]
+    assert Q.isEmpty()
+
+
+def test_node_round_trip():
+    Q = OpenNodes()
+    basis = np.array([17, 34], dtype=np.uint8)
+    Q.push(0, 0, (0, None, None, None, None, None, None, None))
+    Q.push(5, 1, (5, 2, 7.5, 3, 0.25, '>=', 1, basis))
+    assert Q.pop() == (0, None, None, None, None, None, None, None)
+    node = Q.pop()
+    assert node[:7] == (5, 2, 7.5, 3, 0.25, '>=', 1)
+    assert node[7].tolist() == basis.tolist()
+
+
+def test_best_bound():
+    Q = OpenNodes()
+    assert Q.best_bound() == -np.inf
+    Q.push(0, 0, (0, None, None, None, None, None, None, None))
+    assert Q.best_bound() == np.inf
+    Q.pop()
+    _fill(Q, [1, 2, 3], relax=[5.0, 9.0, 7.0])
+    assert Q.best_bound() == 9.0
+    # the best bound stays with the node that survives the prune
+    Q.prune(8.0)
+    assert len(Q) == 1 and Q.best_bound() == 9.0
+    Q.pop()
+    assert Q.best_bound() == -np.inf
+
+
+def test_prune_count_and_removed():
+    Q = OpenNodes()
+    _fill(Q, [1, 2, 3, 4], relax=[5.0, 9.0, 7.0, 5.0])
+    assert Q.prune(6.0) == 2
+    Q2 = OpenNodes()
+    _fill(Q2, [1, 2, 3, 4], relax=[5.0, 9.0, 7.0, 5.0])
+    removed = []
+    assert Q2.prune(6.0, removed) == 2
+    assert sorted(removed) == [(1, 0), (4, 0)]
+    assert Q2.purged == 2
+    assert [Q2.pop()[0] for _ in range(len(Q2))] == [2, 3]
+
+
+def test_spill_keeps_every_node():
+    rng = np.random.RandomState(0)
+    priorities = rng.randint(0, 50, size=200).tolist()
+    Q = OpenNodes(budget=16)
+    _fill(Q, priorities, relax=rng.uniform(0, 10, size=200).tolist())
+    assert Q.spilled > 0
+    assert len(Q) == 200
+    assert Q.peak == 200
+    popped = [Q.pop()[0] for _ in range(200)]
+    assert sorted(popped) == list(range(1, 201))
+    assert Q.isEmpty()
+    Q.close()
+
+
+def test_spill_keeps_the_pop_order():
+    # pushes and pops mixed, spilled nodes come back as soon as they are
+    # the next by priority
+    rng = np.random.RandomState(2)
+    priorities = rng.randint(0, 40, size=300).tolist()
+    Q, reference = OpenNodes(budget=6), OpenNodes()
+    popped, expected = [], []
+    for k, priority in enumerate(priorities):
+        Q.push(k + 1, priority, _node(k + 1))
+        reference.push(k + 1, priority, _node(k + 1))
+        if k % 3 == 2:
+            popped.append(Q.pop()[0])
+            expected.append(reference.pop()[0])
+    while not reference.isEmpty():
+        popped.append(Q.pop()[0])
+        expected.append(reference.pop()[0])
+    assert Q.spilled > 0 and Q.isEmpty()
+    assert popped == expected
+    Q.close()
+
+
+def test_spilled_batches_count_in_best_bound_and_prune():
+    relax = [1.0] * 12 + [9.0] * 4
+    Q = OpenNodes(budget=8)
+    # the low priority nodes go to disk first
+    _fill(Q, list(range(16)), relax=relax[::-1])
+    assert Q.on_disk > 0
+    assert Q.best_bound() == 9.0
+    removed = []
+    purged = Q.prune(5.0, removed)
+    assert purged == len(removed) == 12
+    assert len(Q) == 4
+    assert sorted(index for index, _ in removed) == list(range(5, 17))
+    Q.close()
+
+
+def test_save_and_load_state():
+    rng = np.random.RandomState(1)
+    priorities = rng.randint(0, 20, size=60).tolist()
+    Q = OpenNodes(budget=10)
+    _fill(Q, priorities, relax=rng.uniform(0, 10, size=60).tolist())
+    for _ in range(5):
+        Q.pop()
+    copy = OpenNodes(budget=10)
+    copy.load_state(Q.save_state())
+    assert len(copy) == len(Q)
+    assert copy.best_bound() == Q.best_bound()
+    while not Q.isEmpty():
+        assert copy.pop()[:7] == Q.pop()[:7]
+    assert copy.isEmpty()
+    Q.close()
+    copy.close()
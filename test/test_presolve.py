@@ -0,0 +1,51 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src.presolve import Presolve
+from src.cylpBranchAndBound import BranchAndBound
+from src.searchLog import SILENT
+
+
+def _presolved():
+    # max 3 x0 + 2 x1 + x2 + 4 x3, x0 + x1 <= 1 and x2 <= 0, x3 is in no
+    # row and is fixed at its upper bound by dual fixing
+    OBJ = -np.array([3.0, 2.0, 1.0, 4.0])
+    MAT = sp.csr_matrix(np.array([[1.0, 1.0, 0.0, 0.0],
+                                  [0.0, 0.0, 1.0, 0.0]]))
+    RHS = np.array([1.0, 0.0])
+    return Presolve(OBJ, MAT, RHS, np.zeros(4), np.ones(4))
+
+
+def test_fixed_columns_are_removed():
+    presolved = _presolved()
+    assert not presolved.infeasible
+    assert presolved.removed.tolist() == [2, 3]
+    assert presolved.columns.tolist() == [0, 1]
+    assert presolved.fixed_values.tolist() == [0.0, 1.0]
+    # the objective of the removed columns is carried by a fixed column
+    assert presolved.carrier
+    assert presolved.numVars == 3
+    assert presolved.OBJ[-1] == -4.0
+
+
+def test_solution_maps_back_to_the_original_columns():
+    presolved = _presolved()
+    expected = {0: 1.0, 1: 0.0, 2: 0.0, 3: 1.0}
+    assert presolved.solution(np.array([1.0, 0.0, 1.0])) == expected
+    assert presolved.solution({0: 1.0, 1: 0.0, 2: 1.0}) == expected
+
+
+def test_search_on_the_presolved_problem(mip):
+    for seed in [1, 2, 3]:
+        CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(seed)
+        _, LB = BranchAndBound(None, CONSTRAINTS, VARIABLES, OBJ, MAT, RHS,
+                               log_level=SILENT)
+        opt, LB_presolved = BranchAndBound(None, CONSTRAINTS, VARIABLES, OBJ,
+                                           MAT, RHS, log_level=SILENT,
+                                           presolve=True)
+        assert LB_presolved == LB
+        x = np.array([opt[i] for i in range(len(VARIABLES))])
+        A = np.array([MAT[v] for v in VARIABLES]).T
+        assert np.all(A.dot(x) <= np.array(RHS) + 1e-6)
+        assert abs(sum(OBJ[v] * x[i] for i, v in enumerate(VARIABLES)) -
+                   LB) < 1e-6
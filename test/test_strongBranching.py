@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from cylp.py.modeling.CyLPModel import CyLPArray
+
+from src.cylpBranchAndBound import ToSparseMatrix
+from src.lpEngine import PersistentLP
+from src.strongBranching import StrongBranchingPool
+
+
+def _lp(mip):
+    CONSTRAINTS, VARIABLES, OBJ, MAT, RHS = mip(4)
+    OBJ = CyLPArray([-OBJ[v] for v in VARIABLES])
+    return OBJ, ToSparseMatrix(MAT, VARIABLES), CyLPArray(RHS)
+
+
+def test_dead_worker_raises_and_the_pool_is_stopped(mip):
+    OBJ, MAT, RHS = _lp(mip)
+    lower, upper = np.zeros(len(OBJ)), np.ones(len(OBJ))
+    engine = PersistentLP(OBJ, MAT, RHS, lower, upper)
+    engine.solve()
+    variables = np.arange(4)
+    with StrongBranchingPool(2, OBJ, MAT, RHS, lower, upper) as pool:
+        workers = list(pool.workers)
+        pool.set_node(lower, upper, engine.get_basis())
+        status, _ = pool.probe_bounds(variables, np.ones(4), np.ones(4), 10)
+        assert (status >= 0).all()
+        workers[1].terminate()
+        workers[1].join()
+        with pytest.raises(RuntimeError):
+            pool.probe_bounds(variables, np.ones(4), np.ones(4), 10)
+    assert not any(worker.is_alive() for worker in workers)
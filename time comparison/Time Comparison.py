@@ -24,6 +24,7 @@ sys.path.append(project_dir)
 
 from src.cylpBranchAndBound import RELIABILITY_BRANCHING, HYBRID
 from src.cylpBranchAndBound import BranchAndBound
+from src.searchLog import SILENT
 
 
 # Disable
@@ -48,6 +49,11 @@ def negIdentity(n):
     return m
 
 
+# The sweep stays a loop instead of going through src/batchSolve.BatchSolve:
+# every problem is timed with GrUMPy, which BatchSolve does not run, and with
+# CyLP one after the other in this process, both drawing into a BBTree, so
+# the two times are taken under the same conditions. BatchSolve solves
+# without a tree, in worker processes.
 blockPrint()
 # input Parameters 
 M = 30  # Number of Problems
@@ -77,7 +83,8 @@ for k in range(M):
             T = BBTree()
             start = time.time()
             opt, LB = BranchAndBound(
-                T, CONSTRAINTS, VARIABLES, OBJ,MAT, RHS,branch_strategy=i,search_strategy=j)
+                T, CONSTRAINTS, VARIABLES, OBJ,MAT, RHS,branch_strategy=i,search_strategy=j,
+                log_level=SILENT)
             end = time.time()
             tol_time = end-start
             if LB>-INFINITY: